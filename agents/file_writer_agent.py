@@ -2,7 +2,9 @@
 from uagents import Agent, Context, Model
 import os
 import json
-import black 
+import asyncio
+from typing import Dict, List, Optional
+from utils.patcher import apply_correction, apply_corrections, atomic_write, file_lock
 
 class FileWriteRequest(Model):
     file_path: str
@@ -14,11 +16,28 @@ class FileWriteResponse(Model):
 
 class ErrorCorrectionRequest(Model):
     response: dict
+    # When given, the fix is verified by re-running this command (see verify.verify_fix).
+    entrypoint: Optional[str] = None
+    traceback: str = ""
+    # Reformat the statement block around the fix with black, following the project's black settings.
+    format_code: bool = True
 
 class ErrorCorrectionResponse(Model):
     success: bool
     message: str
 
+class ErrorCorrectionBatchRequest(Model):
+    # LLM answers, possibly several for the same file; line numbers refer to the files before any of them is applied.
+    responses: List[dict]
+    format_code: bool = True
+
+class ErrorCorrectionBatchResponse(Model):
+    success: bool
+    message: str
+    applied: List[str] = []
+    # File path -> why its corrections were not applied.
+    failed: Dict[str, str] = {}
+
 file_writer = Agent(name="file_writer", seed="file_writer_seed", port=8000, endpoint="http://localhost:8000/submit")
 
 
@@ -26,11 +45,16 @@ file_writer = Agent(name="file_writer", seed="file_writer_seed", port=8000, endp
 async def startup(ctx: Context):
     ctx.logger.info(f"Starting up {file_writer.name} agent @ {file_writer.address}")
 
+def write_file(file_path: str, content: str):
+    # Locked and written by the path of the file itself, even when file_path is a symlink.
+    file_path = os.path.realpath(file_path)
+    with file_lock(file_path):
+        atomic_write(file_path, content)
+
 @file_writer.on_message(model=FileWriteRequest)
 async def write_to_file(ctx: Context, sender: str, msg: FileWriteRequest):
     try:
-        with open(msg.file_path, 'w') as file:
-            file.write(msg.content)
+        await asyncio.to_thread(write_file, msg.file_path, msg.content)
         ctx.logger.info(f"Successfully wrote to file: {msg.file_path}")
         await ctx.send(sender, FileWriteResponse(success=True, message=f"File {msg.file_path} updated successfully"))
     except Exception as e:
@@ -41,34 +65,19 @@ async def write_to_file(ctx: Context, sender: str, msg: FileWriteRequest):
 @file_writer.on_message(model=ErrorCorrectionRequest)
 async def apply_error_correction(ctx: Context, sender: str, msg: ErrorCorrectionRequest):
     try:
-        response = msg.response
-        file_path = os.path.join(response['where']['repository_path'], response['where']['file_name'])
-        line_number = int(response['where']['line_number'])
-        suggested_code = response['how']['suggested_code_solution']
-
-        with open(file_path, 'r', encoding='utf-8') as file:
-            lines = file.readlines()
-
-        if 0 < line_number <= len(lines):
-            stripped_line = lines[line_number - 1].strip()
-            num_whitespace = len(lines[line_number - 1]) - len(stripped_line)
-            lines[line_number - 1] = " " * num_whitespace + suggested_code
-
-            with open(file_path, 'w', encoding='utf-8') as file:
-                file.writelines(lines)
-            '''
-            #after writing, we want to reformat the file
-            with open(file_path, 'r') as file:
-                content = file.read()
-                formatted_content = black.format(content, mode=black.FileMode())
-                
-            with open(file_path, 'w') as file:
-                file.write(formatted_content)
-            '''
-            ctx.logger.info(f"Successfully applied correction to file: {file_path}")
-            await ctx.send(sender, FileWriteResponse(success=True, message=f"File {file_path} updated successfully"))
-        else:
-            raise IndexError("Line number out of range")
+        # Patching takes the lock of the file, so it runs off the event loop.
+        # Only the block around the fix is reformatted, in the same write as the fix.
+        file_path = await asyncio.to_thread(apply_correction, msg.response, msg.format_code)
+        ctx.logger.info(f"Successfully applied correction to file: {file_path}")
+        message = f"File {file_path} updated successfully"
+        if msg.entrypoint:
+            # Imported here: verify pulls in the LLM pipeline, which itself imports this module.
+            from verify import verify_fix
+            # Re-run the entrypoint to check the fix, retrying with the LLM on a new error within the budget.
+            result = await asyncio.to_thread(verify_fix, msg.entrypoint, msg.traceback, msg.response, already_applied=True)
+            ctx.logger.info(f"Verification of {file_path}: {result.summary()}")
+            message = f"{message}; {result.summary()}"
+        await ctx.send(sender, FileWriteResponse(success=True, message=message))
     except Exception as e:
         error_message = f"Error applying correction: {str(e)}"
         ctx.logger.error(error_message)
@@ -83,6 +92,33 @@ async def handle_error_correction(ctx: Context, request: ErrorCorrectionRequest)
         print(str(e))
         return ErrorCorrectionResponse(success=False, message=f"Error applying correction: {str(e)}")
 
+async def apply_error_corrections(ctx: Context, request: ErrorCorrectionBatchRequest) -> ErrorCorrectionBatchResponse:
+    try:
+        results = await asyncio.to_thread(apply_corrections, request.responses, format_code=request.format_code)
+    except Exception as e:
+        error_message = f"Error applying corrections: {str(e)}"
+        ctx.logger.error(error_message)
+        return ErrorCorrectionBatchResponse(success=False, message=error_message)
+    applied = [file_path for file_path, error in results.items() if error is None]
+    failed = {file_path: str(error) for file_path, error in results.items() if error is not None}
+    for file_path, error in failed.items():
+        ctx.logger.error(f"Error applying corrections to {file_path}: {error}")
+    ctx.logger.info(f"Applied {len(request.responses)} corrections to {len(applied)} of {len(results)} files")
+    return ErrorCorrectionBatchResponse(
+        success=not failed,
+        message=f"{len(applied)} of {len(results)} files updated successfully",
+        applied=applied,
+        failed=failed
+    )
+
+@file_writer.on_message(model=ErrorCorrectionBatchRequest)
+async def handle_error_corrections_message(ctx: Context, sender: str, msg: ErrorCorrectionBatchRequest):
+    await ctx.send(sender, await apply_error_corrections(ctx, msg))
+
+@file_writer.on_rest_post("/apply_corrections", ErrorCorrectionBatchRequest, ErrorCorrectionBatchResponse)
+async def handle_error_corrections(ctx: Context, request: ErrorCorrectionBatchRequest) -> ErrorCorrectionBatchResponse:
+    return await apply_error_corrections(ctx, request)
+
 
 if __name__ == "__main__":
     print("Starting file writer agent server on http://localhost:8000")
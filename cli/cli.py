@@ -1,6 +1,11 @@
 import click
+import os
 import sys
 import cmd
+
+# The CLI modules import each other by name; the splat packages (utils, relational, ...) live one level up.
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
 from process_monitor import ProcessMonitor
 from zap import Zapper
 from term_sesh import TermSesh
@@ -27,9 +32,11 @@ class ZapShell(cmd.Cmd):
     def do_exit(self, arg):
         """Exit the application"""
         click.echo('Goodbye!')
+        if self.zapper:
+            self.zapper.stop()
         if self.term_sesh:
             if self.term_sesh.monitor:
-                self.term_sesh.monitor.is_running = False
+                self.term_sesh.monitor.stop_monitoring()
             if self.term_sesh.terminal_process:
                 self.term_sesh.terminal_process.terminate()
             self.term_sesh.kill_tmux_session()
@@ -46,7 +53,7 @@ class ZapShell(cmd.Cmd):
             self.term_sesh.monitor = ProcessMonitor(self.term_sesh)
             self.term_sesh.monitor.start_monitoring()
             click.echo("tmux session and monitoring started successfully")
-            self.term_sesh.publisher.send_json({'type': 'info', 'data': 'tmux session started'})
+            self.term_sesh.wire.send('info', 'tmux session started')
             self.term_sesh.send_to_terminal("ls")
             self.term_sesh.send_to_terminal("cat setup.py")
         else:
@@ -98,6 +105,17 @@ def version():
     """Show the version"""
     click.echo('Zap CLI v0.1.0')
 
+@cli.command()
+@click.argument('entrypoint')
+@click.option('-r', 'related', is_flag=True, help='Include the Nth degree imports of the failing files in the context.')
+@click.option('-s', 'sliced', is_flag=True, help='Only send the enclosing scope of each failing line.')
+@click.option('--timeout', type=float, default=None, help='Seconds a run may take; a server still up by then passes.')
+@click.option('--poll', is_flag=True, help='Poll for changes instead of using inotify.')
+def watch(entrypoint, related, sliced, timeout, poll):
+    """Re-run ENTRYPOINT whenever a file it depends on is saved, and analyze any error"""
+    from watcher import watch as watch_entrypoint
+    watch_entrypoint(entrypoint, '-r' if related else '-s' if sliced else '', timeout=timeout, poll=poll)
+
 def main():
     try:
         cli()
@@ -0,0 +1,108 @@
+import os
+import shlex
+import shutil
+import selectors
+import subprocess
+import tempfile
+import threading
+import traceback
+from typing import Callable
+
+READ_SIZE = 64 * 1024
+
+
+class PaneCapture:
+    """
+    Streams the output of a tmux pane as it is written, instead of polling screen snapshots.
+
+    `tmux pipe-pane` copies everything the pane prints into a FIFO, which is read on a background thread with
+    non-blocking I/O; every chunk is handed to `on_data` as soon as it arrives, including output that scrolls off
+    the screen before anyone could have captured it.
+    """
+
+    def __init__(self, session_name: str, on_data: Callable[[bytes], None]):
+        self.session_name = session_name
+        self.on_data = on_data
+        self.fifo_dir = None
+        self.fifo_path = None
+        self.reader_thread = None
+        self.is_running = False
+        self._read_fd = None
+        # Held open so the FIFO never reports end-of-file when tmux restarts its writer; closing it wakes the reader.
+        self._keepalive_fd = None
+
+    def start(self) -> bool:
+        """Start streaming; returns False if pipe-pane cannot be used here, so the caller can fall back to polling."""
+        if not hasattr(os, 'mkfifo') or shutil.which('tmux') is None:
+            return False
+        try:
+            self.fifo_dir = tempfile.mkdtemp(prefix='splat-pane-')
+            self.fifo_path = os.path.join(self.fifo_dir, 'pane.fifo')
+            os.mkfifo(self.fifo_path, 0o600)
+            # Opening the read end non-blocking does not wait for a writer to show up.
+            self._read_fd = os.open(self.fifo_path, os.O_RDONLY | os.O_NONBLOCK)
+            self._keepalive_fd = os.open(self.fifo_path, os.O_WRONLY | os.O_NONBLOCK)
+            result = subprocess.run(
+                ['tmux', 'pipe-pane', '-O', '-t', self.session_name, f'cat > {shlex.quote(self.fifo_path)}'],
+                capture_output=True
+            )
+            if result.returncode != 0:
+                raise OSError(result.stderr.decode(errors='replace').strip() or 'tmux pipe-pane failed')
+        except OSError as e:
+            print(f"Error starting pane capture, falling back to polling: {e}")
+            self._cleanup()
+            return False
+
+        self.is_running = True
+        self.reader_thread = threading.Thread(target=self._read_loop, daemon=True)
+        self.reader_thread.start()
+        return True
+
+    def _read_loop(self):
+        selector = selectors.DefaultSelector()
+        selector.register(self._read_fd, selectors.EVENT_READ)
+        try:
+            while True:
+                if not selector.select(timeout=1 if self.is_running else 0.1):
+                    if not self.is_running:
+                        break
+                    continue
+                try:
+                    data = os.read(self._read_fd, READ_SIZE)
+                except BlockingIOError:
+                    continue
+                if not data:
+                    # Every writer is gone: stop() closed the keepalive end and tmux closed its pipe.
+                    break
+                try:
+                    self.on_data(data)
+                except Exception:
+                    traceback.print_exc()
+        finally:
+            selector.close()
+
+    def stop(self):
+        """Stop piping the pane and wait for the reader to drain what was already written."""
+        if not self.is_running:
+            return
+        self.is_running = False
+        # pipe-pane without a command closes the pane's pipe.
+        subprocess.run(['tmux', 'pipe-pane', '-t', self.session_name], capture_output=True)
+        if self._keepalive_fd is not None:
+            os.close(self._keepalive_fd)
+            self._keepalive_fd = None
+        if self.reader_thread:
+            self.reader_thread.join(timeout=2)
+        self._cleanup()
+
+    def _cleanup(self):
+        for fd in (self._read_fd, self._keepalive_fd):
+            if fd is not None:
+                try:
+                    os.close(fd)
+                except OSError:
+                    pass
+        self._read_fd = self._keepalive_fd = None
+        if self.fifo_dir:
+            shutil.rmtree(self.fifo_dir, ignore_errors=True)
+            self.fifo_dir = self.fifo_path = None
@@ -1,26 +1,71 @@
-
 import threading
 import time
+from utils.traceback_parser import TracebackDetector
+from utils.fingerprint import ErrorGrouper
+from term_cleaner import StreamCleaner
 
 class ProcessMonitor:
     def __init__(self, term_sesh):
         self.term_sesh = term_sesh
         self.monitor_thread = None
         self.is_running = False
+        # Tracebacks in the terminal output are grouped by fingerprint, so a repeated error is only analyzed once.
+        self.detector = TracebackDetector()
+        self.errors = ErrorGrouper()
+        # Raw pane output is cleaned incrementally, keeping a bounded scrollback.
+        self.cleaner = StreamCleaner()
 
     def start_monitoring(self):
         self.is_running = True
+        # Output is streamed as it is written when tmux pipe-pane is available; polling snapshots is the fallback.
+        if self.term_sesh.start_capture(self.on_pane_output):
+            print('monitor streaming pane output')
+            return
         self.monitor_thread = threading.Thread(target=self.monitor_tmux)
         self.monitor_thread.daemon = True
         self.monitor_thread.start()
         print('monitor thread starting')
+
+    def stop_monitoring(self):
+        self.is_running = False
+        self.term_sesh.stop_capture()
+
+    def on_pane_output(self, data):
+        """Publish a raw chunk of pane output; only complete lines are published and checked for errors."""
+        if not self.is_running:
+            return
+        output = '\n'.join(self.cleaner.feed(data))
+        if output:
+            self.term_sesh.wire.send('tmux_output', output)
+            self.detect_errors(output)
+        # The prompt that follows a traceback has no newline, but it already shows that the traceback is over.
+        traceback = self.detector.feed_partial(self.cleaner.partial)
+        if traceback is not None:
+            self.publish_error(traceback)
+
     def monitor_tmux(self):
         while self.is_running:
             output = self.term_sesh.read_tmux_output()
             if output:
-                self.term_sesh.publisher.send_json({
-                    'type': 'tmux_output',
-                    'data': output,
-                    'timestamp': time.time()
-                })
+                self.term_sesh.wire.send('tmux_output', output)
+                self.detect_errors(output)
             time.sleep(1)
+
+    def detect_errors(self, output):
+        for line in output.split('\n'):
+            traceback = self.detector.feed(line)
+            if traceback is not None:
+                self.publish_error(traceback)
+
+    def publish_error(self, traceback):
+        """
+        Publish a detected traceback: the first occurrence of an error class carries the traceback, repeats only
+        carry the fingerprint and the updated count.
+        """
+        error_class, is_new = self.errors.add(traceback)
+        self.term_sesh.wire.send('error', traceback if is_new else b'', {
+            'fingerprint': error_class.fingerprint,
+            'error_type': error_class.error_type,
+            'count': error_class.count,
+            'new': is_new
+        })
@@ -0,0 +1,92 @@
+import re
+import codecs
+from collections import deque
+from typing import Deque, List, Optional, Union
+
+# ANSI escape sequences: CSI ("\x1b[31m", "\x1b[2K", "\x1b[?2004h"), OSC ("\x1b]0;title\x07") and two-character ones.
+ANSI_ESCAPE = re.compile(r'\x1B(?:\[[0-?]*[ -/]*[@-~]|\][^\x07\x1B]*(?:\x07|\x1B\\)|[@-Z\\-_])')
+# An escape sequence cut off by the end of a chunk; it is held back until the rest arrives.
+INCOMPLETE_ESCAPE = re.compile(r'\x1B(?:\[[0-?]*[ -/]*|\][^\x07\x1B]*\x1B?)?$')
+# Powerline / nerd-font glyphs commonly used in prompts.
+PROMPT_GLYPHS = re.compile(r'[\ue0b0-\ue0b3\ue5ff\ue615\ue606\uf48a\uf489\ue0a0]')
+# Other control characters (bell, backspace, ...); tabs and newlines are kept.
+CONTROL_CHARS = re.compile(r'[\x00-\x08\x0B-\x1F\x7F]')
+
+DEFAULT_SCROLLBACK_LINES = 2000
+# Longest escape sequence held back across chunks (OSC window titles can be long).
+MAX_ESCAPE_LENGTH = 4096
+# A line still being written is held back until its newline arrives, up to this many characters.
+MAX_LINE_LENGTH = 64 * 1024
+
+
+def clean_text(text: str) -> str:
+    """Remove escape sequences, prompt glyphs and control characters from complete text."""
+    text = ANSI_ESCAPE.sub('', text)
+    text = PROMPT_GLYPHS.sub('', text)
+    return CONTROL_CHARS.sub('', text)
+
+
+def clean_line(line: str) -> str:
+    # A bare carriage return rewinds the line (progress bars, spinners): only what was written last is visible.
+    line = line.rstrip('\r')
+    if '\r' in line:
+        line = line[line.rfind('\r') + 1:]
+    # Indentation is kept: it is what tells traceback frames apart from the exception line.
+    return clean_text(line).rstrip()
+
+
+class StreamCleaner:
+    """
+    Incrementally cleans raw terminal output.
+
+    feed() takes raw chunks (bytes or text) in the order they were written and returns the newly completed lines,
+    cleaned of escape sequences (even when one is split across two chunks), prompt glyphs and control characters,
+    with empty lines and consecutive duplicates dropped. Only the last `scrollback_lines` lines are retained, so
+    memory stays constant however long the session runs, and every byte is cleaned exactly once.
+    """
+
+    def __init__(self, scrollback_lines: int = DEFAULT_SCROLLBACK_LINES, max_line_length: int = MAX_LINE_LENGTH):
+        self.scrollback: Deque[str] = deque(maxlen=scrollback_lines)
+        self.max_line_length = max_line_length
+        self._decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        self._pending = ''
+        self._last_line: Optional[str] = None
+
+    def feed(self, data: Union[bytes, str]) -> List[str]:
+        if isinstance(data, bytes):
+            data = self._decoder.decode(data)
+        text = self._pending + data
+        held = ''
+        escape = INCOMPLETE_ESCAPE.search(text, max(0, len(text) - MAX_ESCAPE_LENGTH))
+        if escape is not None:
+            text, held = text[:escape.start()], text[escape.start():]
+
+        lines = text.split('\n')
+        partial = lines.pop()
+        if len(partial) > self.max_line_length:
+            partial = partial[-self.max_line_length:]
+        self._pending = partial + held
+
+        new_lines = []
+        for line in lines:
+            line = clean_line(line)
+            if line and line != self._last_line:
+                new_lines.append(line)
+                self._last_line = line
+        self.scrollback.extend(new_lines)
+        return new_lines
+
+    @property
+    def partial(self) -> str:
+        """The cleaned text of the line still being written (e.g. a shell prompt waiting for input)."""
+        return clean_line(self._pending)
+
+    def text(self) -> str:
+        """The retained scrollback."""
+        return '\n'.join(self.scrollback)
+
+    def reset(self):
+        self.scrollback.clear()
+        self._decoder.reset()
+        self._pending = ''
+        self._last_line = None
@@ -1,9 +1,10 @@
 from process_monitor import ProcessMonitor
+from pane_capture import PaneCapture
+from term_cleaner import clean_line
+from wire import WirePublisher, configure_publisher
 from typing import Optional
 import zmq
 import platform
-import base64
-import zlib
 import subprocess
 import traceback
 import time
@@ -15,12 +16,15 @@ class TermSesh:
     def __init__(self, port=5555, terminal_app=None, session_name='zapper_session'):
         self.context = zmq.Context()
         self.publisher = self.context.socket(zmq.PUB)
+        configure_publisher(self.publisher)
         self.publisher.bind(f"tcp://*:{port}")
+        self.wire = WirePublisher(self.publisher)
         self.system = platform.system()
         self.session_name = session_name
         self.terminal_process = None
         self.monitor = None
-        self.tmux_stack = [""]
+        self.pane_capture = None
+        self.last_snapshot = []
 
 
     def send_code_segment(self, code_data):
@@ -33,14 +37,9 @@ class TermSesh:
             'action': 'analyze/edit/debug'
         }
         """
-        # Compress the code content
-        compressed_code = base64.b64encode(
-            zlib.compress(code_data['code'].encode())
-        ).decode()
-        code_data['code'] = compressed_code
-
-        # Send the data
-        self.publisher.send_json(code_data)
+        # The code is the raw payload frame (compressed by the wire layer when large enough), the rest is metadata.
+        metadata = {key: value for key, value in code_data.items() if key != 'code'}
+        self.wire.send('code_segment', code_data['code'], metadata)
 
     def open_new_terminal(self):
         """Create an interactive terminal session with proper error handling"""
@@ -75,6 +74,7 @@ class TermSesh:
 
     def kill_tmux_session(self):
         """Kill the tmux session if it exists"""
+        self.stop_capture()
         try:
             # Check if session exists
             result = subprocess.run(
@@ -87,43 +87,57 @@ class TermSesh:
         except Exception as e:
             print(f"Error killing tmux session: {e}")
 
+    def start_capture(self, on_data) -> bool:
+        """
+        Stream the pane output to `on_data` (raw bytes) as it is written, through tmux pipe-pane.
+        Returns False when streaming is not available, in which case read_tmux_output has to be polled.
+        """
+        self.pane_capture = PaneCapture(self.session_name, on_data)
+        if not self.pane_capture.start():
+            self.pane_capture = None
+            return False
+        return True
+
+    def stop_capture(self):
+        if self.pane_capture:
+            self.pane_capture.stop()
+            self.pane_capture = None
+
     def read_tmux_output(self):
-        """Read output from the tmux session"""
+        """Read the output added to the tmux pane since the last call (polling fallback of start_capture)"""
         try:
             result = subprocess.run(['tmux', 'capture-pane', '-t', self.session_name, '-p'], capture_output=True, text=True)
             if result.stdout:
-                cleaned_output = self.clean_tmux_output(result.stdout)
-                self.tmux_stack.append(cleaned_output)
-                if len(self.tmux_stack[-2]) < len(cleaned_output):
-                    print(cleaned_output[len(self.tmux_stack[-2]):])
-                    return cleaned_output[len(self.tmux_stack[-2]):]
+                lines = self.clean_tmux_output(result.stdout).split('\n')
+                new_lines = lines[self._snapshot_overlap(lines):]
+                # Only the previous screen is kept to diff against.
+                self.last_snapshot = lines
+                if new_lines:
+                    output = '\n'.join(new_lines)
+                    print(output)
+                    return output
             return ""
         except Exception as e:
             print(f"Error reading tmux session: {e}")
             return ""
 
+    def _snapshot_overlap(self, lines):
+        """Number of leading lines of a new snapshot already seen at the end of the previous one"""
+        previous = self.last_snapshot
+        for size in range(min(len(previous), len(lines)), 0, -1):
+            # The last line seen may have been added to since (e.g. a command typed after the prompt).
+            if previous[-size:-1] == lines[:size - 1] and lines[size - 1].startswith(previous[-1]):
+                return size if lines[size - 1] == previous[-1] else size - 1
+        return 0
+
     def clean_tmux_output(self, raw_output: str) -> str:
         """Clean and format tmux output by removing ANSI escape sequences and extra whitespace"""
-        import re
-
-        # Remove ANSI escape sequences
-        ansi_escape = re.compile(r'\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])')
-        # Remove unicode characters commonly used in prompts
-        unicode_chars = re.compile(r'[\ue0b0-\ue0b3\ue5ff\ue615\ue606\uf48a\uf489\ue0a0]')
-
-        # Clean the output
-        cleaned = ansi_escape.sub('', raw_output)
-        cleaned = unicode_chars.sub('', cleaned)
-
-        # Split into lines and remove empty lines
-        lines = [line.strip() for line in cleaned.split('\n')]
-        lines = [line for line in lines if line]
-
-        # Remove duplicate consecutive lines
         unique_lines = []
         prev_line = None
-        for line in lines:
-            if line != prev_line:
+        for line in raw_output.split('\n'):
+            line = clean_line(line)
+            # Remove empty lines and duplicate consecutive lines
+            if line and line != prev_line:
                 unique_lines.append(line)
                 prev_line = line
 
@@ -0,0 +1,157 @@
+"""
+The splat pub/sub wire protocol.
+
+Every message is three frames:
+    1. header:   version (B), type (B), compression (B), reserved (B), sequence (Q), timestamp (d) - network order
+    2. metadata: a small JSON object (may be empty)
+    3. payload:  raw bytes, compressed when the header says so
+
+The payload travels as raw bytes and is handed to zmq without copying, instead of being base64-encoded into JSON.
+Compression is only applied above a size threshold, where it pays for itself.
+"""
+import json
+import time
+import zlib
+import struct
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional, Union
+import zmq
+
+PROTOCOL_VERSION = 1
+HEADER = struct.Struct('!BBBxQd')
+
+# Message types
+MSG_INFO = 1
+MSG_TERMINAL_OUTPUT = 2
+MSG_ERROR = 3
+MSG_CODE_SEGMENT = 4
+MSG_CONTROL = 5
+MESSAGE_TYPES = {
+    'info': MSG_INFO,
+    'tmux_output': MSG_TERMINAL_OUTPUT,
+    'error': MSG_ERROR,
+    'code_segment': MSG_CODE_SEGMENT,
+    'control': MSG_CONTROL,
+}
+MESSAGE_NAMES = {number: name for name, number in MESSAGE_TYPES.items()}
+
+# Compression
+COMPRESSION_NONE = 0
+COMPRESSION_ZLIB = 1
+DEFAULT_COMPRESSION_THRESHOLD = 4096
+DEFAULT_COMPRESSION_LEVEL = 1
+
+# Messages queued per peer before a publisher drops (PUB) or a subscriber stops reading from the network.
+DEFAULT_HWM = 10000
+# Milliseconds a closing socket may spend flushing queued messages.
+DEFAULT_LINGER = 100
+
+
+@dataclass
+class Message:
+    type: int
+    sequence: int
+    timestamp: float
+    metadata: Dict[str, Any] = field(default_factory=dict)
+    payload: Union[bytes, memoryview] = b''
+
+    @property
+    def name(self) -> str:
+        return MESSAGE_NAMES.get(self.type, str(self.type))
+
+    def text(self) -> str:
+        return str(self.payload, 'utf-8', errors='replace')
+
+
+def configure_publisher(socket, hwm: int = DEFAULT_HWM, linger: int = DEFAULT_LINGER):
+    """
+    Bound the send queue of a PUB socket. When a subscriber falls `hwm` messages behind, zmq drops further
+    messages for it rather than letting the publisher's memory grow; the sequence numbers make the gap visible.
+    """
+    socket.setsockopt(zmq.SNDHWM, hwm)
+    socket.setsockopt(zmq.LINGER, linger)
+
+
+def configure_subscriber(socket, hwm: int = DEFAULT_HWM, linger: int = 0):
+    socket.setsockopt(zmq.RCVHWM, hwm)
+    socket.setsockopt(zmq.LINGER, linger)
+    socket.setsockopt(zmq.SUBSCRIBE, b'')
+
+
+class WirePublisher:
+    """
+    Sends protocol messages on a PUB (or any sending) socket. zmq sockets are not thread-safe, so sends from the
+    monitor thread and the shell thread are serialized here.
+    """
+
+    def __init__(self, socket, compression: int = COMPRESSION_ZLIB,
+                 compression_threshold: int = DEFAULT_COMPRESSION_THRESHOLD,
+                 compression_level: int = DEFAULT_COMPRESSION_LEVEL):
+        self.socket = socket
+        self.compression = compression
+        self.compression_threshold = compression_threshold
+        self.compression_level = compression_level
+        self.sequence = 0
+        self.dropped = 0
+        self._lock = threading.Lock()
+
+    def send(self, message_type: Union[int, str], payload: Union[bytes, str] = b'',
+             metadata: Optional[Dict[str, Any]] = None, block: bool = True) -> bool:
+        """
+        Send one message. With block=False, a full send queue drops the message (counted in `dropped`) instead of
+        waiting; a PUB socket never blocks anyway.
+        """
+        if isinstance(message_type, str):
+            message_type = MESSAGE_TYPES[message_type]
+        if isinstance(payload, str):
+            payload = payload.encode('utf-8')
+        compression = COMPRESSION_NONE
+        if self.compression == COMPRESSION_ZLIB and len(payload) >= self.compression_threshold:
+            compressed = zlib.compress(payload, self.compression_level)
+            if len(compressed) < len(payload):
+                payload, compression = compressed, COMPRESSION_ZLIB
+
+        encoded_metadata = json.dumps(metadata).encode('utf-8') if metadata else b''
+        with self._lock:
+            self.sequence += 1
+            header = HEADER.pack(PROTOCOL_VERSION, message_type, compression, self.sequence, time.time())
+            try:
+                self.socket.send_multipart([header, encoded_metadata, payload], flags=0 if block else zmq.NOBLOCK, copy=False)
+            except zmq.Again:
+                self.dropped += 1
+                return False
+        return True
+
+
+class WireSubscriber:
+    """Receives protocol messages and tracks gaps in the sequence (messages dropped at the high-water mark)."""
+
+    def __init__(self, socket):
+        self.socket = socket
+        self.last_sequence = None
+        self.missed = 0
+
+    def decode(self, frames) -> Message:
+        header, metadata, payload = (frame.buffer if hasattr(frame, 'buffer') else frame for frame in frames[:3])
+        # The payload stays a view of the zmq frame unless it has to be decompressed.
+        version, message_type, compression, sequence, timestamp = HEADER.unpack(header)
+        if version != PROTOCOL_VERSION:
+            raise ValueError(f"Unsupported splat wire protocol version {version}")
+        if compression == COMPRESSION_ZLIB:
+            payload = zlib.decompress(payload)
+        elif compression != COMPRESSION_NONE:
+            raise ValueError(f"Unsupported compression {compression}")
+
+        # A restarted publisher starts over at 1.
+        if self.last_sequence is not None and sequence > self.last_sequence + 1:
+            self.missed += sequence - self.last_sequence - 1
+        self.last_sequence = sequence
+        return Message(message_type, sequence, timestamp, json.loads(bytes(metadata)) if len(metadata) else {}, payload)
+
+    def receive(self, block: bool = True) -> Optional[Message]:
+        try:
+            frames = self.socket.recv_multipart(flags=0 if block else zmq.NOBLOCK, copy=False)
+        except zmq.Again:
+            return None
+        return self.decode(frames)
@@ -0,0 +1,155 @@
+"""
+Local pub/sub benchmark of the splat wire protocol, against the JSON + zlib + base64 encoding it replaced.
+
+    python cli/wire_benchmark.py --messages 20000 --size 512 --size 65536
+
+Publisher and subscriber run in one process on tcp://127.0.0.1, each on its own thread. Throughput is measured at
+the subscriber over a burst; latency is the time from send to decode, from the timestamp carried in each message,
+over a separate paced run.
+"""
+import time
+import zlib
+import base64
+import threading
+import statistics
+import click
+import zmq
+from wire import (
+    COMPRESSION_NONE,
+    COMPRESSION_ZLIB,
+    DEFAULT_COMPRESSION_THRESHOLD,
+    WirePublisher,
+    WireSubscriber,
+    configure_publisher,
+    configure_subscriber,
+)
+
+# Subscribers only receive what is published after they connect; the publisher waits this long first.
+SLOW_JOINER_DELAY = 0.3
+# Latency is measured on a separate, paced run, so that it is not dominated by the queue built up by a burst.
+LATENCY_MESSAGES = 500
+LATENCY_INTERVAL = 0.001
+
+
+def make_payload(size: int) -> bytes:
+    # Terminal output and code compress well; a repeated source-like line is a fair stand-in.
+    line = b'    File "/srv/app/handlers.py", line 128, in handle_request: value = compute(item) \n'
+    return (line * (size // len(line) + 1))[:size]
+
+
+class WireCodec:
+    def __init__(self, compression):
+        self.compression = compression
+
+    def open(self, publisher_socket, subscriber_socket):
+        self.publisher = WirePublisher(publisher_socket, compression=self.compression)
+        self.subscriber = WireSubscriber(subscriber_socket)
+
+    def send(self, payload):
+        self.publisher.send('tmux_output', payload)
+
+    def receive(self):
+        return self.subscriber.receive().timestamp
+
+
+class LegacyCodec:
+    """The encoding used before the wire protocol: zlib, then base64, inside a JSON object."""
+
+    def open(self, publisher_socket, subscriber_socket):
+        self.publisher_socket = publisher_socket
+        self.subscriber_socket = subscriber_socket
+
+    def send(self, payload):
+        self.publisher_socket.send_json({
+            'code': base64.b64encode(zlib.compress(payload)).decode(),
+            'timestamp': time.time()
+        })
+
+    def receive(self):
+        data = self.subscriber_socket.recv_json()
+        zlib.decompress(base64.b64decode(data['code']))
+        return data['timestamp']
+
+
+def run(context, endpoint, codec, payload, messages, interval=0.0):
+    """Publish `messages` copies of the payload; returns (latencies, elapsed seconds, messages not received)."""
+    publisher_socket = context.socket(zmq.PUB)
+    subscriber_socket = context.socket(zmq.SUB)
+    try:
+        configure_publisher(publisher_socket, hwm=messages, linger=0)
+        publisher_socket.bind(endpoint)
+        configure_subscriber(subscriber_socket, hwm=messages)
+        subscriber_socket.setsockopt(zmq.RCVTIMEO, 2000)
+        subscriber_socket.connect(endpoint)
+        codec.open(publisher_socket, subscriber_socket)
+        latencies = []
+
+        def receive():
+            try:
+                while len(latencies) < messages:
+                    sent = codec.receive()
+                    latencies.append(time.time() - sent)
+            except zmq.Again:
+                pass
+
+        reader = threading.Thread(target=receive)
+        reader.start()
+        time.sleep(SLOW_JOINER_DELAY)
+        start = time.perf_counter()
+        for _ in range(messages):
+            codec.send(payload)
+            if interval:
+                time.sleep(interval)
+        reader.join()
+        return latencies, time.perf_counter() - start, messages - len(latencies)
+    finally:
+        publisher_socket.close(linger=0)
+        subscriber_socket.close(linger=0)
+
+
+def report(name, size, throughput_run, latency_run):
+    latencies, elapsed, missed = throughput_run
+    paced = sorted(latency_run[0])
+    if not latencies or not paced:
+        click.echo(f"{name:<14} {size:>8}  nothing received")
+        return
+    received = len(latencies)
+    p50 = statistics.median(paced) * 1e6
+    p99 = paced[min(len(paced) - 1, int(len(paced) * 0.99))] * 1e6
+    click.echo(
+        f"{name:<14} {size:>8} {received / elapsed:>12,.0f} {received * size / elapsed / 1e6:>10.1f}"
+        f" {p50:>10.0f} {p99:>10.0f} {missed:>7}"
+    )
+
+
+@click.command()
+@click.option('--messages', default=20000, show_default=True, help='Messages per run.')
+@click.option('--size', 'sizes', multiple=True, type=int, default=(256, 4096, 65536), show_default=True,
+              help='Payload size in bytes; repeat for several runs.')
+@click.option('--port', default=5599, show_default=True)
+def main(messages, sizes, port):
+    """Benchmark splat's pub/sub wire protocol on localhost."""
+    context = zmq.Context()
+    codecs = [
+        ('wire', lambda: WireCodec(COMPRESSION_ZLIB)),
+        ('wire raw', lambda: WireCodec(COMPRESSION_NONE)),
+        ('json+b64+zlib', LegacyCodec),
+    ]
+    click.echo(f"{'encoding':<14} {'bytes':>8} {'msg/s':>12} {'MB/s':>10} {'p50 us':>10} {'p99 us':>10} {'missed':>7}")
+    try:
+        # A fresh port per run: a closed socket releases its port asynchronously.
+        endpoints = (f"tcp://127.0.0.1:{port + offset}" for offset in range(len(sizes) * len(codecs) * 2))
+        for size in sizes:
+            payload = make_payload(size)
+            for name, codec in codecs:
+                throughput_run = run(context, next(endpoints), codec(), payload, messages)
+                latency_run = run(context, next(endpoints), codec(), payload, LATENCY_MESSAGES, LATENCY_INTERVAL)
+                report(name, size, throughput_run, latency_run)
+    finally:
+        context.term()
+    click.echo(f"msg/s and MB/s: burst of {messages} messages; latency: {LATENCY_MESSAGES} messages sent "
+               f"{LATENCY_INTERVAL * 1000:g} ms apart. wire compresses payloads of {DEFAULT_COMPRESSION_THRESHOLD} bytes and more.")
+
+
+if __name__ == '__main__':
+    main()
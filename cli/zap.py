@@ -1,38 +1,140 @@
 # auto_debugger.py
-import time
+import os
+import json
+import uuid
 import zmq
 import threading
+import traceback
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+from wire import MSG_ERROR, WireSubscriber, configure_subscriber
+
+# Analyses running at once; each one is mostly waiting on the LLM.
+DEFAULT_WORKERS = 2
 
-#from relational import relational_error_parsing_function
 
 class Zapper:
-    def __init__(self, port=5555):
+    """
+    Consumes what TermSesh publishes and analyzes every new error seen in the terminal.
+
+    The ProcessMonitor detects tracebacks in the pane output and publishes them as 'error' messages, the first
+    occurrence of each error class carrying the traceback. Zapper receives them on a SUB socket (waiting in
+    zmq.Poller, so it only wakes up for messages) and runs parse -> context -> LLM for each new class on a worker
+    pool. stop() wakes the poller through an inproc control socket.
+    """
+
+    def __init__(self, port=5555, workers: int = DEFAULT_WORKERS, flag: str = "",
+                 on_result: Optional[Callable[[str, str, Optional[str]], None]] = None):
         self.context = zmq.Context()
+        self.endpoint = f"tcp://localhost:{port}"
+        self.control_endpoint = f"inproc://zapper-control-{uuid.uuid4().hex}"
+        self.flag = flag
+        self.project_root = os.getcwd()
+        self.on_result = on_result or self.print_result
         self.running = False
         self.subscriber_thread = None
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='zapper')
+        # One analysis per error class, keyed by fingerprint.
+        self.analyses: Dict[str, Future] = {}
+        self._started = threading.Event()
 
     def start(self):
-        """Start the publisher thread"""
+        """Start the subscriber thread"""
         self.running = True
         self.subscriber_thread = threading.Thread(target=self.run_subscriber)
         self.subscriber_thread.daemon = True
         self.subscriber_thread.start()
-        print("ZMQ publisher thread started")
+        self._started.wait()
+        print("ZMQ subscriber thread started")
 
     def run_subscriber(self):
-        while self.running:
-            try:
-                # Implement subscriber logic if needed
-                pass
-            except Exception as e:
-                print(f"Error in Zapper subscriber: {e}")
-            time.sleep(0.1)
+        # The sockets are created and used on this thread only.
+        subscriber = self.context.socket(zmq.SUB)
+        configure_subscriber(subscriber)
+        subscriber.connect(self.endpoint)
+        control = self.context.socket(zmq.PAIR)
+        control.bind(self.control_endpoint)
+        wire = WireSubscriber(subscriber)
+        poller = zmq.Poller()
+        poller.register(subscriber, zmq.POLLIN)
+        poller.register(control, zmq.POLLIN)
+        self._started.set()
+        try:
+            while True:
+                events = dict(poller.poll())
+                if control in events:
+                    control.recv()
+                    break
+                if subscriber in events:
+                    # Drain everything that is queued before polling again.
+                    while True:
+                        try:
+                            message = wire.receive(block=False)
+                        except zmq.ZMQError:
+                            # The socket or the context is gone; polling it again would fail the same way.
+                            raise
+                        except Exception as e:
+                            # A malformed message; it has been consumed, so the next one can still be read.
+                            print(f"Error in Zapper subscriber: {e}")
+                            continue
+                        if message is None:
+                            break
+                        self.handle_message(message)
+        except zmq.ZMQError as e:
+            if e.errno != zmq.ETERM:
+                print(f"Zapper subscriber stopped: {e}")
+        finally:
+            subscriber.close(linger=0)
+            control.close(linger=0)
+
+    def handle_message(self, message):
+        if message.type != MSG_ERROR or not message.metadata.get('new'):
+            return
+        fingerprint = message.metadata.get('fingerprint')
+        if fingerprint in self.analyses:
+            return
+        self.analyses[fingerprint] = self.executor.submit(self.analyze, fingerprint, message.text())
+
+    def analyze(self, fingerprint: str, error_traceback: str):
+        """parse -> context -> LLM for one traceback; runs on the worker pool."""
+        # Imported here: the pipeline pulls in the LLM client, which the shell does not need until an error shows up.
+        from relational import build_context
+        from process.process import process
+        try:
+            lines = error_traceback.strip().splitlines()
+            error_information = lines[-1] if lines else ""
+            context = build_context(error_traceback, self.flag, self.project_root)
+            answer = process(error_traceback, error_information, context)
+        except Exception:
+            traceback.print_exc()
+            answer = None
+        self.on_result(fingerprint, error_traceback, answer)
+        return answer
+
+    def print_result(self, fingerprint: str, error_traceback: str, answer: Optional[str]):
+        if answer is None:
+            print(f"\n[zap] Could not analyze error {fingerprint[:8]}")
+            return
+        try:
+            data = json.loads(answer)
+            print(f"\n[zap] {data['what']['error_type']} in {data['where']['file_name']} "
+                  f"line {data['where']['line_number']}: {data['what']['description']}")
+            print(f"[zap] Suggested fix:\n{data['how']['suggested_code_solution']}")
+        except (ValueError, KeyError, TypeError):
+            print(f"\n[zap] {answer}")
 
     def stop(self):
-        """Stop publisher threads"""
+        """Stop the subscriber thread and the workers"""
+        if not self.running:
+            return
         self.running = False
+        control = self.context.socket(zmq.PAIR)
+        control.connect(self.control_endpoint)
+        control.send(b'stop')
         if self.subscriber_thread:
             self.subscriber_thread.join()
+        control.close(linger=0)
+        self.executor.shutdown(wait=False, cancel_futures=True)
         self.context.term()
 
 
@@ -2,41 +2,275 @@ import subprocess
 import os
 import sys
 import shlex
+import signal
 import threading
 import json
 import logging
+import time
+import queue
+from collections import deque
+from typing import Callable, Deque, Iterator, List, Optional, Tuple
+from utils.traceback_parser import TracebackDetector
 
 logging.basicConfig(level=logging.ERROR)
 
-def run_command(command):
+# Bytes of each stream kept in memory; older output is discarded.
+DEFAULT_MAX_BYTES = 4 * 1024 * 1024
+# Lines kept before each detected traceback, and how many tracebacks are kept after they scroll out of the buffer.
+TRACEBACK_CONTEXT_LINES = 20
+MAX_TRACEBACKS = 16
+READ_SIZE = 64 * 1024
+# Chunks held for a live consumer that is not keeping up before new chunks are dropped.
+LIVE_QUEUE_SIZE = 1024
+# How long a process gets to exit on its own after an early return, before it is killed.
+TERMINATE_TIMEOUT = 2
+# A traceback that only needs its next line is complete once the process has been silent this long (e.g. a server
+# that logged an exception and carried on).
+QUIET_SECONDS = 0.25
+
+
+class RingBuffer:
+    """A byte buffer that keeps only the last `max_bytes` bytes written to it."""
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.dropped = 0
+        self._chunks: Deque[bytes] = deque()
+        self._size = 0
+
+    def write(self, data: bytes):
+        if len(data) >= self.max_bytes:
+            self.dropped += self._size + len(data) - self.max_bytes
+            self._chunks.clear()
+            data = data[-self.max_bytes:]
+            self._size = 0
+        self._chunks.append(data)
+        self._size += len(data)
+        while self._size > self.max_bytes:
+            head = self._chunks[0]
+            excess = self._size - self.max_bytes
+            if len(head) <= excess:
+                self._chunks.popleft()
+                self._size -= len(head)
+                self.dropped += len(head)
+            else:
+                self._chunks[0] = head[excess:]
+                self._size -= excess
+                self.dropped += excess
+
+    def getvalue(self) -> bytes:
+        return b''.join(self._chunks)
+
+    def __len__(self) -> int:
+        return self._size
+
+
+class OutputCapture:
+    """
+    Bounded capture of a process's stdout and stderr.
+
+    Raw bytes go into one ring buffer per stream. Complete lines are also run through a TracebackDetector, and each
+    detected traceback is kept (with its leading context) even after it has scrolled out of the ring buffer.
+    Consumers can follow the output live through the `on_output` callback or the `iter_output()` generator.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES,
+                 on_output: Optional[Callable[[str, bytes], None]] = None,
+                 on_traceback: Optional[Callable[[str, str], None]] = None,
+                 live: bool = False):
+        self.buffers = {'stdout': RingBuffer(max_bytes), 'stderr': RingBuffer(max_bytes)}
+        self.tracebacks: Deque[str] = deque(maxlen=MAX_TRACEBACKS)
+        self.traceback_detected = threading.Event()
+        self.on_output = on_output
+        self.on_traceback = on_traceback
+        self._detectors = {name: TracebackDetector(TRACEBACK_CONTEXT_LINES) for name in self.buffers}
+        self._partial = {name: b'' for name in self.buffers}
+        self._lock = threading.Lock()
+        self._live: Optional[queue.Queue] = queue.Queue(LIVE_QUEUE_SIZE) if live else None
+        self._closed = threading.Event()
+        self.last_output = time.monotonic()
+
+    def feed(self, stream: str, data: bytes):
+        """Record a chunk of raw output from `stream` ('stdout' or 'stderr')."""
+        detected: List[str] = []
+        with self._lock:
+            self.last_output = time.monotonic()
+            self.buffers[stream].write(data)
+            lines = (self._partial[stream] + data).split(b'\n')
+            self._partial[stream] = lines.pop()
+            # A pathological line without newlines must not grow without bound either.
+            if len(self._partial[stream]) > self.buffers[stream].max_bytes:
+                self._partial[stream] = self._partial[stream][-self.buffers[stream].max_bytes:]
+            for line in lines:
+                self._detect(detected, self._detectors[stream].feed(line.decode('utf-8', errors='replace')))
+
+        # Callbacks run outside the lock, so that they can read the capture.
+        self._notify(stream, detected)
+        if self.on_output is not None:
+            self.on_output(stream, data)
+        if self._live is not None:
+            try:
+                self._live.put_nowait((stream, data))
+            except queue.Full:
+                pass
+
+    def _detect(self, detected: List[str], traceback: Optional[str]):
+        if traceback is not None:
+            self.tracebacks.append(traceback)
+            detected.append(traceback)
+
+    def _notify(self, stream: str, detected: List[str]):
+        if not detected:
+            return
+        self.traceback_detected.set()
+        if self.on_traceback is not None:
+            for traceback in detected:
+                self.on_traceback(stream, traceback)
+
+    def idle(self):
+        """Complete the tracebacks that only wait for a next line, the output having gone quiet."""
+        detected = {stream: [] for stream in self._detectors}
+        with self._lock:
+            for stream, detector in self._detectors.items():
+                if not detector.pending:
+                    continue
+                if self._partial[stream]:
+                    # An unterminated line (e.g. a prompt) decides whether it continues the traceback.
+                    self._detect(detected[stream], detector.feed_partial(self._partial[stream].decode('utf-8', errors='replace')))
+                else:
+                    self._detect(detected[stream], detector.flush())
+        for stream, tracebacks in detected.items():
+            self._notify(stream, tracebacks)
+
+    def close(self):
+        """Mark the end of the output; a traceback still being collected is completed."""
+        detected = {stream: [] for stream in self._detectors}
+        with self._lock:
+            for stream, detector in self._detectors.items():
+                if self._partial[stream]:
+                    self._detect(detected[stream], detector.feed(self._partial[stream].decode('utf-8', errors='replace')))
+                    self._partial[stream] = b''
+                self._detect(detected[stream], detector.flush())
+        for stream, tracebacks in detected.items():
+            self._notify(stream, tracebacks)
+        self._closed.set()
+        if self._live is not None:
+            try:
+                self._live.put_nowait(None)
+            except queue.Full:
+                pass
+
+    def iter_output(self, timeout: Optional[float] = None) -> Iterator[Tuple[str, bytes]]:
+        """Yield (stream, chunk) pairs as they arrive, until the capture is closed. Requires live=True."""
+        if self._live is None:
+            raise RuntimeError("OutputCapture was created without live=True")
+        while True:
+            try:
+                item = self._live.get(timeout=timeout)
+            except queue.Empty:
+                if self._closed.is_set():
+                    return
+                continue
+            if item is None:
+                return
+            yield item
+
+    def text(self, stream: str) -> str:
+        """The retained output of a stream, with tracebacks that scrolled out of the buffer put back in front."""
+        with self._lock:
+            buffer = self.buffers[stream]
+            value = buffer.getvalue().decode('utf-8', errors='replace')
+            if buffer.dropped and stream == 'stderr':
+                lost = [traceback for traceback in self.tracebacks if traceback not in value]
+                if lost:
+                    value = '\n'.join(lost) + f"\n[... {buffer.dropped} bytes of output discarded ...]\n" + value
+            return value
+
+
+def _pump(pipe, stream: str, capture: OutputCapture):
+    fd = pipe.fileno()
+    while True:
+        data = os.read(fd, READ_SIZE)
+        if not data:
+            break
+        capture.feed(stream, data)
+
+
+def run_command(command, max_bytes: int = DEFAULT_MAX_BYTES,
+                on_output: Optional[Callable[[str, bytes], None]] = None,
+                stop_on_traceback: bool = False,
+                timeout: Optional[float] = None,
+                capture: Optional[OutputCapture] = None):
+    """
+    Run a command and capture its output in bounded memory.
+
+    Output is kept raw (indentation included) and only the last `max_bytes` of each stream are retained, plus any
+    detected tracebacks. With `stop_on_traceback`, the call returns as soon as a complete traceback has been seen
+    instead of waiting for the process to exit (the process is then terminated); a traceback that is the last output
+    of a process still running is complete after QUIET_SECONDS of silence.
+    Returns (stdout, stderr, returncode).
+    """
+    if capture is not None and on_output is not None:
+        if capture.on_output is not None:
+            raise ValueError("on_output cannot be given along with a capture that already has one")
+        capture.on_output = on_output
     process = subprocess.Popen(
-        shlex.split(command),
+        shlex.split(command) if isinstance(command, str) else command,
         stdout=subprocess.PIPE,
         stderr=subprocess.PIPE,
-        text=True,
-        bufsize=1,
-        universal_newlines=True
+        bufsize=0,
     )
+    capture = capture or OutputCapture(max_bytes, on_output=on_output)
 
-    def read_output(pipe, lines):
-        for line in pipe:
-            line = line.strip()
-            lines.append(line)
+    threads: List[threading.Thread] = [
+        threading.Thread(target=_pump, args=(process.stdout, 'stdout', capture), daemon=True),
+        threading.Thread(target=_pump, args=(process.stderr, 'stderr', capture), daemon=True),
+    ]
+    for thread in threads:
+        thread.start()
 
-    stdout, stderr = [], []
+    def wait_for_exit():
+        for thread in threads:
+            thread.join()
+        capture.close()
 
-    stdout_thread = threading.Thread(target=read_output, args=(process.stdout, stdout))
-    stderr_thread = threading.Thread(target=read_output, args=(process.stderr, stderr))
+    waiter = threading.Thread(target=wait_for_exit, daemon=True)
+    waiter.start()
 
-    stdout_thread.start()
-    stderr_thread.start()
+    if stop_on_traceback:
+        # Whichever comes first: a complete traceback, the end of the output, or the timeout.
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not capture.traceback_detected.wait(0.05):
+            if not waiter.is_alive() or (deadline is not None and time.monotonic() >= deadline):
+                break
+            if time.monotonic() - capture.last_output >= QUIET_SECONDS:
+                capture.idle()
+    else:
+        waiter.join(timeout)
 
-    stdout_thread.join()
-    stderr_thread.join()
+    if waiter.is_alive():
+        process.terminate()
+        try:
+            process.wait(timeout=TERMINATE_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            process.kill()
+        waiter.join(TERMINATE_TIMEOUT)
 
     return_code = process.wait()
 
-    return '\n'.join(stdout), '\n'.join(stderr), return_code
+    return capture.text('stdout'), capture.text('stderr'), return_code
+
+def check_command(command, timeout: Optional[float] = None) -> Tuple[bool, str, int]:
+    """
+    Run a command to check whether it works, returning as soon as it prints a complete traceback.
+    Returns (passed, stderr, returncode). A command still running when `timeout` expires (e.g. a server that came up
+    fine) has passed, unless it printed a traceback.
+    """
+    capture = OutputCapture()
+    _, stderr, return_code = run_command(command, stop_on_traceback=True, timeout=timeout, capture=capture)
+    stopped = return_code in (-signal.SIGTERM, -signal.SIGKILL)
+    passed = return_code == 0 or (stopped and not capture.traceback_detected.is_set())
+    return passed, stderr, return_code
 
 def splat_find(command ):
     if command:
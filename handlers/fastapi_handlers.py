@@ -1,11 +1,12 @@
 import os
-import subprocess
-import time
-import select
 import re
-from typing import Dict, List
+import asyncio
+from dataclasses import dataclass
+from typing import Dict, List, Optional
 import click
 from process.process import process
+from errortrace import RingBuffer
+from utils.traceback_parser import TracebackDetector
 
 def parse_fastapi_error(error_info: str) -> Dict[str, List[str]]:
     endpoints = []
@@ -33,55 +34,176 @@ def parse_fastapi_error(error_info: str) -> Dict[str, List[str]]:
         "error_types": list(dict.fromkeys(error_types))
     }
 
-def compile_project(project_dir):
-    """Run the FastAPI project in the specified directory and capture any errors."""
-    os.chdir(project_dir)
-    process = subprocess.Popen(
-        ["python", "src/app/main.py", "--log-level", "error"],
-        stdout=subprocess.DEVNULL,
-        stderr=subprocess.PIPE,
-        text=True,
-    )
-    
-    output = []
-    error_detected = False
-    start_time = time.time()
-    
-    while True:
-        reads = [process.stdout.fileno(), process.stderr.fileno()]
-        ret = select.select(reads, [], [], 0.5)
-
-        for fd in ret[0]:
-            if fd == process.stdout.fileno():
-                line = process.stdout.readline()
-                output.append(line)
-            if fd == process.stderr.fileno():
-                line = process.stderr.readline()
-                output.append(line)
-
-        full_output = "".join(output)
-        if "ERROR:" in full_output and not error_detected:
-            error_detected = True
-
-        # Stop capturing after 30 seconds or if an error is detected
-        if error_detected or (time.time() - start_time > 30):
-            break
-
-        if process.poll() is not None:
-            break
-        
+# Patterns (searched in each new line of output) that start an error block, and that tell the server is up.
+ERROR_PATTERNS = [r'\bERROR:']
+READY_PATTERNS = [r'Application startup complete', r'Uvicorn running on']
+# The server is logged at info level, so that its readiness lines are printed.
+DEFAULT_COMMAND = ["python", "src/app/main.py", "--log-level", "info"]
+# How long the server gets to come up (or fail), and how long it is watched once it is up.
+STARTUP_TIMEOUT = 30
+READY_GRACE = 1.0
+# An error line or traceback followed by this much silence is complete.
+QUIET_SECONDS = 0.25
+# How long the server gets to exit after it is terminated, before it is killed.
+TERMINATE_TIMEOUT = 5
+READ_SIZE = 64 * 1024
+
+
+class ErrorBlockDetector:
+    """
+    Finds complete error blocks in the lines of one output stream: a line matching one of the error patterns, with
+    the traceback that follows it if any, or a traceback on its own.
+
+    A block is returned by feed() as soon as a later line shows it is over, by idle() if the stream goes quiet after
+    it, and by flush() when the stream ends.
+    """
+
+    def __init__(self, error_patterns: List[str] = ERROR_PATTERNS):
+        self.error_pattern = re.compile('|'.join(f'(?:{pattern})' for pattern in error_patterns))
+        self.tracebacks = TracebackDetector(context_lines=0)
+        # An error line waiting for its traceback, or for the line that shows it has none.
+        self.header: Optional[str] = None
+
+    def _block(self, traceback: Optional[str]) -> Optional[str]:
+        header, self.header = self.header, None
+        return '\n'.join(part for part in (header, traceback) if part) or None
+
+    def feed(self, line: str) -> Optional[str]:
+        traceback = self.tracebacks.feed(line)
+        if traceback is not None:
+            block = self._block(traceback)
+            if self.error_pattern.search(line):
+                self.header = line.rstrip('\r\n')
+            return block
+        if self.tracebacks.collecting:
+            return None
+        if self.error_pattern.search(line):
+            previous, self.header = self.header, line.rstrip('\r\n')
+            return previous
+        if self.header is not None and line.strip():
+            return self._block(None)
+        return None
+
+    def idle(self) -> Optional[str]:
+        if self.tracebacks.pending:
+            return self._block(self.tracebacks.flush())
+        if self.header is not None and not self.tracebacks.collecting:
+            return self._block(None)
+        return None
+
+    def flush(self) -> Optional[str]:
+        return self._block(self.tracebacks.flush())
+
+
+@dataclass
+class ServerRun:
+    output: str
+    # The first complete error block, if any.
+    error: Optional[str]
+    ready: bool
+    # None when the server had not exited on its own by the time watching stopped.
+    returncode: Optional[int]
+    elapsed: float
+
+
+async def _stop(process: asyncio.subprocess.Process):
+    if process.returncode is not None:
+        return
     process.terminate()
     try:
-        process.wait(timeout=5)
-    except subprocess.TimeoutExpired:
+        await asyncio.wait_for(process.wait(), TERMINATE_TIMEOUT)
+    except asyncio.TimeoutError:
         process.kill()
-    
-    # Capture any remaining output
-    stdout, stderr = process.communicate()
-    output.extend([stdout, stderr])
-    
-    full_output = "".join(output)
-    return full_output
+        await process.wait()
+
+
+async def supervise_server(command: List[str], cwd: Optional[str] = None,
+                           error_patterns: List[str] = ERROR_PATTERNS, ready_patterns: List[str] = READY_PATTERNS,
+                           timeout: float = STARTUP_TIMEOUT, ready_grace: float = READY_GRACE,
+                           quiet: float = QUIET_SECONDS) -> ServerRun:
+    """
+    Run a dev server and watch both of its pipes until an error block is complete, until it has been up for
+    `ready_grace` seconds, until it exits, or for `timeout` seconds at most. The server is stopped then.
+
+    Output is read without blocking as it arrives; only new lines are matched against the patterns.
+    """
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    ready_pattern = re.compile('|'.join(f'(?:{pattern})' for pattern in ready_patterns)) if ready_patterns else None
+    process = await asyncio.create_subprocess_exec(
+        *command, cwd=cwd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+    )
+    streams = {'stdout': process.stdout, 'stderr': process.stderr}
+    detectors = {name: ErrorBlockDetector(error_patterns) for name in streams}
+    partial = {name: b'' for name in streams}
+    # Both streams, in the order their output arrived.
+    output = RingBuffer()
+    error: Optional[str] = None
+    ready_at: Optional[float] = None
+    exited = False
+
+    def feed(name: str, data: bytes) -> Optional[str]:
+        nonlocal ready_at
+        lines = (partial[name] + data).split(b'\n')
+        partial[name] = lines.pop()[-READ_SIZE:]
+        block = None
+        for raw in lines:
+            line = raw.decode('utf-8', errors='replace')
+            if ready_at is None and ready_pattern is not None and ready_pattern.search(line):
+                ready_at = loop.time()
+            block = block or detectors[name].feed(line)
+        return block
+
+    reads = {name: asyncio.ensure_future(stream.read(READ_SIZE)) for name, stream in streams.items()}
+    try:
+        while reads and error is None:
+            end = started + timeout if ready_at is None else min(started + timeout, ready_at + ready_grace)
+            remaining = end - loop.time()
+            if remaining <= 0:
+                break
+            done, _ = await asyncio.wait(reads.values(), timeout=min(quiet, remaining),
+                                         return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                for detector in detectors.values():
+                    error = error or detector.idle()
+                continue
+            for name in [name for name, task in reads.items() if task in done]:
+                data = reads.pop(name).result()
+                if data:
+                    output.write(data)
+                    error = error or feed(name, data)
+                    reads[name] = asyncio.ensure_future(streams[name].read(READ_SIZE))
+                else:
+                    error = error or feed(name, b'\n' if partial[name] else b'') or detectors[name].flush()
+    finally:
+        for task in reads.values():
+            task.cancel()
+        exited = not reads or process.returncode is not None
+        await _stop(process)
+
+    # Whatever the server printed while it was shutting down.
+    for name in reads:
+        try:
+            output.write(await asyncio.wait_for(streams[name].read(), TERMINATE_TIMEOUT))
+        except (asyncio.TimeoutError, ValueError):
+            pass
+    return ServerRun(
+        output=output.getvalue().decode('utf-8', errors='replace'),
+        error=error,
+        ready=ready_at is not None,
+        returncode=process.returncode if exited else None,
+        elapsed=loop.time() - started,
+    )
+
+
+async def compile_project_async(project_dir, command: List[str] = DEFAULT_COMMAND, **options) -> ServerRun:
+    """Run the FastAPI project in the specified directory and capture its first error, if any."""
+    return await supervise_server(command, cwd=project_dir, **options)
+
+
+def compile_project(project_dir):
+    """Run the FastAPI project in the specified directory and capture any errors."""
+    return asyncio.run(compile_project_async(project_dir)).output
 
 def process_error(error_message):
     """Process the error message and generate human-readable explanation."""
@@ -6,9 +6,12 @@ This implementation is a pipeline that is a readable version of splat, where the
 # [START module.py]
 import os
 import json
+import shlex
 from typing import List
 from relational import relational_error_parsing_function
-from process.process import process
+from process.process import process_stream
+from terminalout.terminal import terminalstep1_stream
+from verify import verify_fix
 
 def main():
   """
@@ -28,7 +31,13 @@ def main():
   traceback, error_info, repopack = relational_error_parsing_function(entrypoint, flag)
 
   # LLM now takes the data (all file context as type str, error message as type str)
-  response: object = process(traceback, error_info, repopack)
-  '''NOW WE NEED TO SPIT THIS BACK INTO THE CLI SEQUENTIALLY'''
+  # The answer is streamed: "where" and "what" are shown as soon as they are generated, before "how" is done.
+  apply, response = terminalstep1_stream(process_stream(traceback, error_info, repopack))
+
+  # The accepted fix is written and checked by re-running the entrypoint; a new error is sent back to the LLM, within
+  # a budget of iterations and time.
+  if apply:
+    result = verify_fix(shlex.join(entrypoint), traceback, response, flag=flag)
+    print(result.summary())
 
 # [END module.py]
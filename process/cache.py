@@ -0,0 +1,181 @@
+# [START process/cache.py]
+"""
+A local cache of LLM answers, so re-analyzing the same error against the same code does not go over the network.
+Entries are keyed by a hash of everything that determines the answer: the model, the prompt template, the
+normalized traceback and the content of every file in the context. Editing any of those files changes the key.
+
+@note: entries expire after `ttl` seconds, and the least recently used ones are evicted beyond `max_entries`
+  entries or `max_bytes` bytes of stored answers.
+@note: the database lives in "<project_root>/.splat/responses.db" unless a path is given.
+"""
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+from typing import Dict, Iterable, Optional, Union
+from utils.bundle import ContextBundle
+from utils.traceback_parser import normalize_traceback
+
+CACHE_DIRNAME = '.splat'
+CACHE_FILENAME = 'responses.db'
+SCHEMA_VERSION = 1
+DEFAULT_TTL = 7 * 24 * 60 * 60
+DEFAULT_MAX_ENTRIES = 1000
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+
+'''
+Computes the cache key of an LLM request.
+@param model: str - The model name.
+@param prompt_template: str - The fixed part of the prompt (system messages); changing it invalidates every entry.
+@param traceback_message: str - The traceback, normalized before hashing.
+@param original_error_information: str - The error summary sent along with the traceback.
+@param context: Union[str, ContextBundle] - A bundle is hashed by the content of its files, a string as is.
+@returns: str - A sha256 hex digest.
+'''
+def cache_key(model: str, prompt_template: str, traceback_message: str, original_error_information: str,
+              context: Union[str, ContextBundle]) -> str:
+  if isinstance(context, ContextBundle):
+    context_key: Union[str, list] = sorted(context.content_hashes().items())
+  else:
+    context_key = hashlib.sha256(str(context).encode('utf-8', errors='replace')).hexdigest()
+  payload = json.dumps([
+    model,
+    hashlib.sha256(prompt_template.encode('utf-8')).hexdigest(),
+    normalize_traceback(traceback_message),
+    normalize_traceback(original_error_information),
+    context_key,
+  ])
+  return hashlib.sha256(payload.encode('utf-8', errors='replace')).hexdigest()
+
+class ResponseCache:
+  """
+  Stores LLM answers by cache_key, along with the files of the context they were computed from.
+
+  Usage:
+    cache = ResponseCache(project_root)
+    answer = cache.get(key)
+    if answer is None:
+      answer = ask_the_model(...)
+      cache.put(key, answer, files=context.files())
+  """
+
+  def __init__(self, project_root: Optional[str] = None, path: Optional[str] = None, ttl: float = DEFAULT_TTL,
+               max_entries: int = DEFAULT_MAX_ENTRIES, max_bytes: int = DEFAULT_MAX_BYTES):
+    if path is None:
+      cache_dir = os.path.join(os.path.abspath(project_root or os.getcwd()), CACHE_DIRNAME)
+      os.makedirs(cache_dir, exist_ok=True)
+      path = os.path.join(cache_dir, CACHE_FILENAME)
+    self.path = path
+    self.ttl = ttl
+    self.max_entries = max_entries
+    self.max_bytes = max_bytes
+    self.hits = 0
+    self.misses = 0
+    # Requests may be answered from several threads (see process_many); sqlite3 connections are not shared safely.
+    self._lock = threading.Lock()
+    self._conn = sqlite3.connect(self.path, check_same_thread=False)
+    self._conn.execute('PRAGMA journal_mode=WAL')
+    self._conn.execute('PRAGMA synchronous=NORMAL')
+    self._create_schema()
+
+  def _create_schema(self):
+    version = self._conn.execute('PRAGMA user_version').fetchone()[0]
+    if version != SCHEMA_VERSION:
+      self._conn.execute('DROP TABLE IF EXISTS responses')
+      self._conn.execute(f'PRAGMA user_version={SCHEMA_VERSION}')
+    self._conn.execute(
+      'CREATE TABLE IF NOT EXISTS responses ('
+      ' key TEXT PRIMARY KEY,'
+      ' response TEXT NOT NULL,'
+      ' files TEXT NOT NULL,'
+      ' size INTEGER NOT NULL,'
+      ' created REAL NOT NULL,'
+      ' last_access REAL NOT NULL)'
+    )
+    self._conn.execute('CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)')
+    self._conn.commit()
+
+  def get(self, key: str) -> Optional[str]:
+    """
+    Return the stored answer for a key, or None if there is none or it has expired.
+    """
+    now = time.time()
+    with self._lock:
+      row = self._conn.execute('SELECT response, created FROM responses WHERE key = ?', (key,)).fetchone()
+      if row is None or now - row[1] > self.ttl:
+        if row is not None:
+          self._conn.execute('DELETE FROM responses WHERE key = ?', (key,))
+          self._conn.commit()
+        self.misses += 1
+        return None
+      self._conn.execute('UPDATE responses SET last_access = ? WHERE key = ?', (now, key))
+      self._conn.commit()
+      self.hits += 1
+      return row[0]
+
+  def put(self, key: str, response: str, files: Iterable[str] = ()):
+    """
+    Store an answer, then evict expired and least recently used entries beyond the caps.
+    """
+    now = time.time()
+    size = len(response.encode('utf-8', errors='replace'))
+    with self._lock:
+      self._conn.execute(
+        'INSERT OR REPLACE INTO responses (key, response, files, size, created, last_access) VALUES (?, ?, ?, ?, ?, ?)',
+        (key, response, json.dumps(sorted(set(files))), size, now, now)
+      )
+      self._evict(now)
+      self._conn.commit()
+
+  def _evict(self, now: float):
+    self._conn.execute('DELETE FROM responses WHERE created < ?', (now - self.ttl,))
+    count, total = self._conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses').fetchone()
+    if count <= self.max_entries and total <= self.max_bytes:
+      return
+    evicted = []
+    for key, size in self._conn.execute('SELECT key, size FROM responses ORDER BY last_access'):
+      if count <= self.max_entries and total <= self.max_bytes:
+        break
+      evicted.append((key,))
+      count -= 1
+      total -= size
+    self._conn.executemany('DELETE FROM responses WHERE key = ?', evicted)
+
+  def invalidate_file(self, path: str) -> int:
+    """
+    Drop every answer computed from a context that included `path`; returns how many were dropped.
+    """
+    pattern = '%' + json.dumps(path).replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+    with self._lock:
+      rows = self._conn.execute("SELECT key, files FROM responses WHERE files LIKE ? ESCAPE '\\'", (pattern,)).fetchall()
+      stale = [(key,) for key, files in rows if path in json.loads(files)]
+      self._conn.executemany('DELETE FROM responses WHERE key = ?', stale)
+      self._conn.commit()
+    return len(stale)
+
+  def clear(self):
+    with self._lock:
+      self._conn.execute('DELETE FROM responses')
+      self._conn.commit()
+
+  def stats(self) -> Dict[str, int]:
+    with self._lock:
+      count, total = self._conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses').fetchone()
+    return {'entries': count, 'bytes': total, 'hits': self.hits, 'misses': self.misses}
+
+  def close(self):
+    with self._lock:
+      if self._conn is not None:
+        self._conn.commit()
+        self._conn.close()
+        self._conn = None
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, exc_type, exc, tb):
+    self.close()
+
+# [END process/cache.py]
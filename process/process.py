@@ -1,42 +1,217 @@
 # [START process/process.py]
-from groq import Groq
+from groq import Groq, AsyncGroq
 import os
 import json
+import asyncio
 from dotenv import load_dotenv
-from terminalout.terminal import terminalstep1
+from typing import Any, AsyncIterator, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+from utils.bundle import ContextBundle
+from process.cache import ResponseCache, cache_key
+from utils.json_stream import IncrementalJSONParser
 
 load_dotenv()
 
-def process(traceback_message: str, original_error_information: str, context: str) -> object:
-  client = Groq(api_key=os.getenv("API"))
-
-  chat_completion = client.chat.completions.create(
-    messages=[
-        {
-          "role": "system",
-          "content": "You are an expert software debugging assistant specializing in Python error analysis. Your task is to analyze error tracebacks and provide structured, actionable advice. Follow these steps precisely:"
-        },
-        {
-          "role": "system",
-          "content": "1. Analyze the provided error traceback and original error message.\n2. Identify the source of the error within the repository structure.\n3. Explain the error concisely in natural language.\n4. Provide specific, actionable suggestions for resolving the error.\n5. Format your response as a JSON object with the exact structure specified below."
-        },
-        {
-          "role": "system",
-          "content": "Your response MUST be a valid JSON object with this exact structure:\n{\n  \"where\": {\n    \"repository_path\": \"<absolute path to repository>\",\n    \"file_name\": \"<name of file containing error>\",\n    \"line_number\": \"<line number where error occurred>\"\n  },\n  \"what\": {\n    \"error_type\": \"<specific Python error type>\",\n    \"description\": \"<concise explanation of error>\"\n  },\n  \"how\": {\n    \"error_origination\": \"<line number where error originated>\",\n    \"suggested_code_solution\": \"<code snippet to fix the error>\"\n  }\n}"
-        },
-        {
-          "role": "system",
-          "content": "Constraints:\n- Provide ONLY the JSON object as your response. Do not include any other text.\n- Ensure all JSON keys are exactly as specified.\n- The 'suggested_code_solution' should be a valid Python code snippet without explanation.\n- If multiple errors exist, focus on the most critical one that likely caused the others.\n- Do not use placeholders in your response. Provide specific, contextual information based on the given error. Only fix the line from the line number given that is causing the error."
-        },
-        {
-          "role": "user",
-          "content": f"Context: {context}\n\nTraceback message: {traceback_message}\n\nOriginal error message: {original_error_information}"
-        }
-      ],
-    model="llama3-70b-8192",
-    response_format={"type": "json_object"}
-  )
-  return chat_completion.choices[0].message.content
+MODEL = "llama3-70b-8192"
+SYSTEM_PROMPTS = [
+  "You are an expert software debugging assistant specializing in Python error analysis. Your task is to analyze error tracebacks and provide structured, actionable advice. Follow these steps precisely:",
+  "1. Analyze the provided error traceback and original error message.\n2. Identify the source of the error within the repository structure.\n3. Explain the error concisely in natural language.\n4. Provide specific, actionable suggestions for resolving the error.\n5. Format your response as a JSON object with the exact structure specified below.",
+  "Your response MUST be a valid JSON object with this exact structure:\n{\n  \"where\": {\n    \"repository_path\": \"<absolute path to repository>\",\n    \"file_name\": \"<name of file containing error>\",\n    \"line_number\": \"<line number where error occurred>\"\n  },\n  \"what\": {\n    \"error_type\": \"<specific Python error type>\",\n    \"description\": \"<concise explanation of error>\"\n  },\n  \"how\": {\n    \"error_origination\": \"<line number where error originated>\",\n    \"suggested_code_solution\": \"<code snippet to fix the error>\"\n  }\n}",
+  "Constraints:\n- Provide ONLY the JSON object as your response. Do not include any other text.\n- Ensure all JSON keys are exactly as specified.\n- The 'suggested_code_solution' should be a valid Python code snippet without explanation.\n- If multiple errors exist, focus on the most critical one that likely caused the others.\n- Do not use placeholders in your response. Provide specific, contextual information based on the given error. Only fix the line from the line number given that is causing the error.",
+]
+# Part of every cache key: editing the prompt invalidates the answers given to the old one.
+PROMPT_TEMPLATE = "\n".join(SYSTEM_PROMPTS)
+
+DEFAULT_CONCURRENCY = 8
+
+# (traceback message, original error information, context)
+WorkItem = Tuple[str, str, Union[str, ContextBundle]]
+
+def build_messages(traceback_message: str, original_error_information: str,
+                   context: Union[str, ContextBundle]) -> List[Dict[str, str]]:
+  return [{"role": "system", "content": prompt} for prompt in SYSTEM_PROMPTS] + [
+    {
+      "role": "user",
+      "content": f"Context: {context}\n\nTraceback message: {traceback_message}\n\nOriginal error message: {original_error_information}"
+    }
+  ]
+
+class SplatClient:
+  """
+  A long-lived handle on the model API. The Groq clients (and their HTTP connection pools) are created on first use
+  and reused by every request made through this object; answers go through the response cache.
+
+  Usage:
+    client = SplatClient()
+    answer = client.process(traceback, error_information, context)
+    async for index, answer in client.process_many(items, concurrency=8):
+      ...
+  """
+
+  def __init__(self, api_key: Optional[str] = None, model: str = MODEL,
+               cache: Optional[ResponseCache] = None, use_cache: bool = True):
+    self.api_key = api_key
+    self.model = model
+    self.use_cache = use_cache
+    self._cache = cache
+    self._client: Optional[Groq] = None
+    self._async_client: Optional[AsyncGroq] = None
+
+  @property
+  def cache(self) -> ResponseCache:
+    if self._cache is None:
+      self._cache = ResponseCache()
+    return self._cache
+
+  @property
+  def client(self) -> Groq:
+    if self._client is None:
+      self._client = Groq(api_key=self.api_key or os.getenv("API"))
+    return self._client
+
+  @property
+  def async_client(self) -> AsyncGroq:
+    if self._async_client is None:
+      self._async_client = AsyncGroq(api_key=self.api_key or os.getenv("API"))
+    return self._async_client
+
+  def _cached(self, traceback_message: str, original_error_information: str,
+              context: Union[str, ContextBundle]) -> Tuple[Optional[str], Optional[str]]:
+    if not self.use_cache:
+      return None, None
+    key = cache_key(self.model, PROMPT_TEMPLATE, traceback_message, original_error_information, context)
+    return key, self.cache.get(key)
+
+  def _store(self, key: Optional[str], response: Optional[str], context: Union[str, ContextBundle]):
+    if key is not None and response:
+      self.cache.put(key, response, files=context.files() if isinstance(context, ContextBundle) else ())
+
+  def process(self, traceback_message: str, original_error_information: str,
+              context: Union[str, ContextBundle]) -> Optional[str]:
+    key, cached = self._cached(traceback_message, original_error_information, context)
+    if cached is not None:
+      return cached
+    chat_completion = self.client.chat.completions.create(
+      messages=build_messages(traceback_message, original_error_information, context),
+      model=self.model,
+      response_format={"type": "json_object"}
+    )
+    response = chat_completion.choices[0].message.content
+    self._store(key, response, context)
+    return response
+
+  def process_stream(self, traceback_message: str, original_error_information: str,
+                     context: Union[str, ContextBundle]) -> Iterator[Tuple[str, Any]]:
+    """
+    Stream the answer, yielding each top-level section ("where", "what", "how") as soon as it is complete.
+    The full answer is cached once the stream ends; a cache hit yields every section at once.
+    """
+    key, cached = self._cached(traceback_message, original_error_information, context)
+    if cached is not None:
+      yield from json.loads(cached).items()
+      return
+    # JSON mode cannot be combined with streaming; the system prompts already ask for the JSON object only, and the
+    # parser skips anything the model writes before it.
+    stream = self.client.chat.completions.create(
+      messages=build_messages(traceback_message, original_error_information, context),
+      model=self.model,
+      stream=True
+    )
+    parser = IncrementalJSONParser()
+    for chunk in stream:
+      if chunk.choices and chunk.choices[0].delta.content:
+        yield from parser.feed(chunk.choices[0].delta.content)
+    self._store(key, json.dumps(parser.close()), context)
+
+  async def process_async(self, traceback_message: str, original_error_information: str,
+                          context: Union[str, ContextBundle]) -> Optional[str]:
+    key, cached = self._cached(traceback_message, original_error_information, context)
+    if cached is not None:
+      return cached
+    chat_completion = await self.async_client.chat.completions.create(
+      messages=build_messages(traceback_message, original_error_information, context),
+      model=self.model,
+      response_format={"type": "json_object"}
+    )
+    response = chat_completion.choices[0].message.content
+    self._store(key, response, context)
+    return response
+
+  async def process_many(self, items: Iterable[WorkItem], concurrency: int = DEFAULT_CONCURRENCY
+                         ) -> AsyncIterator[Tuple[int, Union[str, BaseException, None]]]:
+    """
+    Analyze several errors concurrently, at most `concurrency` requests in flight at a time.
+    Yields (index in items, answer) pairs in completion order; a request that failed yields its exception instead,
+    so one bad item does not cancel the others.
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def run(index: int, item: WorkItem):
+      async with semaphore:
+        try:
+          return index, await self.process_async(*item)
+        except Exception as error:
+          return index, error
+
+    tasks = [asyncio.create_task(run(index, item)) for index, item in enumerate(items)]
+    try:
+      for completed in asyncio.as_completed(tasks):
+        yield await completed
+    finally:
+      for task in tasks:
+        task.cancel()
+
+  def close(self):
+    if self._client is not None:
+      self._client.close()
+      self._client = None
+    if self._cache is not None:
+      self._cache.close()
+      self._cache = None
+
+  async def aclose(self):
+    if self._async_client is not None:
+      await self._async_client.close()
+      self._async_client = None
+    self.close()
+
+_default_client: Optional[SplatClient] = None
+
+def default_client() -> SplatClient:
+  global _default_client
+  if _default_client is None:
+    _default_client = SplatClient()
+  return _default_client
+
+'''
+Asks the model to explain an error, answering from the local response cache when the same error was already analyzed
+against the same code. Requests share the connection pool of the default client.
+@param traceback_message: str - The traceback of the error.
+@param original_error_information: str - The error summary, e.g. the CalledProcessError message.
+@param context: Union[str, ContextBundle] - The related code.
+@param client: Optional[SplatClient] - Defaults to a process-wide client, whose connections and cache are reused.
+@returns: str - The JSON answer with the "where", "what" and "how" keys.
+'''
+def process(traceback_message: str, original_error_information: str, context: Union[str, ContextBundle],
+            client: Optional[SplatClient] = None) -> object:
+  return (client or default_client()).process(traceback_message, original_error_information, context)
+
+'''
+Streams the answer of the default client section by section; see SplatClient.process_stream.
+@returns: Iterator[Tuple[str, Any]] - ("where" | "what" | "how", section) pairs as soon as each is complete.
+'''
+def process_stream(traceback_message: str, original_error_information: str, context: Union[str, ContextBundle],
+                   client: Optional[SplatClient] = None) -> Iterator[Tuple[str, Any]]:
+  return (client or default_client()).process_stream(traceback_message, original_error_information, context)
+
+'''
+Analyzes several errors concurrently with the default client; see SplatClient.process_many.
+@param items: Iterable[WorkItem] - (traceback message, original error information, context) tuples.
+@param concurrency: int - Maximum number of requests in flight.
+@returns: AsyncIterator[Tuple[int, Union[str, BaseException, None]]] - (index, answer) pairs as they complete.
+'''
+def process_many(items: Iterable[WorkItem], concurrency: int = DEFAULT_CONCURRENCY
+                 ) -> AsyncIterator[Tuple[int, Union[str, BaseException, None]]]:
+  return default_client().process_many(items, concurrency)
 
 if __name__ == "__main__":
    print(process(["test.py"], """File "/Users/vinh/Documents/calhacks24/test.py", line 2
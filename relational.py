@@ -1,33 +1,182 @@
 # [START relational.py]
 import os
-import json
+import queue
+import asyncio
+import threading
 import subprocess
-from typing import Tuple
+from collections import Counter
+from contextlib import nullcontext
+from typing import List, Optional, Tuple, Union
 from utils.utils import (
   build_adjacency_list,
   parse_error_stack,
-  run_mock_repopack,
-  get_nth_related_files
+  get_nth_related_files,
+  warm_import_index
 )
+from utils.graph_index import ImportGraphIndex
+from utils.resolver import ModuleResolver
+from utils.packer import pack_context
+from utils.bundle import ContextBundle, default_file_cache
+from utils.slicer import parse_error_frames, slice_context
+from utils.traceback_parser import StatCache, iter_frames
+from utils.fingerprint import deduplicate_tracebacks
+from errortrace import RingBuffer
 
-def relational_error_parsing_function(entrypoint, flag: str = "") -> Tuple[str, str, str]:
+# Bounds on what "-r" pulls in, so a densely connected repository does not end up in the context wholesale.
+MAX_RELATED_DEPTH = 4
+MAX_RELATED_FILES = 200
+MAX_RELATED_BYTES = 2 * 1024 * 1024
+# Bytes of the entrypoint's stderr kept for the traceback; older output is discarded.
+MAX_STDERR_BYTES = 4 * 1024 * 1024
+READ_SIZE = 64 * 1024
+
+'''
+Builds the LLM context for a traceback.
+@param traceback: str - The error output of the entrypoint.
+@param flag: str - "" for the traceback files only, "-r" for their Nth degree imports too, "-s" for frame-local slices.
+@param project_root: Optional[str] - Defaults to the current directory.
+@param index: Optional[ImportGraphIndex] - An already open (possibly warm) index; one is opened for "-r" otherwise.
+@param resolver: Optional[ModuleResolver] - An already built resolver; one is built for "-r" otherwise.
+@returns: Union[str, ContextBundle] - The context, serialized only when the prompt is built.
+'''
+def build_context(traceback: str, flag: str = "", project_root: Optional[str] = None,
+                  index: Optional[ImportGraphIndex] = None,
+                  resolver: Optional[ModuleResolver] = None) -> Union[str, ContextBundle]:
+  project_root = os.path.abspath(project_root or os.getcwd())
+  # Frames are often relative to the directory the entrypoint ran in (e.g. "main.c", "src/main.rs"); every path is
+  # made absolute, so that the import graph, the index and the focus lines all use the same key for a file.
+  collected_traceback_files = [os.path.abspath(path) for path in parse_error_stack(traceback)]
+  frames = parse_error_frames(traceback)
+  if flag == '-s':
+    # Only the enclosing scope of each failing line (plus imports and referenced definitions) is sent.
+    return slice_context(frames)
+
+  focus_lines = {}
+  for path, line_number in frames:
+    focus_lines.setdefault(path, []).append(line_number)
+  if flag == '-r':
+    # Only files that changed since the last run are re-parsed; everything else is an index lookup.
+    with (nullcontext(index) if index is not None else ImportGraphIndex(project_root)) as index:
+      graph = build_adjacency_list(collected_traceback_files, project_root, index=index, resolver=resolver)
+    # Files touched by more frames are preferred when the traversal has to stop early.
+    frame_counts = Counter(path for path, _ in frames)
+    weights = {file: frame_counts.get(file, 1) for file in collected_traceback_files}
+    related = get_nth_related_files(collected_traceback_files, graph, max_depth=MAX_RELATED_DEPTH,
+                                    max_files=MAX_RELATED_FILES, max_bytes=MAX_RELATED_BYTES, weights=weights)
+    packed = pack_context(list(related), collected_traceback_files, focus_lines=focus_lines, distances=related)
+  else:
+    packed = pack_context(collected_traceback_files, collected_traceback_files, focus_lines=focus_lines)
+  if packed.truncated or packed.dropped:
+    print(packed.report())
+  # The bundle is only serialized when the LLM request is built.
+  return packed.bundle
+
+def _warm(project_root: str, stop: threading.Event,
+          frames: "Optional[queue.SimpleQueue[str]]" = None) -> Tuple[ModuleResolver, ImportGraphIndex]:
+  """
+  Scan the project and refresh the persistent index; runs on a worker thread while the entrypoint is running.
+  Traceback files put on frames are handled first, between two files of the warm-up: their imports are resolved from
+  the index (the thread owning it) and the files the context will be packed from are memory-mapped into the file cache.
+  """
+  resolver = ModuleResolver(project_root)
+  index = ImportGraphIndex(project_root)
+  traceback_files: List[str] = []
+
+  def resolve_frames():
+    new_files = []
+    while frames is not None and not frames.empty():
+      new_files.append(frames.get())
+    if not new_files:
+      return
+    traceback_files.extend(new_files)
+    graph = build_adjacency_list(traceback_files, project_root, index=index, workers=1, resolver=resolver)
+    related = get_nth_related_files(traceback_files, graph, max_depth=MAX_RELATED_DEPTH,
+                                    max_files=MAX_RELATED_FILES, max_bytes=MAX_RELATED_BYTES)
+    for file in related:
+      default_file_cache.get(file)
+
+  warm_import_index(index, resolver, stop, between=resolve_frames)
+  # Frames printed while the warm-up was stopping (or after it was done).
+  resolve_frames()
+  index.commit()
+  return resolver, index
+
+async def _pump(stream: asyncio.StreamReader, buffer: RingBuffer, on_line=None):
+  pending = b''
+  while True:
+    data = await stream.read(READ_SIZE)
+    if not data:
+      break
+    buffer.write(data)
+    if on_line is not None:
+      lines = (pending + data).split(b'\n')
+      pending = lines.pop()[-READ_SIZE:]
+      for line in lines:
+        on_line(line.decode('utf-8', errors='replace'))
+  if on_line is not None and pending:
+    on_line(pending.decode('utf-8', errors='replace'))
+
+'''
+Runs the entrypoint and builds the context for its error, overlapping the two.
+While the entrypoint runs, the project import index is warmed on a worker thread (for "-r"), and every traceback frame
+is resolved and memory-mapped into the file cache as soon as its line arrives on stderr; for "-r", the warm-up thread
+also resolves the imports of that file from the index ahead of the rest of the project and maps the related files. Once the process has exited,
+only the context assembly is left to do.
+@param entrypoint: List[str] - The command to run, e.g. ['python3', 'main.py'].
+@param flag: str - See build_context.
+@returns: Tuple[str, str, Union[str, ContextBundle]] - (traceback, error information, context), all empty on success.
+'''
+async def relational_error_parsing_async(entrypoint: List[str], flag: str = "") -> Tuple[str, str, Union[str, ContextBundle]]:
+  project_root = os.getcwd()
+  stop_warming = threading.Event()
+  # Traceback files for the warm-up thread to resolve the imports of; the index is only used on that thread.
+  frames: "queue.SimpleQueue[str]" = queue.SimpleQueue()
+  warm_task = asyncio.create_task(asyncio.to_thread(_warm, project_root, stop_warming, frames)) if flag == '-r' else None
+
+  stat_cache = StatCache()
+  seen_frames = set()
+
+  def prefetch(line: str):
+    for frame in iter_frames([line], stat_cache):
+      path = os.path.abspath(frame.path)
+      if path not in seen_frames:
+        seen_frames.add(path)
+        default_file_cache.get(path)
+        if warm_task is not None:
+          frames.put(path)
+
+  stdout, stderr = RingBuffer(MAX_STDERR_BYTES), RingBuffer(MAX_STDERR_BYTES)
+  resolver, index = None, None
   try:
-    subprocess.run(entrypoint, capture_output=True, check=True, text=True)
-    return "", "", ""  # Return empty strings if no error occurs
-  except subprocess.CalledProcessError as error: # This will always run, on purpose.
-    # Capture the error output to simulate the error stack
-    traceback: str = error.stderr if error.stderr else str(error)
+    try:
+      process = await asyncio.create_subprocess_exec(
+        *entrypoint, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+      )
+      await asyncio.gather(_pump(process.stdout, stdout), _pump(process.stderr, stderr, prefetch))
+      returncode = await process.wait()
+    finally:
+      # The program is done (or could not be started): whatever warming is left is faster to do on demand for the
+      # reachable files only. The warm-up is awaited even then, so that the index it opened is closed below.
+      stop_warming.set()
+      if warm_task is not None:
+        resolver, index = await warm_task
+
+    if returncode == 0:
+      return "", "", ""  # Return empty strings if no error occurs
+
+    error = subprocess.CalledProcessError(returncode, entrypoint)
+    traceback: str = stderr.getvalue().decode('utf-8', errors='replace') or str(error)
+    # An error repeated hundreds of times (e.g. once per request) is analyzed once, with its count.
+    traceback = deduplicate_tracebacks(traceback)
     error_information: str = str(error)
-    collected_traceback_files = parse_error_stack(traceback)
-    project_root = os.getcwd()
-    #collected_traceback_files = [os.path.join(project_root, file) for file in parse_error_stack(error_information)]
-    #print(collected_traceback_files)
-    if flag == '-r':
-      graph = build_adjacency_list(collected_traceback_files, project_root)
-      all_related_files = get_nth_related_files(collected_traceback_files, graph)
-      return traceback, error_information, run_mock_repopack(list(all_related_files))
-    else:
-      return traceback, error_information, run_mock_repopack(collected_traceback_files)
+    context = await asyncio.to_thread(build_context, traceback, flag, project_root, index, resolver)
+    return traceback, error_information, context
+  finally:
+    if index is not None:
+      index.close()
+
+def relational_error_parsing_function(entrypoint, flag: str = "") -> Tuple[str, str, Union[str, ContextBundle]]:
+  return asyncio.run(relational_error_parsing_async(entrypoint, flag))
 
 if __name__ == "__main__":
   relational_error_parsing_function(['python3', 'test.py'], '-r')
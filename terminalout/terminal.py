@@ -1,4 +1,5 @@
 import json
+import threading
 from prompt_toolkit.formatted_text import to_formatted_text, HTML
 from prompt_toolkit import print_formatted_text, HTML
 from prompt_toolkit.shortcuts import prompt, PromptSession
@@ -9,16 +10,18 @@ from agents.file_writer_agent import file_writer, ErrorCorrectionRequest, FileWr
 # Initialize the file_writer agent
 file_writer_agent = file_writer
 
-def terminalstep1(json_object):
-    data = json.loads(json_object)
-    #Print where and what
+def render_header():
     print_formatted_text(HTML("🔎 <u><b><gray>Details about <red>error</red></gray></b></u>"))
-    print_formatted_text(HTML(f"✅ We found the first instance of the <red><b>error</b></red> at <b><magenta>line {data['where']['line_number']}</magenta></b>."))
-    print_formatted_text(HTML(f"✅ The owner of the <b><red>error</red></b>: <b><magenta>{data['where']['file_name']}</magenta></b>."))
-    print_formatted_text(HTML(f"✅ The type of the <b><red>error</red></b>: <b><magenta>{data['what']['error_type']}</magenta></b>."))
-    print_formatted_text(HTML(f"✅ Isolated <red><b>error</b></red> message: <b><cyan>{data['what']['description']}</cyan></b>"))
-    #user can select if they wanna see the solution
 
+def render_where(where):
+    print_formatted_text(HTML(f"✅ We found the first instance of the <red><b>error</b></red> at <b><magenta>line {where['line_number']}</magenta></b>."))
+    print_formatted_text(HTML(f"✅ The owner of the <b><red>error</red></b>: <b><magenta>{where['file_name']}</magenta></b>."))
+
+def render_what(what):
+    print_formatted_text(HTML(f"✅ The type of the <b><red>error</red></b>: <b><magenta>{what['error_type']}</magenta></b>."))
+    print_formatted_text(HTML(f"✅ Isolated <red><b>error</b></red> message: <b><cyan>{what['description']}</cyan></b>"))
+
+def ask_to_see_solution():
     current_index = 0  # 0 for YES, 1 for NO
     kb = KeyBindings()
     options = ['y', 'n']
@@ -69,9 +72,63 @@ def terminalstep1(json_object):
     update_display(session.app)  # Initial display
     session.prompt("")  # Start prompt
 
-    if options[current_index] == 'y':
+    return options[current_index] == 'y'
+
+def show_solution(data):
+    if data.get('how') is not None:
         print_formatted_text(HTML("<b><ansigreen>How to fix error:</ansigreen></b>"), data['how'])
         return True, data
-    else:
-        print_formatted_text(HTML("<b><ansigreen>No changes will be applied.</ansigreen></b>"))
-        return False, None
+    print_formatted_text(HTML("<b><ansigreen>No solution was returned.</ansigreen></b>"))
+    return False, None
+
+def decline_solution():
+    print_formatted_text(HTML("<b><ansigreen>No changes will be applied.</ansigreen></b>"))
+    return False, None
+
+def terminalstep1(json_object):
+    data = json.loads(json_object)
+    #Print where and what
+    render_header()
+    render_where(data['where'])
+    render_what(data['what'])
+    #user can select if they wanna see the solution
+    if ask_to_see_solution():
+        return show_solution(data)
+    return decline_solution()
+
+def terminalstep1_stream(sections):
+    """
+    Like terminalstep1, but for an answer streamed as (key, section) pairs (see process.process.process_stream):
+    "where" and "what" are printed the moment they arrive, and the rest of the answer keeps streaming in the
+    background while the user decides whether to see the solution.
+    """
+    sections = iter(sections)
+    data = {}
+    render_header()
+    for key, value in sections:
+        data[key] = value
+        if key == 'where':
+            render_where(value)
+        elif key == 'what':
+            render_what(value)
+        if 'where' in data and 'what' in data:
+            break
+
+    failure = []
+
+    def drain():
+        try:
+            for key, value in sections:
+                data[key] = value
+        except Exception as error:
+            failure.append(error)
+
+    reader = threading.Thread(target=drain, daemon=True)
+    reader.start()
+    wants_solution = ask_to_see_solution()
+    reader.join()
+    if failure:
+        raise failure[0]
+    if wants_solution:
+        return show_solution(data)
+    return decline_solution()
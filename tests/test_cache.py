@@ -0,0 +1,73 @@
+import process.cache as cache_module
+from process.cache import ResponseCache, cache_key
+from utils.bundle import ContextBundle
+
+class Clock:
+  def __init__(self):
+    self.now = 1000.0
+
+  def time(self):
+    return self.now
+
+def open_cache(tmp_path, monkeypatch, **options):
+  clock = Clock()
+  monkeypatch.setattr(cache_module, 'time', clock)
+  return ResponseCache(path=str(tmp_path / 'responses.db'), **options), clock
+
+def test_entries_expire_after_the_ttl(tmp_path, monkeypatch):
+  cache, clock = open_cache(tmp_path, monkeypatch, ttl=60)
+  with cache:
+    cache.put('key', 'answer')
+    clock.now += 59
+    assert cache.get('key') == 'answer'
+    clock.now += 2
+    assert cache.get('key') is None
+    assert cache.stats()['entries'] == 0
+
+def test_least_recently_used_entries_are_evicted(tmp_path, monkeypatch):
+  cache, clock = open_cache(tmp_path, monkeypatch, max_entries=2)
+  with cache:
+    cache.put('a', 'answer a')
+    clock.now += 1
+    cache.put('b', 'answer b')
+    clock.now += 1
+    # Reading "a" makes "b" the least recently used.
+    assert cache.get('a') == 'answer a'
+    clock.now += 1
+    cache.put('c', 'answer c')
+    assert cache.get('b') is None
+    assert cache.get('a') == 'answer a'
+    assert cache.get('c') == 'answer c'
+
+def test_entries_are_evicted_beyond_max_bytes(tmp_path, monkeypatch):
+  cache, clock = open_cache(tmp_path, monkeypatch, max_bytes=10)
+  with cache:
+    cache.put('a', '123456')
+    clock.now += 1
+    cache.put('b', '123456')
+    assert cache.get('a') is None
+    assert cache.get('b') == '123456'
+
+def test_invalidate_file_drops_only_the_answers_that_used_it(tmp_path, monkeypatch):
+  cache, _ = open_cache(tmp_path, monkeypatch)
+  with cache:
+    cache.put('a', 'answer a', files=['/project/main.py', '/project/util_1.py'])
+    cache.put('b', 'answer b', files=['/project/utilx1.py'])
+    # "_" is not a LIKE wildcard here: util_1.py does not match utilx1.py.
+    assert cache.invalidate_file('/project/util_1.py') == 1
+    assert cache.get('a') is None
+    assert cache.get('b') == 'answer b'
+
+def test_cache_key_follows_the_content_of_the_context_files(tmp_path):
+  path = tmp_path / 'main.py'
+  path.write_text('x = 1\n')
+
+  def key():
+    bundle = ContextBundle()
+    bundle.add_file(str(path))
+    return cache_key('model', 'prompt', 'Traceback', 'error', bundle)
+
+  before = key()
+  assert key() == before
+  path.write_text('x = 2\n')
+  assert key() != before
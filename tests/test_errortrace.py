@@ -0,0 +1,26 @@
+import sys
+import time
+from errortrace import OutputCapture, check_command, run_command
+
+SERVER = (
+  'import sys, time, traceback\n'
+  'try:\n'
+  '    1 / 0\n'
+  'except ZeroDivisionError:\n'
+  '    traceback.print_exc()\n'
+  'sys.stderr.flush()\n'
+  'time.sleep(30)\n'
+)
+
+def test_traceback_of_a_running_process_completes_when_it_goes_quiet():
+  started = time.monotonic()
+  passed, stderr, _ = check_command([sys.executable, '-c', SERVER])
+  assert time.monotonic() - started < 5
+  assert not passed
+  assert 'ZeroDivisionError' in stderr
+
+def test_callbacks_can_read_the_capture():
+  seen = []
+  capture = OutputCapture(on_traceback=lambda stream, traceback: seen.append(capture.text(stream)))
+  run_command([sys.executable, '-c', SERVER.replace('time.sleep(30)', 'pass')], capture=capture, timeout=10)
+  assert len(seen) == 1 and 'ZeroDivisionError' in seen[0]
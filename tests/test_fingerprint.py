@@ -0,0 +1,16 @@
+from utils.fingerprint import deduplicate_tracebacks, split_tracebacks
+
+TRACEBACK = (
+  'Traceback (most recent call last):\n'
+  '  File "app.py", line 3, in <module>\n'
+  '    main()\n'
+  'ValueError: bad value\n'
+)
+
+def test_consecutive_identical_tracebacks_are_split():
+  assert split_tracebacks(TRACEBACK * 3) == [TRACEBACK.rstrip('\n')] * 3
+
+def test_consecutive_identical_tracebacks_are_deduplicated():
+  deduplicated = deduplicate_tracebacks(TRACEBACK * 3)
+  assert deduplicated.count('Traceback (most recent call last):') == 1
+  assert '[the same error occurred 3 times]' in deduplicated
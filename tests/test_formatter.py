@@ -0,0 +1,59 @@
+from utils.formatter import format_ranges
+
+SOURCE = (
+  'class A:\n'
+  '    def f(self):\n'
+  '        return  1\n'
+  '\n'
+  '    def g(self):\n'
+  '        return [ 2 ]\n'
+  '\n'
+  '\n'
+  'x  =  3\n'
+)
+
+def test_range_spanning_two_methods_keeps_nested_layout():
+  assert format_ranges(SOURCE, [(3, 6)]) == (
+    'class A:\n'
+    '    def f(self):\n'
+    '        return 1\n'
+    '\n'
+    '    def g(self):\n'
+    '        return [2]\n'
+    '\n'
+    '\n'
+    'x  =  3\n'
+  )
+
+def test_only_the_enclosing_statement_is_formatted():
+  formatted = format_ranges(SOURCE, [(6, 6)])
+  assert '        return  1\n' in formatted
+  assert '        return [2]\n' in formatted
+  assert formatted.endswith('x  =  3\n')
+
+def test_source_that_does_not_parse_is_unchanged():
+  assert format_ranges('def f(:\n    pass\n', [(1, 1)]) == 'def f(:\n    pass\n'
+
+def test_blank_lines_inside_strings_are_kept():
+  source = (
+    'def f():\n'
+    '    x = """a\n'
+    '    \n'
+    '    b"""\n'
+    '    y  =  1\n'
+    '    return x\n'
+  )
+  formatted = format_ranges(source, [(2, 5)])
+  assert '    x = """a\n    \n    b"""\n' in formatted
+  assert '    y = 1\n' in formatted
+
+def test_nested_block_with_string_left_of_it_is_unchanged():
+  source = (
+    'class A:\n'
+    '    def f(self):\n'
+    '        x = """a\n'
+    '\n'
+    '        b"""\n'
+    '        return  x\n'
+  )
+  assert format_ranges(source, [(3, 6)]) == source
@@ -0,0 +1,48 @@
+import os
+from utils.graph_index import ImportGraphIndex
+
+def test_lookup_returns_stored_imports_while_the_file_is_unchanged(tmp_path):
+  path = str(tmp_path / 'main.py')
+  with open(path, 'w') as file:
+    file.write('import helper\n')
+  with ImportGraphIndex(str(tmp_path)) as index:
+    index.store(path, [('helper', 0, ())])
+  with ImportGraphIndex(str(tmp_path)) as index:
+    assert index.lookup(path) == [('helper', 0, ())]
+    assert index.hits == 1
+
+def test_lookup_misses_when_the_mtime_changes(tmp_path):
+  path = str(tmp_path / 'main.py')
+  with open(path, 'w') as file:
+    file.write('import helper\n')
+  with ImportGraphIndex(str(tmp_path)) as index:
+    index.store(path, [('helper', 0, ())])
+    st = os.stat(path)
+    # Same size, another mtime.
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+    assert index.lookup(path) is None
+    assert index.misses == 1
+
+def test_lookup_misses_when_the_size_changes(tmp_path):
+  path = str(tmp_path / 'main.py')
+  with open(path, 'w') as file:
+    file.write('import helper\n')
+  with ImportGraphIndex(str(tmp_path)) as index:
+    index.store(path, [('helper', 0, ())])
+    st = os.stat(path)
+    with open(path, 'a') as file:
+      file.write('import other\n')
+    # Same mtime, another size.
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns))
+    assert index.lookup(path) is None
+
+def test_invalidate_and_missing_files(tmp_path):
+  path = str(tmp_path / 'main.py')
+  with open(path, 'w') as file:
+    file.write('')
+  with ImportGraphIndex(str(tmp_path)) as index:
+    index.store(path, [])
+    assert index.lookup(path) == []
+    index.invalidate(path)
+    assert index.lookup(path) is None
+    assert index.lookup(str(tmp_path / 'missing.py')) is None
@@ -0,0 +1,35 @@
+from utils.bundle import FileCache
+from utils.packer import CHARS_PER_TOKEN, pack_context
+
+def write_lines(path, count):
+  path.write_text(''.join(f'line_{number} = {number}\n' for number in range(1, count + 1)))
+  return str(path)
+
+def test_small_files_are_packed_in_full(tmp_path):
+  path = write_lines(tmp_path / 'small.py', 10)
+  packed = pack_context([path], [path], file_cache=FileCache())
+  assert packed.included == [path] and not packed.truncated and not packed.dropped
+  assert 'line_10 = 10' in packed.text
+
+def test_large_file_is_truncated_around_the_focus_line(tmp_path):
+  path = write_lines(tmp_path / 'large.py', 2000)
+  packed = pack_context([path], [path], token_budget=500, focus_lines={path: [1000]}, file_cache=FileCache())
+  assert packed.truncated == [path]
+  assert 'line_1000 = 1000' in packed.text
+  assert 'line_1 = 1\n' not in packed.text
+  assert packed.tokens <= 500 + 64
+
+def test_focus_lines_past_the_end_of_the_file(tmp_path):
+  path = write_lines(tmp_path / 'shrunk.py', 2000)
+  packed = pack_context([path], [path], token_budget=500, focus_lines={path: [5000]}, file_cache=FileCache())
+  assert packed.truncated == [path]
+  # Without a usable focus line, the head and tail of the file are kept.
+  assert 'line_1 = 1\n' in packed.text and 'line_2000 = 2000' in packed.text
+
+def test_files_beyond_the_budget_are_dropped(tmp_path):
+  first = write_lines(tmp_path / 'first.py', 200)
+  second = write_lines(tmp_path / 'second.py', 200)
+  packed = pack_context([first, second], [first], token_budget=len(open(first).read()) // CHARS_PER_TOKEN + 20,
+                        file_cache=FileCache())
+  assert packed.included == [first]
+  assert packed.dropped == [(second, 'token budget')]
@@ -0,0 +1,58 @@
+import os
+import threading
+from utils.patcher import apply_correction, apply_corrections, atomic_write, group_corrections
+
+def answer(directory, file_name, line_number, code):
+  return {
+    'where': {'repository_path': str(directory), 'file_name': file_name, 'line_number': line_number},
+    'how': {'suggested_code_solution': code},
+  }
+
+def test_batch_line_numbers_refer_to_the_original_file(tmp_path):
+  path = tmp_path / 'app.py'
+  path.write_text('def f():\n    a = 1\n    b = 2\n    c = 3\n    return a\n')
+  responses = [answer(tmp_path, 'app.py', 4, 'c = 30'), answer(tmp_path, 'app.py', 2, 'a = 10\nprint(a)')]
+  assert group_corrections(responses) == {str(path): [(4, 'c = 30'), (2, 'a = 10\nprint(a)')]}
+  assert apply_corrections(responses) == {str(path): None}
+  assert path.read_text() == 'def f():\n    a = 10\n    print(a)\n    b = 2\n    c = 30\n    return a\n'
+
+def test_failed_batch_leaves_the_file_untouched(tmp_path):
+  path = tmp_path / 'app.py'
+  path.write_text('a = 1\nb = 2\n')
+  results = apply_corrections([answer(tmp_path, 'app.py', 1, 'a = 10'), answer(tmp_path, 'app.py', 9, 'z = 0')])
+  assert isinstance(results[str(path)], IndexError)
+  assert path.read_text() == 'a = 1\nb = 2\n'
+  results = apply_corrections([answer(tmp_path, 'app.py', 1, 'a = 10'), answer(tmp_path, 'app.py', 1, 'a = 11')])
+  assert isinstance(results[str(path)], ValueError)
+
+def test_concurrent_corrections_are_all_applied(tmp_path):
+  path = tmp_path / 'app.py'
+  path.write_text(''.join(f'x{i} = {i}\n' for i in range(50)))
+  threads = [
+    threading.Thread(target=apply_correction, args=(answer(tmp_path, 'app.py', i + 1, f'x{i} = -{i}'),))
+    for i in range(50)
+  ]
+  for thread in threads:
+    thread.start()
+  for thread in threads:
+    thread.join()
+  assert path.read_text() == ''.join(f'x{i} = -{i}\n' for i in range(50))
+  assert os.listdir(tmp_path) == ['app.py']
+
+def test_new_files_get_the_default_permissions(tmp_path):
+  umask = os.umask(0)
+  os.umask(umask)
+  path = tmp_path / 'new.py'
+  atomic_write(str(path), 'x = 1\n')
+  assert os.stat(path).st_mode & 0o777 == 0o666 & ~umask
+
+def test_existing_permissions_are_kept_and_symlinks_written_through(tmp_path):
+  target = tmp_path / 'target.py'
+  target.write_text('x = 1\n')
+  os.chmod(target, 0o640)
+  link = tmp_path / 'link.py'
+  link.symlink_to(target)
+  apply_correction(answer(tmp_path, 'link.py', 1, 'x = 2'))
+  assert link.is_symlink()
+  assert target.read_text() == 'x = 2\n'
+  assert os.stat(target).st_mode & 0o777 == 0o640
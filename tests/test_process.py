@@ -0,0 +1,44 @@
+import asyncio
+import pytest
+
+pytest.importorskip('groq')
+pytest.importorskip('dotenv')
+from process.process import SplatClient
+
+class FakeClient(SplatClient):
+  """
+  Answers after a delay given by the traceback, and fails on "boom".
+  """
+
+  def __init__(self):
+    super().__init__(use_cache=False)
+    self.in_flight = 0
+    self.max_in_flight = 0
+
+  async def process_async(self, traceback_message, original_error_information, context):
+    self.in_flight += 1
+    self.max_in_flight = max(self.max_in_flight, self.in_flight)
+    try:
+      await asyncio.sleep(float(original_error_information))
+      if traceback_message == 'boom':
+        raise RuntimeError('boom')
+      return f'answer {traceback_message}'
+    finally:
+      self.in_flight -= 1
+
+async def collect(client, items, concurrency):
+  return [pair async for pair in client.process_many(items, concurrency)]
+
+def test_process_many_yields_in_completion_order_with_indexes():
+  client = FakeClient()
+  items = [('a', '0.06', ''), ('b', '0.02', ''), ('c', '0.04', '')]
+  results = asyncio.run(collect(client, items, 3))
+  assert results == [(1, 'answer b'), (2, 'answer c'), (0, 'answer a')]
+
+def test_process_many_bounds_concurrency_and_keeps_going_after_a_failure():
+  client = FakeClient()
+  items = [('boom', '0.01', ''), ('b', '0.01', ''), ('c', '0.01', ''), ('d', '0.01', '')]
+  results = dict(asyncio.run(collect(client, items, 2)))
+  assert client.max_in_flight == 2
+  assert isinstance(results.pop(0), RuntimeError)
+  assert results == {1: 'answer b', 2: 'answer c', 3: 'answer d'}
@@ -0,0 +1,20 @@
+import queue
+import threading
+from relational import _warm
+from utils.bundle import default_file_cache
+
+def test_warm_resolves_the_imports_of_queued_frames(tmp_path):
+  (tmp_path / 'main.py').write_text('import helper\nhelper.run()\n')
+  (tmp_path / 'helper.py').write_text('def run():\n  raise ValueError\n')
+  frames = queue.SimpleQueue()
+  frames.put(str(tmp_path / 'main.py'))
+  default_file_cache.clear()
+  resolver, index = _warm(str(tmp_path), threading.Event(), frames)
+  try:
+    assert frames.empty()
+    hits = default_file_cache.hits
+    assert default_file_cache.get(str(tmp_path / 'helper.py')) is not None
+    assert default_file_cache.hits == hits + 1
+    assert index.lookup(str(tmp_path / 'main.py')) is not None
+  finally:
+    index.close()
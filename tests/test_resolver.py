@@ -0,0 +1,53 @@
+import os
+from utils.resolver import ModuleResolver
+
+def write(root, relative, content=''):
+  path = os.path.join(str(root), relative)
+  os.makedirs(os.path.dirname(path), exist_ok=True)
+  with open(path, 'w') as file:
+    file.write(content)
+  return path
+
+def test_resolves_modules_packages_and_submodules(tmp_path):
+  main = write(tmp_path, 'main.py')
+  init = write(tmp_path, 'pkg/__init__.py')
+  mod = write(tmp_path, 'pkg/mod.py')
+  resolver = ModuleResolver(str(tmp_path))
+  assert resolver.resolve(main, ('pkg.mod', 0, ())) == (mod,)
+  assert resolver.resolve(main, ('pkg', 0, ('mod', 'not_a_module'))) == (init, mod)
+  assert resolver.resolve(main, ('json', 0, ())) == ()
+
+def test_resolves_relative_imports(tmp_path):
+  init = write(tmp_path, 'pkg/__init__.py')
+  helper = write(tmp_path, 'pkg/helper.py')
+  nested = write(tmp_path, 'pkg/sub/nested.py')
+  resolver = ModuleResolver(str(tmp_path))
+  assert resolver.resolve(nested, ('helper', 2, ())) == (helper,)
+  assert resolver.resolve(nested, ('', 2, ('helper',))) == (init, helper)
+  # Above the project root.
+  assert resolver.resolve(nested, ('helper', 4, ())) == ()
+
+def test_resolves_src_layouts_and_script_siblings(tmp_path):
+  main = write(tmp_path, 'main.py')
+  mod = write(tmp_path, 'src/app/mod.py')
+  script = write(tmp_path, 'tools/run.py')
+  helper = write(tmp_path, 'tools/helper.py')
+  resolver = ModuleResolver(str(tmp_path))
+  assert resolver.resolve(main, ('app.mod', 0, ())) == (mod,)
+  assert resolver.resolve(script, ('helper', 0, ())) == (helper,)
+
+def test_resolves_javascript_and_c(tmp_path):
+  index = write(tmp_path, 'web/index.js')
+  button = write(tmp_path, 'web/components/button/index.tsx')
+  main = write(tmp_path, 'main.c')
+  header = write(tmp_path, 'include/util.h')
+  resolver = ModuleResolver(str(tmp_path))
+  assert resolver.resolve(index, ('./components/button', 0, ())) == (button,)
+  assert resolver.resolve(index, ('react', 0, ())) == ()
+  assert resolver.resolve(main, ('util.h', 0, ())) == (header,)
+
+def test_resolve_all_drops_self_imports_and_duplicates(tmp_path):
+  main = write(tmp_path, 'main.py')
+  helper = write(tmp_path, 'helper.py')
+  resolver = ModuleResolver(str(tmp_path))
+  assert resolver.resolve_all(main, [('main', 0, ()), ('helper', 0, ()), ('helper', 0, ('x',))]) == [helper]
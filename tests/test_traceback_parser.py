@@ -0,0 +1,36 @@
+from utils.traceback_parser import TracebackDetector
+
+TRACEBACK = (
+  'Traceback (most recent call last):\n'
+  '  File "app.py", line 3, in <module>\n'
+  '    main()\n'
+  'ValueError: bad value\n'
+)
+CHAINED = (
+  'Traceback (most recent call last):\n'
+  '  File "app.py", line 2, in <module>\n'
+  '    lookup()\n'
+  'KeyError: 1\n'
+  '\n'
+  'During handling of the above exception, another exception occurred:\n'
+  '\n'
+) + TRACEBACK
+
+def detect(text):
+  detector = TracebackDetector(context_lines=0)
+  found = [traceback for traceback in map(detector.feed, text.splitlines()) if traceback is not None]
+  flushed = detector.flush()
+  return found + ([flushed] if flushed is not None else [])
+
+def test_consecutive_tracebacks_are_separate():
+  assert detect(TRACEBACK * 2) == [TRACEBACK.rstrip('\n')] * 2
+
+def test_chained_traceback_is_one_block():
+  assert detect(CHAINED) == [CHAINED.rstrip('\n')]
+
+def test_partial_traceback_start_completes_the_previous_one():
+  detector = TracebackDetector(context_lines=0)
+  for line in TRACEBACK.splitlines():
+    assert detector.feed(line) is None
+  assert detector.feed_partial('During handling') is None
+  assert detector.feed_partial('Traceback (most') == TRACEBACK.rstrip('\n')
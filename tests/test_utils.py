@@ -0,0 +1,29 @@
+import os
+from relational import build_context
+from utils.utils import _project_index, build_adjacency_list, is_project_file
+
+def write(path, content):
+  os.makedirs(os.path.dirname(path), exist_ok=True)
+  with open(path, 'w') as file:
+    file.write(content)
+
+def test_relative_frame_paths_are_resolved(tmp_path, monkeypatch):
+  write(str(tmp_path / 'main.c'), '#include "util.h"\nint main() { return x; }\n')
+  write(str(tmp_path / 'util.h'), 'int y;\n')
+  monkeypatch.chdir(tmp_path)
+  graph = build_adjacency_list(['main.c'], str(tmp_path))
+  assert graph[str(tmp_path / 'main.c')] == [str(tmp_path / 'util.h')]
+  context = build_context('main.c:2:21: error: x undeclared', '-r', str(tmp_path))
+  assert sorted(context.files()) == [str(tmp_path / 'main.c'), str(tmp_path / 'util.h')]
+
+def test_is_project_file_accepts_relative_paths(tmp_path, monkeypatch):
+  monkeypatch.chdir(tmp_path)
+  assert is_project_file('src/main.rs', '.')
+  assert not is_project_file('/elsewhere/main.rs', str(tmp_path))
+
+def test_project_index_sees_files_added_to_nested_indicator_directories(tmp_path):
+  write(str(tmp_path / 'angular.json'), '{}')
+  os.makedirs(str(tmp_path / 'src'))
+  assert 'src/main.ts' not in _project_index(str(tmp_path))['paths']
+  write(str(tmp_path / 'src' / 'main.ts'), '')
+  assert 'src/main.ts' in _project_index(str(tmp_path))['paths']
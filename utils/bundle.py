@@ -0,0 +1,178 @@
+# [START bundle.py]
+"""
+A streaming, zero-copy container for the context that is sent to the LLM.
+A ContextBundle is a list of segments, each one either a slice of a memory-mapped file or a short piece of text
+(headers, separators, "lines omitted" markers), plus an offset index over the segments. File contents are never
+copied into Python strings while the bundle is being built; the whole bundle is serialized exactly once, when the
+request is made.
+
+The memory maps come from a FileCache, which keeps them open across runs of the same process (the zap shell, watch
+mode, ...), so analysing the same files again neither re-reads nor re-copies them.
+
+@usage:
+  bundle = ContextBundle()
+  bundle.add_text("File: foo.py\\nContent:\\n")
+  bundle.add_file("foo.py")
+  prompt = f"Context: {bundle}"  # serialized here, once
+"""
+import os
+import mmap
+import hashlib
+import threading
+from bisect import bisect_right
+from collections import OrderedDict
+from typing import List, Dict, Iterator, Optional, Tuple, Union
+
+# Number of files kept mapped by a FileCache before the least recently used map is released.
+MAX_MAPPED_FILES = 512
+
+class FileCache:
+  """
+  An LRU cache of read-only memory maps, validated against each file's (mtime_ns, size) on every access.
+  """
+
+  def __init__(self, max_files: int = MAX_MAPPED_FILES):
+    self.max_files = max_files
+    self.hits = 0
+    self.misses = 0
+    self._maps: "OrderedDict[str, Tuple[Tuple[int, int], Union[mmap.mmap, bytes]]]" = OrderedDict()
+    self._lock = threading.Lock()
+
+  def get(self, path: str) -> Optional[Union[mmap.mmap, bytes]]:
+    """
+    Return a buffer over the file's bytes, or None if it cannot be opened.
+    """
+    try:
+      st = os.stat(path)
+    except OSError:
+      self.invalidate(path)
+      return None
+    signature = (st.st_mtime_ns, st.st_size)
+
+    with self._lock:
+      entry = self._maps.get(path)
+      if entry is not None and entry[0] == signature:
+        self._maps.move_to_end(path)
+        self.hits += 1
+        return entry[1]
+
+    try:
+      with open(path, 'rb') as f:
+        # mmap cannot map empty files.
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if st.st_size else b''
+    except (OSError, ValueError):
+      return None
+
+    with self._lock:
+      self.misses += 1
+      self._maps[path] = (signature, buffer)
+      self._maps.move_to_end(path)
+      while len(self._maps) > self.max_files:
+        # Evicted maps are closed by the garbage collector once no bundle references them any more.
+        self._maps.popitem(last=False)
+    return buffer
+
+  def invalidate(self, path: str):
+    with self._lock:
+      self._maps.pop(path, None)
+
+  def clear(self):
+    with self._lock:
+      self._maps.clear()
+
+# Shared by every bundle that is not given its own cache.
+default_file_cache = FileCache()
+
+class ContextBundle:
+  """
+  An append-only sequence of byte segments with an offset index.
+  """
+
+  def __init__(self, file_cache: Optional[FileCache] = None):
+    self.file_cache = file_cache if file_cache is not None else default_file_cache
+    self._segments: List[Tuple[Union[mmap.mmap, bytes], int, int, Optional[str]]] = []
+    self._offsets: List[int] = []
+    self._size = 0
+    self._serialized: Optional[str] = None
+
+  def _append(self, buffer: Union[mmap.mmap, bytes], start: int, end: int, path: Optional[str] = None):
+    if end <= start:
+      return
+    self._segments.append((buffer, start, end, path))
+    self._offsets.append(self._size)
+    self._size += end - start
+    self._serialized = None
+
+  def add_text(self, text: str):
+    """
+    Append a short piece of text (headers, markers, ...).
+    """
+    data = text.encode('utf-8')
+    self._append(data, 0, len(data))
+
+  def add_file(self, path: str, start: int = 0, end: Optional[int] = None) -> bool:
+    """
+    Append the byte range [start, end) of a file without copying it. Returns False if the file cannot be mapped.
+    """
+    buffer = self.file_cache.get(path)
+    if buffer is None:
+      return False
+    end = len(buffer) if end is None else min(end, len(buffer))
+    self._append(buffer, start, end, path)
+    return True
+
+  def extend(self, writer: Iterator[Union[str, Tuple[str, int, Optional[int]]]]):
+    """
+    Consume a generator that yields text or (path, start, end) file ranges.
+    """
+    for item in writer:
+      if isinstance(item, str):
+        self.add_text(item)
+      else:
+        self.add_file(*item)
+
+  def __len__(self) -> int:
+    return self._size
+
+  def segment_at(self, offset: int) -> Tuple[Optional[str], int]:
+    """
+    Map an offset in the serialized bundle back to (file path or None for text, offset within that file).
+    """
+    if not 0 <= offset < self._size:
+      raise IndexError(offset)
+    i = bisect_right(self._offsets, offset) - 1
+    _, start, _, path = self._segments[i]
+    return path, start + offset - self._offsets[i]
+
+  def iter_chunks(self) -> Iterator[memoryview]:
+    """
+    Yield every segment as a memoryview, in order, without copying.
+    """
+    for buffer, start, end, _ in self._segments:
+      yield memoryview(buffer)[start:end]
+
+  def files(self) -> List[str]:
+    return list(dict.fromkeys(path for _, _, _, path in self._segments if path is not None))
+
+  def content_hashes(self) -> Dict[str, str]:
+    """
+    The sha256 of the bytes each file contributes to the bundle, keyed by path.
+    """
+    hashes: Dict[str, "hashlib._Hash"] = {}
+    for buffer, start, end, path in self._segments:
+      if path is not None:
+        hashes.setdefault(path, hashlib.sha256()).update(memoryview(buffer)[start:end])
+    return {path: h.hexdigest() for path, h in hashes.items()}
+
+  def serialize(self) -> str:
+    """
+    Build the request text. This is the only place the segments are copied, and the result is kept.
+    """
+    if self._serialized is None:
+      self._serialized = b''.join(self.iter_chunks()).decode('utf-8', errors='replace')
+    return self._serialized
+
+  def __str__(self) -> str:
+    return self.serialize()
+
+# [END bundle.py]
@@ -0,0 +1,87 @@
+# [START extractors.py]
+"""
+Per-language import extractors for build_adjacency_list.
+Python is parsed with ast; every other language is scanned with precompiled regular expressions at the token level,
+which is much cheaper than a real parser and good enough to find import edges.
+
+Every extractor returns import specs in the same (module, level, names) shape, so that the persistent index, the
+process pool and the traversal do not care about the language:
+  - python:      (module, ImportFrom.level, imported names)
+  - javascript:  (specifier, 0, ())                       e.g. ('./App', 0, ()), ('@/lib/db', 0, ())
+  - java:        (qualified name, 1 if static else 0, ())  e.g. ('com.acme.util.*', 0, ())
+  - c:           (header, 1 if <...> else 0, ())           e.g. ('utils.h', 0, ())
+  - go:          (import path, 0, ())                      e.g. ('example.com/app/internal/db', 0, ())
+The ModuleResolver turns them into files, based on the language of the importing file.
+"""
+import ast
+import os
+import re
+from typing import Callable, Dict, List, Optional
+
+LANGUAGE_BY_EXTENSION = {
+  '.py': 'python',
+  '.js': 'javascript', '.jsx': 'javascript', '.mjs': 'javascript', '.cjs': 'javascript',
+  '.ts': 'javascript', '.tsx': 'javascript', '.mts': 'javascript', '.cts': 'javascript',
+  '.java': 'java',
+  '.c': 'c', '.h': 'c', '.cc': 'c', '.cpp': 'c', '.cxx': 'c', '.hh': 'c', '.hpp': 'c', '.hxx': 'c',
+  '.go': 'go',
+}
+
+JS_IMPORT_PATTERNS = [
+  # import x from 'y' / import { x } from 'y' / export * from 'y' / import type { X } from 'y'
+  re.compile(r'\b(?:import|export)\s[^;\'"`]*?\bfrom\s*[\'"]([^\'"\n]+)[\'"]'),
+  # import 'y' (side effects only)
+  re.compile(r'\bimport\s*[\'"]([^\'"\n]+)[\'"]'),
+  # require('y') / import('y') / jest.mock('y')
+  re.compile(r'\b(?:require|import|jest\.mock)\s*\(\s*[\'"]([^\'"\n]+)[\'"]\s*\)'),
+]
+JAVA_IMPORT_PATTERN = re.compile(r'^\s*import\s+(static\s+)?([\w.]+(?:\.\*)?)\s*;', re.MULTILINE)
+C_INCLUDE_PATTERN = re.compile(r'^\s*#\s*include\s*([<"])([^>"\n]+)[>"]', re.MULTILINE)
+GO_IMPORT_BLOCK_PATTERN = re.compile(r'^import\s*\(([^)]*)\)', re.MULTILINE)
+GO_IMPORT_LINE_PATTERN = re.compile(r'^import\s+(?:[\w.]+\s+)?"([^"]+)"', re.MULTILINE)
+GO_QUOTED_PATTERN = re.compile(r'"([^"]+)"')
+
+def language_of(path: str) -> Optional[str]:
+  return LANGUAGE_BY_EXTENSION.get(os.path.splitext(path)[1].lower())
+
+def extract_python(content: str) -> List[tuple]:
+  imports = set()
+  try:
+    tree = ast.parse(content)
+  except SyntaxError:
+    return []
+
+  for node in ast.walk(tree):
+    if isinstance(node, ast.Import):
+      imports.update((alias.name, 0, ()) for alias in node.names)
+    elif isinstance(node, ast.ImportFrom):
+      imports.add((node.module or '', node.level, tuple(sorted(alias.name for alias in node.names if alias.name != '*'))))
+  return sorted(imports)
+
+def extract_javascript(content: str) -> List[tuple]:
+  specifiers = set()
+  for pattern in JS_IMPORT_PATTERNS:
+    specifiers.update(pattern.findall(content))
+  return sorted((specifier, 0, ()) for specifier in specifiers)
+
+def extract_java(content: str) -> List[tuple]:
+  return sorted({(name, 1 if static else 0, ()) for static, name in JAVA_IMPORT_PATTERN.findall(content)})
+
+def extract_c(content: str) -> List[tuple]:
+  return sorted({(header.strip(), 1 if bracket == '<' else 0, ()) for bracket, header in C_INCLUDE_PATTERN.findall(content)})
+
+def extract_go(content: str) -> List[tuple]:
+  paths = set(GO_IMPORT_LINE_PATTERN.findall(content))
+  for block in GO_IMPORT_BLOCK_PATTERN.findall(content):
+    paths.update(GO_QUOTED_PATTERN.findall(block))
+  return sorted((path, 0, ()) for path in paths)
+
+EXTRACTORS: Dict[str, Callable[[str], List[tuple]]] = {
+  'python': extract_python,
+  'javascript': extract_javascript,
+  'java': extract_java,
+  'c': extract_c,
+  'go': extract_go,
+}
+
+# [END extractors.py]
@@ -0,0 +1,197 @@
+# [START fingerprint.py]
+"""
+Traceback fingerprinting, so that an exception a server or test suite raises hundreds of times is analyzed once.
+
+A fingerprint is the hash of what stays the same between occurrences of one error:
+  - the exception type and its message with the variable fragments (addresses, temp paths, ids, numbers,
+    quoted values) replaced by placeholders,
+  - the frame signature: (path, function) of every frame, without line numbers, so an edit above the failing
+    line does not split the class. Temp directories and install prefixes are stripped from paths.
+Occurrences with the same fingerprint are grouped into an ErrorClass with a count, and expensive work (context
+building, the LLM request) can be attached to the class and run once.
+"""
+import os
+import re
+import time
+import hashlib
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from utils.traceback_parser import Frame, HEX_ADDRESS_PATTERN, TracebackDetector, iter_string_lines, parse_frames
+
+TEMP_PATH_PATTERN = re.compile(
+  r'(?:/private)?(?:/tmp|/var/tmp|/var/folders/[^/\s]+/[^/\s]+/T)/[^\s\'",:)]*|[A-Za-z]:\\[^\s\'"]*\\Temp\\[^\s\'",:)]*'
+)
+UUID_PATTERN = re.compile(r'\b[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}\b')
+QUOTED_PATTERN = re.compile(r'\'[^\'\n]*\'|"[^"\n]*"')
+NUMBER_PATTERN = re.compile(r'\b\d+(?:\.\d+)?\b')
+# Everything up to these directories is the install location, which differs between machines and virtualenvs.
+INSTALL_MARKERS = ('/site-packages/', '/dist-packages/', '/node_modules/', '/go/pkg/mod/')
+# "ValueError: x", "java.lang.IllegalStateException: x", "Uncaught TypeError: x", "panic: x", "fatal error: x"
+EXCEPTION_LINE_PATTERN = re.compile(
+  r'^\s*(?:Uncaught |Caused by: |Exception in thread "[^"]*" )?'
+  r'(?P<type>[\w$.]*(?:Error|Exception|Warning|Interrupt|Exit|Throwable|Failure)|panic|fatal error)'
+  r'(?::\s*(?P<message>.*))?$'
+)
+
+def normalize_message(message: str) -> str:
+  """
+  Replace the fragments of an error message that vary between occurrences with placeholders.
+  """
+  message = TEMP_PATH_PATTERN.sub('<tmp>', message)
+  message = UUID_PATTERN.sub('<uuid>', message)
+  message = HEX_ADDRESS_PATTERN.sub('<addr>', message)
+  message = QUOTED_PATTERN.sub('<str>', message)
+  message = NUMBER_PATTERN.sub('<n>', message)
+  return ' '.join(message.split())
+
+def normalize_frame_path(path: str) -> str:
+  path = path.replace('\\', '/')
+  for marker in INSTALL_MARKERS:
+    index = path.rfind(marker)
+    if index != -1:
+      return path[index + 1:]
+  if TEMP_PATH_PATTERN.match(path):
+    return '<tmp>/' + os.path.basename(path)
+  if os.path.isabs(path):
+    try:
+      relative = os.path.relpath(path)
+    except ValueError:
+      return path
+    if not relative.startswith('..'):
+      return relative
+  return path
+
+def exception_line(traceback: str, language: Optional[str] = None) -> Tuple[str, str]:
+  """
+  Return the (type, normalized message) of a traceback's exception, or ('', '') if none is recognizable.
+  Python prints the exception after the frames (and the last one of a chain is the one raised), the other
+  languages print it before the frames.
+  """
+  found = ('', '')
+  for line in iter_string_lines(traceback):
+    match = EXCEPTION_LINE_PATTERN.match(line)
+    if match is None:
+      continue
+    found = (match.group('type'), normalize_message(match.group('message') or ''))
+    if language not in (None, 'python'):
+      break
+  return found
+
+@dataclass
+class ErrorClass:
+  fingerprint: str
+  error_type: str
+  message: str
+  frames: Tuple[Tuple[str, str], ...]
+  example: str
+  count: int = 0
+  first_seen: float = field(default_factory=time.time)
+  last_seen: float = field(default_factory=time.time)
+  # The output of the expensive work done for the class (see ErrorGrouper.analyze).
+  result: Any = None
+
+'''
+Fingerprints a traceback.
+@param traceback: str - The text of one traceback (see split_tracebacks for a log holding many).
+@returns: Tuple[str, str, str, Tuple[Tuple[str, str], ...]] - (fingerprint, exception type, normalized message, frames).
+'''
+def fingerprint(traceback: str) -> Tuple[str, str, str, Tuple[Tuple[str, str], ...]]:
+  frames: List[Frame] = [frame for frame in parse_frames(traceback, existing_only=False) if frame.line is not None]
+  language = frames[0].language if frames else None
+  error_type, message = exception_line(traceback, language)
+  signature = tuple((normalize_frame_path(frame.path), frame.function or '') for frame in frames)
+  digest = hashlib.sha1()
+  digest.update(f'{error_type}\0{message}\0'.encode('utf-8', errors='replace'))
+  for path, function in signature:
+    digest.update(f'{path}\0{function}\n'.encode('utf-8', errors='replace'))
+  return digest.hexdigest(), error_type, message, signature
+
+def split_tracebacks(text: str) -> List[str]:
+  """
+  Cut error output (e.g. the stderr of a server) into its individual tracebacks.
+  """
+  detector = TracebackDetector(context_lines=0)
+  tracebacks = []
+  for line in iter_string_lines(text):
+    traceback = detector.feed(line)
+    if traceback is not None:
+      tracebacks.append(traceback)
+  traceback = detector.flush()
+  if traceback is not None:
+    tracebacks.append(traceback)
+  return tracebacks
+
+class ErrorGrouper:
+  """
+  Groups traceback occurrences into error classes by fingerprint. Safe to feed from several threads.
+
+  Usage:
+    grouper = ErrorGrouper()
+    for traceback in split_tracebacks(stderr):
+      error_class, is_new = grouper.add(traceback)
+    for error_class in grouper.classes():
+      print(error_class.count, error_class.error_type)
+  """
+
+  def __init__(self):
+    self._classes: Dict[str, ErrorClass] = {}
+    self._lock = threading.Lock()
+
+  def add(self, traceback: str) -> Tuple[ErrorClass, bool]:
+    """
+    Record one occurrence; returns its class and whether this is the first occurrence of that class.
+    """
+    key, error_type, message, frames = fingerprint(traceback)
+    with self._lock:
+      error_class = self._classes.get(key)
+      is_new = error_class is None
+      if is_new:
+        error_class = self._classes[key] = ErrorClass(key, error_type, message, frames, traceback)
+      error_class.count += 1
+      error_class.last_seen = time.time()
+    return error_class, is_new
+
+  def analyze(self, error_class: ErrorClass, analyze: Callable[[ErrorClass], Any]) -> Any:
+    """
+    Run `analyze` on the example of a class the first time it is asked for, and return the stored result after.
+    """
+    if error_class.result is None:
+      error_class.result = analyze(error_class)
+    return error_class.result
+
+  def classes(self) -> List[ErrorClass]:
+    """
+    The error classes, most frequent first.
+    """
+    with self._lock:
+      return sorted(self._classes.values(), key=lambda error_class: (-error_class.count, error_class.first_seen))
+
+  def __len__(self) -> int:
+    return len(self._classes)
+
+def group_tracebacks(tracebacks: Iterable[str]) -> List[ErrorClass]:
+  grouper = ErrorGrouper()
+  for traceback in tracebacks:
+    grouper.add(traceback)
+  return grouper.classes()
+
+'''
+Collapses repeated errors in error output to one example per error class.
+@param text: str - Error output holding any number of tracebacks.
+@returns: str - The example traceback of each class, most frequent first, each followed by its occurrence count;
+  the text itself when it holds at most one traceback.
+'''
+def deduplicate_tracebacks(text: str) -> str:
+  tracebacks = split_tracebacks(text)
+  if len(tracebacks) <= 1:
+    return text
+  classes = group_tracebacks(tracebacks)
+  if len(classes) == len(tracebacks):
+    return text
+  return '\n\n'.join(
+    error_class.example + (f"\n[the same error occurred {error_class.count} times]" if error_class.count > 1 else '')
+    for error_class in classes
+  )
+
+# [END fingerprint.py]
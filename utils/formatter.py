@@ -0,0 +1,209 @@
+# [START formatter.py]
+"""
+Formats the code around an applied fix, and only that code.
+Black is run on the smallest statement block enclosing the changed lines (the innermost statement that covers them,
+or the run of sibling statements they span), moved into a placeholder scope at the first level of indentation, and the
+result is re-indented and spliced back.
+The rest of the file is left byte for byte as it was, so a one-line fix costs a one-block format and a one-block diff.
+
+@note: formatted blocks are cached by a hash of their content and of the black settings; the same fix applied twice
+  (or re-applied by the verification loop) is not formatted again.
+@note: a file that does not parse after the fix, or a block black rejects, is left as it is.
+"""
+import io
+import os
+import ast
+import tokenize
+import hashlib
+import threading
+import dataclasses
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Iterable, List, Optional, Set, Tuple
+import black
+
+MAX_CACHED_BLOCKS = 1024
+# The placeholder scope nested blocks are formatted in.
+SCOPE_HEADER = 'class _:\n'
+SCOPE_INDENT = '    '
+
+_cache: 'OrderedDict[str, str]' = OrderedDict()
+_cache_lock = threading.Lock()
+
+@lru_cache(maxsize=64)
+def project_mode(directory: str) -> black.Mode:
+  """
+  The black settings of the project a directory belongs to, from the nearest pyproject.toml with a [tool.black] table.
+  """
+  try:
+    config_path = black.find_pyproject_toml((directory,))
+    config = black.parse_pyproject_toml(config_path) if config_path else {}
+  except Exception:
+    config = {}
+  return black.Mode(
+    target_versions={black.TargetVersion[version.upper()] for version in config.get('target_version', [])},
+    line_length=int(config.get('line_length', black.DEFAULT_LINE_LENGTH)),
+    string_normalization=not config.get('skip_string_normalization', False),
+    magic_trailing_comma=not config.get('skip_magic_trailing_comma', False),
+    preview=bool(config.get('preview', False)),
+  )
+
+def statement_span(node: ast.stmt) -> Tuple[int, int]:
+  """
+  The 1-based (first, last) lines of a statement, decorators included.
+  """
+  first = min([node.lineno] + [decorator.lineno for decorator in getattr(node, 'decorator_list', [])])
+  return first, node.end_lineno
+
+def enclosing_block(tree: ast.Module, lines: List[str], start: int, end: int) -> Optional[Tuple[int, int]]:
+  """
+  The lines of the smallest statement block covering lines start..end: the innermost statement containing them all,
+  or else the sibling statements they overlap in the innermost body containing them.
+  """
+  body: List[ast.stmt] = tree.body
+  block = None
+  while True:
+    overlapping = [node for node in body if statement_span(node)[0] <= end and statement_span(node)[1] >= start]
+    if not overlapping:
+      return block
+    first, last = statement_span(overlapping[0])[0], statement_span(overlapping[-1])[1]
+    block = (min(first, start), max(last, end))
+    if len(overlapping) > 1:
+      return block
+    node = overlapping[0]
+    # Descend into the body (or else/finally/handler body) holding the whole range, if any.
+    inner = None
+    for field in ('body', 'orelse', 'finalbody', 'handlers', 'cases'):
+      children = getattr(node, field, None)
+      if not isinstance(children, list) or not children or not isinstance(children[0], ast.AST):
+        continue
+      if field in ('handlers', 'cases'):
+        candidates = [child.body for child in children]
+      else:
+        candidates = [children]
+      for candidate in candidates:
+        if field == 'orelse' and lines[candidate[0].lineno - 1].lstrip().startswith('elif'):
+          # An elif branch is not a statement on its own; the whole if statement is formatted.
+          continue
+        if candidate and statement_span(candidate[0])[0] <= start and statement_span(candidate[-1])[1] >= end:
+          inner = candidate
+    if inner is None:
+      return block
+    body = inner
+
+def string_lines(code: str) -> Set[int]:
+  """
+  The (1-based) lines that continue a multiline string literal; their leading whitespace is part of the string.
+  """
+  lines: Set[int] = set()
+  # Python 3.12+ splits f-strings into several tokens; the whole literal is from FSTRING_START to FSTRING_END.
+  fstring_start, fstring_end = getattr(tokenize, 'FSTRING_START', None), getattr(tokenize, 'FSTRING_END', None)
+  starts: List[int] = []
+  try:
+    for token in tokenize.generate_tokens(io.StringIO(code).readline):
+      if token.type == fstring_start:
+        starts.append(token.start[0])
+      elif token.type == fstring_end and starts:
+        lines.update(range(starts.pop() + 1, token.end[0] + 1))
+      elif token.type == tokenize.STRING and token.end[0] > token.start[0]:
+        lines.update(range(token.start[0] + 1, token.end[0] + 1))
+  except (tokenize.TokenError, SyntaxError):
+    pass
+  return lines
+
+def format_block(code: str, mode: black.Mode) -> str:
+  """
+  Black on a dedented block, through the content-hash cache.
+  """
+  key = hashlib.sha256(f'{mode!r}\0{code}'.encode('utf-8', errors='replace')).hexdigest()
+  with _cache_lock:
+    if key in _cache:
+      _cache.move_to_end(key)
+      return _cache[key]
+  formatted = black.format_str(code, mode=mode)
+  with _cache_lock:
+    _cache[key] = formatted
+    while len(_cache) > MAX_CACHED_BLOCKS:
+      _cache.popitem(last=False)
+  return formatted
+
+def _merge(spans: Iterable[Tuple[int, int]]) -> List[Tuple[int, int]]:
+  merged: List[Tuple[int, int]] = []
+  for first, last in sorted(spans):
+    if merged and first <= merged[-1][1]:
+      merged[-1] = (merged[-1][0], max(merged[-1][1], last))
+    else:
+      merged.append((first, last))
+  return merged
+
+'''
+Formats the statement blocks enclosing some line ranges of a Python source.
+@param source: str - The whole file.
+@param ranges: Iterable[Tuple[int, int]] - 1-based, inclusive (first, last) line ranges that changed.
+@param mode: Optional[black.Mode] - Defaults to black's defaults.
+@returns: str - The source with those blocks formatted; unchanged if it does not parse.
+'''
+def format_ranges(source: str, ranges: Iterable[Tuple[int, int]], mode: Optional[black.Mode] = None) -> str:
+  mode = mode or black.Mode()
+  try:
+    tree = ast.parse(source)
+  except (SyntaxError, ValueError):
+    return source
+  lines = source.splitlines(keepends=True)
+  in_strings = string_lines(source)
+  blocks = _merge(filter(None, (enclosing_block(tree, lines, first, last) for first, last in ranges)))
+  # From the bottom up, so that a block growing or shrinking does not shift the ones not formatted yet.
+  for first, last in reversed(blocks):
+    block = lines[first - 1:last]
+    indentation = block[0][:len(block[0]) - len(block[0].lstrip(' \t'))]
+    inside = {number - first for number in in_strings if first <= number <= last}
+    if any((line.strip() or index in inside) and not line.startswith(indentation) for index, line in enumerate(block)):
+      # Lines left of the block (e.g. in a multiline string): it cannot be dedented without changing the program.
+      continue
+    # Lines inside string literals are shifted as they are, blank or not, and shifted back the same way below.
+    code = ''.join(
+      line[len(indentation):] if line.strip() or index in inside else line.lstrip(' \t')
+      for index, line in enumerate(block)
+    )
+    if not code.endswith('\n'):
+      code += '\n'
+    block_mode = mode
+    if indentation:
+      # A nested block is formatted in a placeholder scope, so that black lays it out as nested code (one blank line
+      # between methods, not two), and must fit in what its real indentation leaves.
+      inside_code = string_lines(code)
+      code = SCOPE_HEADER + ''.join(
+        SCOPE_INDENT + line if line.strip() or number in inside_code else line
+        for number, line in enumerate(code.splitlines(True), 1)
+      )
+      width = len(indentation.expandtabs()) - len(SCOPE_INDENT)
+      block_mode = dataclasses.replace(mode, line_length=max(mode.line_length - width, 1))
+    try:
+      formatted = format_block(code, block_mode)
+    except Exception:
+      continue
+    inside_formatted = string_lines(formatted)
+    formatted_lines = [
+      (line, number in inside_formatted) for number, line in enumerate(formatted.splitlines(keepends=True), 1)
+    ]
+    if indentation:
+      if not formatted_lines or formatted_lines[0][0] != SCOPE_HEADER:
+        continue
+      formatted_lines = [
+        (line[len(SCOPE_INDENT):] if line.strip() or string else line, string) for line, string in formatted_lines[1:]
+      ]
+    replacement = [indentation + line if line.strip() or string else line for line, string in formatted_lines]
+    if not block[-1].endswith('\n') and replacement:
+      replacement[-1] = replacement[-1].rstrip('\n')
+    lines[first - 1:last] = replacement
+  return ''.join(lines)
+
+def format_file_ranges(file_path: str, source: str, ranges: Iterable[Tuple[int, int]]) -> str:
+  """
+  format_ranges with the black settings of the project of a file; sources in other languages are returned as they are.
+  """
+  if not file_path.endswith(('.py', '.pyi')):
+    return source
+  return format_ranges(source, ranges, project_mode(os.path.dirname(os.path.abspath(file_path))))
+
+# [END formatter.py]
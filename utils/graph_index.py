@@ -0,0 +1,128 @@
+# [START graph_index.py]
+"""
+A persistent, on-disk index of the import statements found by build_adjacency_list.
+Parsing every file on every "splat squash -r" call is slow on large repositories, so the imports of each
+file are stored in a small SQLite database under the project and only re-parsed when the file changes.
+The stored imports are resolved to files by the (memoized) ModuleResolver, so a file that appears later
+is picked up without invalidating the files that import it.
+
+@note: a row is considered fresh when both the mtime (in ns) and the size of the file match what was stored.
+@note: the database lives in "<project_root>/.splat/graph.db" unless a path is given.
+"""
+import os
+import json
+import sqlite3
+from typing import List, Optional, Tuple
+from utils.resolver import ImportSpec
+
+INDEX_DIRNAME = '.splat'
+INDEX_FILENAME = 'graph.db'
+SCHEMA_VERSION = 3
+
+def file_signature(path: str) -> Optional[Tuple[int, int]]:
+  """
+  Return the (mtime_ns, size) pair used to invalidate index rows, or None if the file cannot be stat'ed.
+  """
+  try:
+    st = os.stat(path)
+  except OSError:
+    return None
+  return st.st_mtime_ns, st.st_size
+
+class ImportGraphIndex:
+  """
+  Stores the import specs of every parsed file, keyed by absolute path.
+
+  Usage:
+    with ImportGraphIndex(project_root) as index:
+      graph = build_adjacency_list(files, project_root, index=index)
+  """
+
+  def __init__(self, project_root: str, path: Optional[str] = None):
+    self.project_root = os.path.abspath(project_root)
+    if path is None:
+      index_dir = os.path.join(self.project_root, INDEX_DIRNAME)
+      os.makedirs(index_dir, exist_ok=True)
+      path = os.path.join(index_dir, INDEX_FILENAME)
+    self.path = path
+    self.hits = 0
+    self.misses = 0
+    # The index may be opened on one thread and used on another (e.g. warmed in the background), never concurrently.
+    self._conn = sqlite3.connect(self.path, check_same_thread=False)
+    self._conn.execute('PRAGMA journal_mode=WAL')
+    self._conn.execute('PRAGMA synchronous=NORMAL')
+    self._create_schema()
+
+  def _create_schema(self):
+    version = self._conn.execute('PRAGMA user_version').fetchone()[0]
+    if version != SCHEMA_VERSION:
+      # The stored format changed; the index is only a cache so it is simply rebuilt.
+      self._conn.execute('DROP TABLE IF EXISTS files')
+      self._conn.execute(f'PRAGMA user_version={SCHEMA_VERSION}')
+    self._conn.execute(
+      'CREATE TABLE IF NOT EXISTS files ('
+      ' path TEXT PRIMARY KEY,'
+      ' mtime_ns INTEGER NOT NULL,'
+      ' size INTEGER NOT NULL,'
+      ' imports TEXT NOT NULL)'
+    )
+    self._conn.commit()
+
+  def lookup(self, file: str) -> Optional[List[ImportSpec]]:
+    """
+    Return the stored import specs of a file if its row is still fresh, otherwise None.
+    """
+    signature = file_signature(file)
+    if signature is None:
+      return None
+    row = self._conn.execute(
+      'SELECT mtime_ns, size, imports FROM files WHERE path = ?', (file,)
+    ).fetchone()
+    if row is None or (row[0], row[1]) != signature:
+      self.misses += 1
+      return None
+    self.hits += 1
+    return [(module, level, tuple(names)) for module, level, names in json.loads(row[2])]
+
+  def store(self, file: str, imports: List[ImportSpec]):
+    """
+    Record the import specs of a freshly parsed file together with its current signature.
+    """
+    signature = file_signature(file)
+    if signature is None:
+      return
+    self._conn.execute(
+      'INSERT OR REPLACE INTO files (path, mtime_ns, size, imports) VALUES (?, ?, ?, ?)',
+      (file, signature[0], signature[1], json.dumps(imports))
+    )
+
+  def invalidate(self, file: str):
+    """
+    Drop the row of a file so that it is re-parsed on the next lookup.
+    """
+    self._conn.execute('DELETE FROM files WHERE path = ?', (file,))
+
+  def prune(self):
+    """
+    Remove rows for files that no longer exist on disk.
+    """
+    stale = [path for (path,) in self._conn.execute('SELECT path FROM files') if not os.path.exists(path)]
+    self._conn.executemany('DELETE FROM files WHERE path = ?', [(path,) for path in stale])
+    self._conn.commit()
+
+  def commit(self):
+    self._conn.commit()
+
+  def close(self):
+    if self._conn is not None:
+      self._conn.commit()
+      self._conn.close()
+      self._conn = None
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, exc_type, exc, tb):
+    self.close()
+
+# [END graph_index.py]
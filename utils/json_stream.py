@@ -0,0 +1,103 @@
+# [START json_stream.py]
+"""
+An incremental parser for a JSON object that arrives in pieces (e.g. a streamed LLM completion).
+Each top-level member is handed out as soon as its value is complete, so the "where" and "what" sections of an
+answer can be shown while "how" is still being generated.
+
+@note: only the top-level structure is tracked (nesting depth, strings and escapes); each member is decoded with
+  json.loads once it is complete, so every character is scanned once and decoded at most once.
+@note: text before the opening brace (e.g. a model that says "Here is the JSON:") is skipped.
+"""
+import json
+from typing import Any, Iterator, List, Optional, Tuple
+
+class IncrementalJSONParser:
+  """
+  Usage:
+    parser = IncrementalJSONParser()
+    for chunk in chunks:
+      for key, value in parser.feed(chunk):
+        ...
+    parser.close()  # raises ValueError if the object never completed
+  """
+
+  def __init__(self):
+    self.buffer = ''
+    self.done = False
+    self.result = {}
+    self._position = 0
+    self._depth = 0
+    self._in_string = False
+    self._escaped = False
+    self._member_start: Optional[int] = None
+
+  def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+    """
+    Add a chunk of text; returns the (key, value) pairs of the top-level members completed by it.
+    """
+    if self.done:
+      return []
+    self.buffer += chunk
+    completed = []
+    buffer = self.buffer
+    for position in range(self._position, len(buffer)):
+      char = buffer[position]
+      if self._in_string:
+        if self._escaped:
+          self._escaped = False
+        elif char == '\\':
+          self._escaped = True
+        elif char == '"':
+          self._in_string = False
+        continue
+
+      if self._depth == 0:
+        if char == '{':
+          self._depth = 1
+          self._member_start = position + 1
+        continue
+
+      if char == '"':
+        self._in_string = True
+      elif char in '{[':
+        self._depth += 1
+      elif char in '}]':
+        self._depth -= 1
+        if self._depth == 0:
+          completed.extend(self._member(buffer[self._member_start:position]))
+          self.done = True
+          self._position = position + 1
+          return completed
+      elif char == ',' and self._depth == 1:
+        completed.extend(self._member(buffer[self._member_start:position]))
+        self._member_start = position + 1
+    self._position = len(buffer)
+    return completed
+
+  def _member(self, text: str) -> Iterator[Tuple[str, Any]]:
+    if not text.strip():
+      return
+    member = json.loads('{' + text + '}')
+    self.result.update(member)
+    yield from member.items()
+
+  def close(self) -> dict:
+    """
+    End of input: return the whole object, or raise ValueError if it was not complete.
+    """
+    if not self.done:
+      raise ValueError(f"Incomplete JSON object: {self.buffer[-200:]!r}")
+    return self.result
+
+'''
+Parses a stream of text chunks into the top-level members of the JSON object they spell out.
+@param chunks: Iterable[str] - The pieces of the text, in order.
+@returns: Iterator[Tuple[str, Any]] - Each (key, value) pair as soon as it is complete.
+'''
+def iter_json_members(chunks) -> Iterator[Tuple[str, Any]]:
+  parser = IncrementalJSONParser()
+  for chunk in chunks:
+    yield from parser.feed(chunk)
+  parser.close()
+
+# [END json_stream.py]
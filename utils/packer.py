@@ -0,0 +1,254 @@
+# [START packer.py]
+"""
+A token-budgeted replacement for run_mock_repopack, writing into a ContextBundle.
+Files are ranked by their graph distance from the files in the error stack: the stack files themselves come first,
+then their direct imports, and so on. Each file is added in full while it fits in the budget; once it does not,
+it is cut down to a window around the failing lines or to its head and tail, and anything that still does not fit
+is dropped and reported.
+
+@note: tokens are estimated from the character count; this is close enough to keep prompts inside the context window.
+"""
+import os
+from collections import deque
+from dataclasses import dataclass, field
+from typing import List, Dict, Optional, Tuple, Union
+from utils.bundle import ContextBundle, FileCache
+
+# llama3-70b-8192 has an 8k window; the system prompt, the traceback and the answer need the rest.
+DEFAULT_TOKEN_BUDGET = 6000
+CHARS_PER_TOKEN = 4
+# Files larger than this are never read, they are almost certainly generated or vendored.
+MAX_FILE_BYTES = 512 * 1024
+# A truncated file smaller than this is not worth the tokens it costs.
+MIN_SLICE_TOKENS = 64
+# Lines longer than this are a strong sign of minified or generated code.
+MINIFIED_LINE_LENGTH = 1000
+BINARY_SNIFF_BYTES = 8192
+SEPARATOR = "=" * 50
+# Only this many omitted files are named in the context itself; the full list is in the report.
+MAX_LISTED_OMISSIONS = 20
+
+# A piece of a truncated file: either marker text or a (start, end) byte range of the file.
+Piece = Union[str, Tuple[int, int]]
+
+def estimate_tokens(text: str) -> int:
+  return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+@dataclass
+class PackedContext:
+  bundle: ContextBundle
+  included: List[str] = field(default_factory=list)
+  truncated: List[str] = field(default_factory=list)
+  dropped: List[Tuple[str, str]] = field(default_factory=list)
+
+  @property
+  def text(self) -> str:
+    return self.bundle.serialize()
+
+  @property
+  def tokens(self) -> int:
+    return (len(self.bundle) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+  def report(self) -> str:
+    """
+    A one-line-per-file summary of what did not make it into the context in full.
+    """
+    lines = [f"Context: {len(self.included)} file(s), ~{self.tokens} tokens"]
+    lines.extend(f"  truncated: {path}" for path in self.truncated)
+    lines.extend(f"  dropped: {path} ({reason})" for path, reason in self.dropped)
+    return "\n".join(lines)
+
+'''
+Computes the hop distance of every file reachable from the start files.
+@param start_files: List[str] - The files found in the error stack (distance 0).
+@param graph: Dict[str, List[str]] - The adjacency list produced by build_adjacency_list.
+@returns: Dict[str, int] - The number of import hops between each reachable file and the closest start file.
+'''
+def hop_distances(start_files: List[str], graph: Dict[str, List[str]]) -> Dict[str, int]:
+  distances = {file: 0 for file in start_files}
+  queue = deque(start_files)
+  while queue:
+    current = queue.popleft()
+    for neighbor in graph.get(current, []):
+      if neighbor not in distances:
+        distances[neighbor] = distances[current] + 1
+        queue.append(neighbor)
+  return distances
+
+def _skip_reason(buffer, size: int, max_file_bytes: int) -> str:
+  """
+  Return why a file should not be packed, or "" if it is usable text.
+  """
+  if size > max_file_bytes:
+    return f"oversized, {size} bytes"
+  if buffer.find(b'\0', 0, BINARY_SNIFF_BYTES) != -1:
+    return "binary"
+  position = 0
+  while position < size:
+    newline = buffer.find(b'\n', position)
+    if newline == -1:
+      newline = size
+    if newline - position > MINIFIED_LINE_LENGTH:
+      return "minified"
+    position = newline + 1
+  return ""
+
+def _line_starts(buffer, size: int) -> List[int]:
+  """
+  Byte offsets of the start of every line, followed by the size of the file.
+  """
+  starts = [0]
+  position = buffer.find(b'\n')
+  while position != -1 and position + 1 < size:
+    starts.append(position + 1)
+    position = buffer.find(b'\n', position + 1)
+  starts.append(size)
+  return starts
+
+def _pieces_size(pieces: List[Piece]) -> int:
+  return sum(len(piece) if isinstance(piece, str) else piece[1] - piece[0] for piece in pieces)
+
+def _line_windows(starts: List[int], focus_lines: List[int], max_bytes: int) -> Optional[List[Piece]]:
+  """
+  Keep only windows of lines around the (1-based) focus lines, shrinking the windows until they fit.
+  """
+  line_count = len(starts) - 1
+  # The file may have shrunk since the failing run (e.g. in watch mode): lines past its end are ignored.
+  focus_lines = sorted(line_number for line_number in set(focus_lines) if 0 < line_number <= line_count)
+  if not focus_lines:
+    return None
+  radius = 40
+  while radius >= 2:
+    spans = []
+    for line_number in focus_lines:
+      start = min(line_count, max(0, line_number - 1 - radius))
+      end = min(line_count, line_number + radius)
+      if spans and start <= spans[-1][1]:
+        spans[-1] = (spans[-1][0], max(spans[-1][1], end))
+      else:
+        spans.append((start, end))
+
+    pieces: List[Piece] = []
+    previous_end = 0
+    for start, end in spans:
+      if start > previous_end:
+        pieces.append(f"... [{start - previous_end} lines omitted] ...\n")
+      pieces.append((starts[start], starts[end]))
+      previous_end = end
+    if previous_end < line_count:
+      pieces.append(f"... [{line_count - previous_end} lines omitted] ...\n")
+
+    if _pieces_size(pieces) <= max_bytes:
+      return pieces
+    radius //= 2
+  return None
+
+def _head_tail(starts: List[int], max_bytes: int) -> Optional[List[Piece]]:
+  """
+  Keep as many lines as fit from the start of the file (two thirds of the budget) and from its end.
+  """
+  line_count = len(starts) - 1
+  head_budget = max_bytes * 2 // 3
+  head = 0
+  while head < line_count and starts[head + 1] <= head_budget:
+    head += 1
+  used = starts[head]
+  tail = line_count
+  while tail > head and used + starts[line_count] - starts[tail - 1] <= max_bytes - 64:
+    tail -= 1
+  if head == 0 and tail == line_count:
+    return None
+  return [(0, starts[head]), f"... [{tail - head} lines omitted] ...\n", (starts[tail], starts[line_count])]
+
+'''
+Packs the files related to an error into a context bundle that stays within a token budget.
+@param paths: List[str] - Every candidate file (the stack files and, with "-r", everything they import).
+@param frame_files: List[str] - The files found in the error stack; these are always packed first.
+@param graph: Optional[Dict[str, List[str]]] - The adjacency list used to rank the remaining files by hop distance.
+@param distances: Optional[Dict[str, int]] - Precomputed ranking (from get_nth_related_files); takes precedence over graph.
+@param token_budget: int - The maximum estimated number of tokens of the packed context.
+@param focus_lines: Optional[Dict[str, List[int]]] - Failing line numbers per file, used to pick windows when truncating.
+@param max_file_bytes: int - Files larger than this are skipped without being read.
+@param file_cache: Optional[FileCache] - Where the memory maps come from; defaults to the process-wide cache.
+@returns: PackedContext - The packed bundle plus what was included, truncated and dropped.
+'''
+def pack_context(paths: List[str], frame_files: List[str], graph: Optional[Dict[str, List[str]]] = None,
+                 token_budget: int = DEFAULT_TOKEN_BUDGET, focus_lines: Optional[Dict[str, List[int]]] = None,
+                 max_file_bytes: int = MAX_FILE_BYTES, file_cache: Optional[FileCache] = None,
+                 distances: Optional[Dict[str, int]] = None) -> PackedContext:
+  if distances is None:
+    distances = hop_distances(frame_files, graph or {})
+  # The order of `distances` already breaks ties (by weight, for get_nth_related_files), so keep it.
+  position = {path: i for i, path in enumerate(distances)}
+  unreachable = len(distances) + 1
+  ranked = sorted(dict.fromkeys(list(frame_files) + list(paths)),
+                  key=lambda path: (0 if path in frame_files else distances.get(path, unreachable),
+                                    position.get(path, unreachable), path))
+  focus_lines = focus_lines or {}
+
+  bundle = ContextBundle(file_cache)
+  packed = PackedContext(bundle)
+  remaining = token_budget * CHARS_PER_TOKEN
+  bundle.add_text("\n" + SEPARATOR)
+
+  for path in ranked:
+    if remaining < MIN_SLICE_TOKENS * CHARS_PER_TOKEN:
+      # The budget is spent; do not even read the rest.
+      packed.dropped.append((path, "token budget"))
+      continue
+    try:
+      size = os.path.getsize(path)
+    except OSError:
+      packed.dropped.append((path, "missing"))
+      continue
+    if size > max_file_bytes:
+      packed.dropped.append((path, f"oversized, {size} bytes"))
+      continue
+    buffer = bundle.file_cache.get(path)
+    if buffer is None:
+      packed.dropped.append((path, "unreadable"))
+      continue
+    reason = _skip_reason(buffer, len(buffer), max_file_bytes)
+    if reason:
+      packed.dropped.append((path, reason))
+      continue
+
+    header = f"File: {path}\nContent:\n"
+    if packed.included:
+      header = "\n" + header
+    pieces: Optional[List[Piece]] = [(0, len(buffer))]
+    if len(header) + len(buffer) + 1 > remaining:
+      available = remaining - len(header) - 1
+      pieces = None
+      if available >= MIN_SLICE_TOKENS * CHARS_PER_TOKEN:
+        starts = _line_starts(buffer, len(buffer))
+        if path in focus_lines:
+          pieces = _line_windows(starts, focus_lines[path], available)
+        if pieces is None:
+          pieces = _head_tail(starts, available)
+      if pieces is None:
+        packed.dropped.append((path, "token budget"))
+        continue
+      packed.truncated.append(path)
+
+    bundle.add_text(header)
+    for piece in pieces:
+      if isinstance(piece, str):
+        bundle.add_text(piece)
+      else:
+        bundle.add_file(path, *piece)
+    bundle.add_text("\n")
+    packed.included.append(path)
+    remaining -= len(header) + _pieces_size(pieces) + 1
+
+  if packed.dropped:
+    listed = ", ".join(f"{path} ({reason})" for path, reason in packed.dropped[:MAX_LISTED_OMISSIONS])
+    unlisted = len(packed.dropped) - MAX_LISTED_OMISSIONS
+    if unlisted > 0:
+      listed += f" and {unlisted} more"
+    bundle.add_text(f"\nOmitted files: {listed}\n")
+
+  bundle.add_text(SEPARATOR + "\n")
+  return packed
+
+# [END packer.py]
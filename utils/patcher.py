@@ -0,0 +1,161 @@
+# [START patcher.py]
+"""
+Applies the fixes suggested by the LLM to the files on disk.
+The file writer agent and the verification loop both go through here, so that a fix is applied the same way no
+matter where it comes from.
+
+Edits are applied atomically (written to a temporary file in the same directory, then renamed over the original) and
+under a per-file lock, so concurrent corrections to the same file are serialized instead of overwriting each other.
+A batch of corrections is grouped by file and applied in one read and one write per file.
+"""
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Files patched at once by apply_corrections.
+DEFAULT_WORKERS = 8
+
+# Read once: the umask can only be read by setting it, which is not safe to do while other threads create files.
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+_locks: Dict[str, threading.Lock] = {}
+_locks_lock = threading.Lock()
+
+def file_lock(path: str) -> threading.Lock:
+  """
+  The lock guarding writes to a file; every path naming the same file gets the same lock.
+  """
+  path = os.path.realpath(path)
+  with _locks_lock:
+    if path not in _locks:
+      _locks[path] = threading.Lock()
+    return _locks[path]
+
+def atomic_write(path: str, content: str):
+  """
+  Replace the content of a file at once: readers see either the old or the new content, never a partial write.
+  The permissions of the original file are kept (a new file gets the default ones), and a symlink is written through.
+  """
+  path = os.path.realpath(path)
+  directory = os.path.dirname(path)
+  descriptor, temporary_path = tempfile.mkstemp(dir=directory, prefix='.' + os.path.basename(path) + '.', suffix='.tmp')
+  try:
+    with os.fdopen(descriptor, 'w', encoding='utf-8') as file:
+      file.write(content)
+      file.flush()
+      os.fsync(file.fileno())
+    # mkstemp creates the file readable by its owner only.
+    os.chmod(temporary_path, os.stat(path).st_mode & 0o7777 if os.path.exists(path) else 0o666 & ~_UMASK)
+    os.replace(temporary_path, path)
+  except BaseException:
+    os.unlink(temporary_path)
+    raise
+
+def correction_target(response: dict) -> Tuple[str, int, str]:
+  """
+  Return the (file path, 1-based line number, suggested code) of an LLM answer.
+  """
+  file_path = os.path.join(response['where']['repository_path'], response['where']['file_name'])
+  line_number = int(response['where']['line_number'])
+  return file_path, line_number, response['how']['suggested_code_solution']
+
+def indent_code(code: str, indentation: str) -> List[str]:
+  """
+  Indent suggested code to the level of the line it replaces, keeping its own relative indentation.
+  """
+  lines = code.strip('\n').split('\n')
+  common = min((len(line) - len(line.lstrip()) for line in lines if line.strip()), default=0)
+  return [(indentation + line[common:] if line.strip() else '') + '\n' for line in lines]
+
+'''
+Replaces lines of a file with suggested code, in one read and one atomic write, under the lock of the file.
+@param file_path: str - The file to patch.
+@param edits: Iterable[Tuple[int, str]] - (1-based line number, code) pairs; every line number refers to the file as
+  it is before the first edit, since replacing a line with several lines shifts the ones after it.
+@param format_code: bool - Reformat the statement blocks around the edits (see utils/formatter.py).
+@returns: int - The number of edits applied.
+@note: raises IndexError if a line number is not in the file and ValueError if two edits replace the same line; the
+  file is left untouched then.
+'''
+def apply_edits(file_path: str, edits: Iterable[Tuple[int, str]], format_code: bool = False) -> int:
+  edits = sorted(edits, key=lambda edit: edit[0])
+  # The same path is locked and written: through a symlink, that is the file it points to.
+  file_path = os.path.realpath(file_path)
+  with file_lock(file_path):
+    with open(file_path, 'r', encoding='utf-8') as file:
+      lines = file.readlines()
+
+    for index, (line_number, _) in enumerate(edits):
+      if not 0 < line_number <= len(lines):
+        raise IndexError("Line number out of range")
+      if index and edits[index - 1][0] == line_number:
+        raise ValueError(f"Conflicting corrections to line {line_number} of {file_path}")
+
+    offset = 0
+    changed = []
+    for line_number, code in edits:
+      position = line_number - 1 + offset
+      line = lines[position]
+      replacement = indent_code(code, line[:len(line) - len(line.lstrip(' \t'))])
+      lines[position:position + 1] = replacement
+      offset += len(replacement) - 1
+      changed.append((position + 1, position + len(replacement)))
+
+    content = ''.join(lines)
+    if format_code:
+      # Imported here: black is only loaded when a fix is to be formatted.
+      from utils.formatter import format_file_ranges
+      content = format_file_ranges(file_path, content, changed)
+    atomic_write(file_path, content)
+  return len(edits)
+
+'''
+Replaces the failing line of a file with the suggested code.
+@param response: dict - The LLM answer, with the "where" and "how" sections.
+@param format_code: bool - Reformat the statement block around the fix.
+@returns: str - The path of the patched file.
+@note: raises IndexError if the line number is not in the file.
+'''
+def apply_correction(response: dict, format_code: bool = False) -> str:
+  file_path, line_number, suggested_code = correction_target(response)
+  apply_edits(file_path, [(line_number, suggested_code)], format_code)
+  return file_path
+
+def group_corrections(responses: Iterable[dict]) -> Dict[str, List[Tuple[int, str]]]:
+  """
+  Group the edits of several LLM answers by the file they patch.
+  """
+  edits: Dict[str, List[Tuple[int, str]]] = {}
+  for response in responses:
+    file_path, line_number, suggested_code = correction_target(response)
+    edits.setdefault(os.path.realpath(file_path), []).append((line_number, suggested_code))
+  return edits
+
+'''
+Applies a batch of corrections: one pass per file, the files patched concurrently.
+@param responses: Iterable[dict] - LLM answers, possibly several for the same file.
+@param workers: int - Files patched at once.
+@param format_code: bool - Reformat the statement blocks around the fixes.
+@returns: Dict[str, Optional[Exception]] - For every patched file, None or the error that left it untouched.
+@note: the edits to one file are applied all together or not at all; a failure does not stop the other files.
+'''
+def apply_corrections(responses: Iterable[dict], workers: int = DEFAULT_WORKERS,
+                      format_code: bool = False) -> Dict[str, Optional[Exception]]:
+  edits = group_corrections(responses)
+
+  def apply(file_path: str) -> Optional[Exception]:
+    try:
+      apply_edits(file_path, edits[file_path], format_code)
+      return None
+    except Exception as e:
+      return e
+
+  if len(edits) <= 1:
+    return {file_path: apply(file_path) for file_path in edits}
+  with ThreadPoolExecutor(max_workers=min(workers, len(edits))) as executor:
+    return dict(zip(edits, executor.map(apply, edits)))
+
+# [END patcher.py]
@@ -0,0 +1,295 @@
+# [START resolver.py]
+"""
+Resolves import statements to project files without touching the filesystem per import.
+The project tree is scanned once into a table of dotted module names; every lookup after that is a dictionary access,
+and every resolved import is memoized for the rest of the run.
+
+Supported layouts:
+  - plain modules ("pkg/mod.py" -> "pkg.mod") and packages ("pkg/__init__.py" -> "pkg"),
+  - namespace packages (directories without an "__init__.py"),
+  - src-layouts ("src/pkg/mod.py" is also importable as "pkg.mod"),
+  - scripts importing their siblings ("tools/run.py" doing "import helper" finds "tools/helper.py"),
+  - relative imports ("from ..pkg import mod"), using the level stored on ast.ImportFrom.
+Other languages resolve against the same single scan:
+  - JS/TS: relative specifiers, tsconfig/jsconfig "baseUrl" and "paths" aliases, extension and index-file lookup,
+  - Java: fully qualified, wildcard and static imports, matched against the package path of every source file,
+  - C/C++: quoted includes next to the including file, then (like <...> includes) in the include directories,
+  - Go: packages under the module path declared in go.mod, and relative packages.
+
+@note: an import spec is a (module, level, names) triple, as produced by utils.utils.extract_imports.
+"""
+import os
+import re
+import json
+from typing import List, Dict, Tuple, Optional, Sequence
+from utils.extractors import LANGUAGE_BY_EXTENSION, language_of
+
+# Directories that never contain first-party modules.
+SKIPPED_DIRS = {
+  '.git', '.splat', '__pycache__', 'node_modules', 'venv', '.venv',
+  'site-packages', 'build', 'dist'
+}
+SOURCE_ROOTS = ('src', 'lib')
+# Directories searched for C/C++ headers, in order, after the directory of the including file.
+DEFAULT_INCLUDE_DIRS = ('include', 'src', '.')
+JS_EXTENSIONS = ('.ts', '.tsx', '.js', '.jsx', '.mjs', '.cjs', '.mts', '.cts', '.d.ts')
+TSCONFIG_NAMES = ('tsconfig.json', 'jsconfig.json')
+# Comments and trailing commas are allowed in tsconfig.json but not by json.loads; strings are matched first so that
+# "//" inside them survives.
+JSONC_TOKEN_PATTERN = re.compile(r'("(?:\\.|[^"\\])*")|//[^\n]*|/\*.*?\*/', re.DOTALL)
+TRAILING_COMMA_PATTERN = re.compile(r',(\s*[}\]])')
+GO_MODULE_PATTERN = re.compile(r'^module\s+(\S+)', re.MULTILINE)
+
+ImportSpec = Tuple[str, int, Tuple[str, ...]]
+
+class ModuleResolver:
+  """
+  A module-name -> path table for one project, built by a single walk of the tree.
+  """
+
+  def __init__(self, project_root: str, include_dirs: Optional[Sequence[str]] = None):
+    self.project_root = os.path.abspath(project_root)
+    # Dotted name relative to the project root -> file (the "__init__.py" for packages).
+    self.modules: Dict[str, str] = {}
+    # Dotted names of every directory, so namespace packages resolve too.
+    self.packages = set()
+    # Prefixes (e.g. "src.") that are stripped to get the importable name in a src-layout.
+    self.source_prefixes: List[str] = []
+    # Every source file of a supported language, and the source files of every directory.
+    self.paths = set()
+    self.files_by_dir: Dict[str, List[str]] = {}
+    # Dotted Java class name suffixes ("Helper", "util.Helper", "acme.util.Helper", ...) -> file.
+    self.java_classes: Dict[str, str] = {}
+    self.go_module: Optional[str] = None
+    self.include_dirs = [os.path.join(self.project_root, d) for d in (include_dirs or DEFAULT_INCLUDE_DIRS)]
+    self._tsconfigs: Dict[str, Optional[Tuple[str, Dict[str, List[str]]]]] = {}
+    self._memo: Dict[Tuple[str, Optional[str], str, int, Tuple[str, ...]], Tuple[str, ...]] = {}
+    self._scan()
+
+  def _scan(self):
+    root = self.project_root
+    for dirpath, dirnames, filenames in os.walk(root):
+      dirnames[:] = [d for d in dirnames if d not in SKIPPED_DIRS and not d.startswith('.')]
+      relative = os.path.relpath(dirpath, root)
+      package = '' if relative == '.' else relative.replace(os.sep, '.')
+      if package:
+        self.packages.add(package)
+      for filename in filenames:
+        stem, extension = os.path.splitext(filename)
+        if extension.lower() not in LANGUAGE_BY_EXTENSION:
+          if filename in TSCONFIG_NAMES:
+            self.paths.add(os.path.join(dirpath, filename))
+          continue
+        path = os.path.join(dirpath, filename)
+        self.paths.add(path)
+        self.files_by_dir.setdefault(dirpath, []).append(path)
+        if extension == '.py':
+          if stem == '__init__':
+            if package:
+              self.modules[package] = path
+          else:
+            self.modules[f"{package}.{stem}" if package else stem] = path
+        elif extension == '.java':
+          parts = (package.split('.') if package else []) + [stem]
+          for i in range(len(parts)):
+            self.java_classes.setdefault('.'.join(parts[i:]), path)
+
+    self.source_prefixes = [f"{name}." for name in SOURCE_ROOTS if name in self.packages]
+    try:
+      with open(os.path.join(root, 'go.mod'), 'r') as f:
+        match = GO_MODULE_PATTERN.search(f.read())
+      self.go_module = match.group(1) if match else None
+    except OSError:
+      self.go_module = None
+
+  def _dotted_dir(self, directory: str) -> Optional[str]:
+    """
+    The dotted name of a directory inside the project ('' for the root), or None if it is outside the project.
+    """
+    relative = os.path.relpath(directory, self.project_root)
+    if relative == '.':
+      return ''
+    if relative.startswith('..') or os.path.isabs(relative):
+      return None
+    return relative.replace(os.sep, '.')
+
+  def _find(self, name: str, bases: Sequence[str]) -> Optional[str]:
+    for base in bases:
+      path = self.modules.get(f"{base}{name}")
+      if path is not None:
+        return path
+    return None
+
+  def resolve(self, importer: str, spec: ImportSpec) -> Tuple[str, ...]:
+    """
+    Return the project files an import statement in `importer` refers to (possibly none).
+    """
+    module, level, names = spec
+    importer_dir = os.path.dirname(importer)
+    language = language_of(importer)
+    key = (importer_dir, language, module, level, tuple(names))
+    cached = self._memo.get(key)
+    if cached is not None:
+      return cached
+
+    if language == 'javascript':
+      result = self._resolve_javascript(importer_dir, module)
+    elif language == 'java':
+      result = self._resolve_java(module, level)
+    elif language == 'c':
+      result = self._resolve_c(importer_dir, module, level)
+    elif language == 'go':
+      result = self._resolve_go(importer_dir, module)
+    else:
+      result = self._resolve_python(importer_dir, module, level, names)
+    self._memo[key] = result
+    return result
+
+  def _resolve_python(self, importer_dir: str, module: str, level: int, names: Sequence[str]) -> Tuple[str, ...]:
+    found = []
+    importer_package = self._dotted_dir(importer_dir)
+    if level:
+      if importer_package is None:
+        bases = []
+      else:
+        parts = importer_package.split('.') if importer_package else []
+        if level - 1 > len(parts):
+          bases = []
+        else:
+          parent = '.'.join(parts[:len(parts) - (level - 1)])
+          bases = [f"{parent}." if parent else '']
+    else:
+      # Sibling of the importing script first (it is on sys.path when the script is run), then the roots.
+      bases = []
+      if importer_package:
+        bases.append(f"{importer_package}.")
+      bases.append('')
+      bases.extend(self.source_prefixes)
+
+    if module:
+      target = self._find(module, bases)
+    else:
+      # "from . import name" also runs the package's own "__init__.py".
+      target = self.modules.get(bases[0].rstrip('.')) if bases and bases[0] else None
+    if target is not None:
+      found.append(target)
+    # "from pkg import mod" imports the submodule pkg.mod, "from . import mod" only ever does.
+    for name in names:
+      submodule = self._find(f"{module}.{name}" if module else name, bases)
+      if submodule is not None and submodule not in found:
+        found.append(submodule)
+
+    return tuple(found)
+
+  def _js_file(self, base: str) -> Optional[str]:
+    """
+    Find the file a JS/TS module path refers to: as-is, with an extension, or as a directory index.
+    """
+    base = os.path.normpath(base)
+    if base in self.paths:
+      return base
+    for extension in JS_EXTENSIONS:
+      if base + extension in self.paths:
+        return base + extension
+    for extension in JS_EXTENSIONS:
+      index = os.path.join(base, 'index' + extension)
+      if index in self.paths:
+        return index
+    return None
+
+  def _tsconfig(self, directory: str) -> Optional[Tuple[str, Dict[str, List[str]]]]:
+    """
+    The (base directory, paths aliases) of the nearest tsconfig.json/jsconfig.json above a directory, memoized.
+    """
+    if directory in self._tsconfigs:
+      return self._tsconfigs[directory]
+    config = None
+    for name in TSCONFIG_NAMES:
+      path = os.path.join(directory, name)
+      if path not in self.paths:
+        continue
+      try:
+        with open(path, 'r', encoding='utf-8') as f:
+          text = JSONC_TOKEN_PATTERN.sub(lambda m: m.group(1) or '', f.read())
+        options = json.loads(TRAILING_COMMA_PATTERN.sub(r'\1', text)).get('compilerOptions', {})
+      except (OSError, ValueError, AttributeError):
+        continue
+      config = (os.path.join(directory, options.get('baseUrl', '.')), options.get('paths', {}) or {})
+      break
+    if config is None and directory != self.project_root and self._dotted_dir(directory) is not None:
+      config = self._tsconfig(os.path.dirname(directory))
+    self._tsconfigs[directory] = config
+    return config
+
+  def _resolve_javascript(self, importer_dir: str, specifier: str) -> Tuple[str, ...]:
+    if specifier.startswith('./') or specifier.startswith('../') or specifier in ('.', '..'):
+      found = self._js_file(os.path.join(importer_dir, specifier))
+      return (found,) if found else ()
+
+    config = self._tsconfig(importer_dir)
+    if config is None:
+      # A bare specifier without aliases is a package from node_modules.
+      return ()
+    base_url, aliases = config
+    candidates = []
+    for pattern, targets in aliases.items():
+      prefix, star, suffix = pattern.partition('*')
+      if star and specifier.startswith(prefix) and specifier.endswith(suffix) and len(specifier) >= len(prefix) + len(suffix):
+        matched = specifier[len(prefix):len(specifier) - len(suffix)]
+        candidates.extend(target.replace('*', matched, 1) for target in targets)
+      elif not star and specifier == pattern:
+        candidates.extend(targets)
+    candidates.append(specifier)
+    for candidate in candidates:
+      found = self._js_file(os.path.join(base_url, candidate))
+      if found:
+        return (found,)
+    return ()
+
+  def _resolve_java(self, name: str, static: int) -> Tuple[str, ...]:
+    if name.endswith('.*'):
+      package = name[:-2]
+      # "import com.acme.util.*" pulls in every class of the package; "import static com.acme.Util.*" just Util.
+      target = self.java_classes.get(package)
+      if target is not None:
+        return (target,)
+      return tuple(sorted(
+        path for suffix, path in self.java_classes.items()
+        if suffix.rpartition('.')[0] == package
+      ))
+    target = self.java_classes.get(name)
+    if target is None and static:
+      # "import static com.acme.Util.helper" refers to the class com.acme.Util.
+      target = self.java_classes.get(name.rpartition('.')[0])
+    return (target,) if target else ()
+
+  def _resolve_c(self, importer_dir: str, header: str, system: int) -> Tuple[str, ...]:
+    directories = self.include_dirs if system else [importer_dir] + self.include_dirs
+    for directory in directories:
+      path = os.path.normpath(os.path.join(directory, header))
+      if path in self.paths:
+        return (path,)
+    return ()
+
+  def _resolve_go(self, importer_dir: str, import_path: str) -> Tuple[str, ...]:
+    if import_path.startswith('./') or import_path.startswith('../'):
+      directory = os.path.normpath(os.path.join(importer_dir, import_path))
+    elif self.go_module and (import_path == self.go_module or import_path.startswith(self.go_module + '/')):
+      directory = os.path.join(self.project_root, *import_path[len(self.go_module):].strip('/').split('/'))
+      directory = os.path.normpath(directory)
+    else:
+      return ()
+    return tuple(sorted(
+      path for path in self.files_by_dir.get(directory, [])
+      if path.endswith('.go') and not path.endswith('_test.go')
+    ))
+
+  def resolve_all(self, importer: str, specs: List[ImportSpec]) -> List[str]:
+    edges = []
+    for spec in specs:
+      for path in self.resolve(importer, spec):
+        if path != importer and path not in edges:
+          edges.append(path)
+    return edges
+
+# [END resolver.py]
@@ -0,0 +1,156 @@
+# [START slicer.py]
+"""
+Frame-local code slicing for Python tracebacks.
+Instead of sending the whole file of every frame, only the code around the failing line is kept:
+  - the module-level imports of the file,
+  - the innermost function or class enclosing the failing line (or the top-level statement, if there is none),
+  - the module-level definitions of the names used inside that scope.
+
+@note: each file is read and parsed once, no matter how many frames point into it.
+@note: a file that cannot be parsed (e.g. the SyntaxError itself) falls back to a window of lines around the failure.
+"""
+import ast
+import os
+from typing import List, Dict, Optional, Tuple
+from utils.traceback_parser import parse_frames
+
+# Lines kept on each side of the failing line when the file does not parse.
+FALLBACK_RADIUS = 10
+# Referenced definitions longer than this are reduced to their header.
+MAX_DEFINITION_LINES = 30
+
+'''
+Collects the (file, line) pairs of a Python traceback, in the order they appear.
+@param error_info: str - The traceback text.
+@returns: List[Tuple[str, int]] - Unique frames whose file exists, with absolute paths.
+'''
+def parse_error_frames(error_info: str) -> List[Tuple[str, int]]:
+  frames = [
+    (os.path.abspath(frame.path), frame.line)
+    for frame in parse_frames(error_info)
+    if frame.language == 'python' and frame.line is not None
+  ]
+  return list(dict.fromkeys(frames))
+
+def _span(node: ast.AST) -> Tuple[int, int]:
+  start = min([node.lineno] + [d.lineno for d in getattr(node, 'decorator_list', [])])
+  return start, node.end_lineno
+
+def _enclosing_scope(tree: ast.Module, line_number: int) -> Tuple[Optional[ast.AST], List[ast.ClassDef]]:
+  """
+  Return the innermost def/class containing the line, plus the classes it is nested in.
+  Without one, return the top-level statement containing the line.
+  """
+  scope, parents = None, []
+  body = tree.body
+  while True:
+    for node in body:
+      start, end = _span(node)
+      if start <= line_number <= end:
+        break
+    else:
+      return scope, parents
+    if not isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+      return (scope, parents) if scope is not None else (node, [])
+    if scope is not None and isinstance(scope, ast.ClassDef):
+      parents.append(scope)
+    scope = node
+    body = node.body
+
+def _used_names(node: ast.AST) -> set:
+  return {child.id for child in ast.walk(node) if isinstance(child, ast.Name) and isinstance(child.ctx, ast.Load)}
+
+def _defined_names(node: ast.stmt) -> List[str]:
+  if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+    return [node.name]
+  if isinstance(node, (ast.Assign, ast.AnnAssign, ast.AugAssign)):
+    targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+    return [child.id for target in targets for child in ast.walk(target) if isinstance(child, ast.Name)]
+  return []
+
+def _render(lines: List[str], spans: List[Tuple[int, int]]) -> str:
+  """
+  Render 1-based inclusive line spans, merging overlaps and marking the gaps between them.
+  """
+  merged = []
+  for start, end in sorted(spans):
+    if merged and start <= merged[-1][1] + 1:
+      merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+    else:
+      merged.append((start, end))
+
+  parts = []
+  for start, end in merged:
+    parts.append(f"# lines {start}-{end}\n")
+    parts.append("".join(lines[start - 1:end]))
+  return "".join(parts)
+
+'''
+Slices one file down to the code that matters for the given failing lines.
+@param path: str - The file the frames point into.
+@param line_numbers: List[int] - The failing lines (1-based) in that file.
+@returns: Optional[str] - The rendered slice, or None if the file cannot be read.
+'''
+def slice_file(path: str, line_numbers: List[int]) -> Optional[str]:
+  try:
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+      source = f.read()
+  except OSError:
+    return None
+  lines = source.splitlines(keepends=True)
+
+  try:
+    tree = ast.parse(source)
+  except SyntaxError:
+    return _render(lines, [(max(1, n - FALLBACK_RADIUS), min(len(lines), n + FALLBACK_RADIUS)) for n in line_numbers])
+
+  spans = [_span(node) for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom))]
+  definitions: Dict[str, ast.stmt] = {}
+  for node in tree.body:
+    for name in _defined_names(node):
+      definitions.setdefault(name, node)
+
+  scopes = []
+  for line_number in line_numbers:
+    scope, parents = _enclosing_scope(tree, line_number)
+    if scope is None:
+      continue
+    scopes.append(scope)
+    spans.append(_span(scope))
+    # Keep the header of every enclosing class so that methods still read as methods.
+    spans.extend((_span(parent)[0], max(parent.lineno, parent.body[0].lineno - 1)) for parent in parents)
+    spans.append((line_number, line_number))
+
+  used = set()
+  for scope in scopes:
+    used |= _used_names(scope)
+  for name in sorted(used):
+    node = definitions.get(name)
+    if node is None or node in scopes:
+      continue
+    start, end = _span(node)
+    if end - start + 1 > MAX_DEFINITION_LINES and hasattr(node, 'body'):
+      end = max(start, node.body[0].lineno - 1)
+    spans.append((start, end))
+
+  return _render(lines, spans)
+
+'''
+Builds the snippet bundle for a traceback: one slice per file, in the order the files appear in the traceback.
+@param frames: List[Tuple[str, int]] - The frames returned by parse_error_frames.
+@returns: str - The bundle, in the same "File: ... Content: ..." layout as the packed context.
+'''
+def slice_context(frames: List[Tuple[str, int]]) -> str:
+  lines_by_file: Dict[str, List[int]] = {}
+  for path, line_number in frames:
+    lines_by_file.setdefault(path, []).append(line_number)
+
+  result = []
+  for path, line_numbers in lines_by_file.items():
+    snippet = slice_file(path, line_numbers)
+    if snippet is not None:
+      result.append(f"File: {path} (slice around line(s) {', '.join(map(str, line_numbers))})\nContent:\n{snippet}\n")
+
+  return "\n" + "="*50 + "\n".join(result) + "="*50 + "\n"
+
+# [END slicer.py]
@@ -0,0 +1,294 @@
+# [START traceback_parser.py]
+"""
+A streaming parser for error output in the formats of the languages splat runs.
+Input is consumed line by line (from a string, an iterable of lines, or a file/pipe read in chunks), so a
+multi-hundred-MB server log never has to be held in memory, and frames are emitted as a generator.
+
+Recognized frame formats:
+  - Python:      File "app/main.py", line 12, in handler
+  - Node/V8:     at handler (/srv/app/index.js:12:5)  /  at /srv/app/index.js:12:5
+  - Java:        at com.acme.Main.run(Main.java:12)
+  - Go:          main.handler(...)  followed by  <tab>/srv/app/main.go:12 +0x1d
+  - Rust:        thread 'main' panicked at src/main.rs:12:5  /  at ./src/main.rs:12:5
+  - GCC/Clang:   src/main.c:12:5: error: ...
+
+@note: file existence is checked through a StatCache, so a path repeated ten thousand times is stat'ed once.
+"""
+import os
+import re
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Optional, IO, Union
+
+DEFAULT_CHUNK_SIZE = 1 << 20
+
+@dataclass(frozen=True)
+class Frame:
+  path: str
+  line: Optional[int]
+  function: Optional[str]
+  language: str
+
+# Cheap pre-filter: a line without a source-file-looking token cannot hold a frame.
+SOURCE_HINT = re.compile(r'\.(?:py|js|mjs|cjs|jsx|ts|tsx|java|kt|scala|go|rs|c|cc|cpp|cxx|h|hh|hpp|m|mm)\b')
+
+# (language, pattern) pairs, tried in order; the first one that matches a line wins.
+FRAME_PATTERNS = [
+  ('python', re.compile(r'File "(?P<path>[^"]+)", line (?P<line>\d+)(?:, in (?P<function>\S+))?')),
+  ('java', re.compile(r'^\s*at (?P<function>[\w$.<>/]+)\((?P<path>[\w$.-]+\.(?:java|kt|scala)):(?P<line>\d+)\)')),
+  ('javascript', re.compile(
+    r'^\s*at (?:(?:async )?(?P<function>[^\s(][^(]*?) \()?(?:file://)?(?P<path>[^\s()]+?\.(?:js|mjs|cjs|jsx|ts|tsx)):(?P<line>\d+):\d+\)?\s*$'
+  )),
+  ('go', re.compile(r'^\s+(?P<path>\S+\.go):(?P<line>\d+)(?: \+0x[0-9a-f]+)?\s*$')),
+  ('rust', re.compile(r'(?:panicked at (?:\'.*\', )?|^\s+at )(?P<path>[^\s:\']+\.rs):(?P<line>\d+):\d+')),
+  ('c', re.compile(
+    r'^(?P<path>[^\s:]+\.(?:c|cc|cpp|cxx|h|hh|hpp|m|mm)):(?P<line>\d+):(?:\d+:)? (?:fatal )?(?:error|warning|note)\b'
+  )),
+]
+# The function of a Go frame is printed on the line before its location.
+GO_FUNCTION_PATTERN = re.compile(r'^(?P<function>[\w./*()\[\]-]+)\(.*\)$')
+# Bare ".py" tokens (e.g. the command line "python3 main.py"), only used when no frame format matched.
+PYTHON_TOKEN_PATTERN = re.compile(r'\b(\S+\.py)\b')
+
+class StatCache:
+  """
+  Memoizes os.path.exists for one run, resolving relative paths against a base directory.
+  """
+
+  def __init__(self, base_dir: Optional[str] = None):
+    self.base_dir = base_dir
+    self._exists: Dict[str, bool] = {}
+
+  def exists(self, path: str) -> bool:
+    result = self._exists.get(path)
+    if result is None:
+      full_path = path if self.base_dir is None else os.path.join(self.base_dir, path)
+      result = self._exists[path] = os.path.exists(full_path)
+    return result
+
+def iter_string_lines(text: str) -> Iterator[str]:
+  """
+  Yield the lines of a string without building a list of all of them.
+  """
+  start = 0
+  while start < len(text):
+    end = text.find('\n', start)
+    if end == -1:
+      end = len(text)
+    yield text[start:end]
+    start = end + 1
+
+def iter_chunked_lines(stream: IO, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[str]:
+  """
+  Yield the lines of a text or binary stream, reading it in fixed-size chunks.
+  """
+  pending = ''
+  while True:
+    chunk = stream.read(chunk_size)
+    if not chunk:
+      break
+    if isinstance(chunk, bytes):
+      chunk = chunk.decode('utf-8', errors='replace')
+    lines = (pending + chunk).split('\n')
+    pending = lines.pop()
+    yield from lines
+  if pending:
+    yield pending
+
+'''
+Parses frames out of error output, one line at a time.
+@param lines: Iterable[str] - The lines of the error output.
+@param stat_cache: Optional[StatCache] - Existence checks are memoized here; a fresh cache is used if not given.
+@param existing_only: bool - Skip frames whose file does not exist (e.g. library frames from another machine).
+@returns: Iterator[Frame] - Every frame, in order, including repeats.
+'''
+def iter_frames(lines: Iterable[str], stat_cache: Optional[StatCache] = None, existing_only: bool = True) -> Iterator[Frame]:
+  stat_cache = stat_cache or StatCache()
+  previous = ''
+  for line in lines:
+    line = line.rstrip('\r\n')
+    if not SOURCE_HINT.search(line):
+      previous = line
+      continue
+
+    matched = False
+    for language, pattern in FRAME_PATTERNS:
+      match = pattern.search(line)
+      if match is None:
+        continue
+      matched = True
+      path = match.group('path').strip().strip("'\"")
+      function = match.groupdict().get('function')
+      if language == 'go':
+        go_function = GO_FUNCTION_PATTERN.match(previous.strip())
+        function = go_function.group('function') if go_function else None
+      if not existing_only or stat_cache.exists(path):
+        yield Frame(path, int(match.group('line')), function and function.strip(), language)
+      break
+
+    if not matched:
+      for token in PYTHON_TOKEN_PATTERN.findall(line):
+        path = token.strip().strip("'\"")
+        if not existing_only or stat_cache.exists(path):
+          yield Frame(path, None, None, 'python')
+    previous = line
+
+'''
+Parses frames out of a string, a path to a log file, or an open file/pipe.
+@param source: Union[str, IO] - The error text itself, or a stream to read in chunks.
+@param is_path: bool - Treat a string source as the path of a log file instead of as the error text.
+@returns: Iterator[Frame] - See iter_frames.
+'''
+def parse_frames(source: Union[str, IO], is_path: bool = False, stat_cache: Optional[StatCache] = None,
+                 existing_only: bool = True, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[Frame]:
+  if isinstance(source, str) and is_path:
+    with open(source, 'rb') as stream:
+      yield from iter_frames(iter_chunked_lines(stream, chunk_size), stat_cache, existing_only)
+  elif isinstance(source, str):
+    yield from iter_frames(iter_string_lines(source), stat_cache, existing_only)
+  else:
+    yield from iter_frames(iter_chunked_lines(source, chunk_size), stat_cache, existing_only)
+
+def unique_paths(frames: Iterable[Frame]) -> List[str]:
+  return list(dict.fromkeys(frame.path for frame in frames))
+
+HEX_ADDRESS_PATTERN = re.compile(r'\b0x[0-9a-fA-F]+\b')
+TRAILING_WHITESPACE_PATTERN = re.compile(r'[ \t]+$', re.MULTILINE)
+BLANK_LINES_PATTERN = re.compile(r'\n{3,}')
+
+def normalize_traceback(text: str) -> str:
+  """
+  Remove the parts of a traceback that change between otherwise identical runs (memory addresses, line endings,
+  trailing whitespace, runs of blank lines).
+  """
+  text = text.replace('\r\n', '\n')
+  text = HEX_ADDRESS_PATTERN.sub('0x?', text)
+  text = TRAILING_WHITESPACE_PATTERN.sub('', text)
+  return BLANK_LINES_PATTERN.sub('\n\n', text).strip()
+
+PYTHON_TRACEBACK_START = 'Traceback (most recent call last):'
+# Lines that glue chained Python exceptions together.
+PYTHON_CHAIN_MARKERS = (
+  'During handling of the above exception, another exception occurred:',
+  'The above exception was the direct cause of the following exception:',
+)
+# "at ..." frames of Node/V8 and Java stacks, plus the Java "Caused by:" / "... 3 more" continuation lines.
+AT_FRAME_PATTERN = re.compile(r'^\s+(?:at |\.\.\. \d+ more)|^Caused by: ')
+# A line that can head an "at"-style stack: "TypeError: x", "Exception in thread ...", "java.lang.Foo: x".
+STACK_HEADER_PATTERN = re.compile(r'^(?:Uncaught )?[\w$.]*(?:Error|Exception|Throwable)\b|^Exception in thread ')
+# Go panics and Rust panics end with the process, so they are closed by flush().
+PANIC_START_PATTERN = re.compile(r'^panic: |^fatal error: |^thread \'.*\' panicked at ')
+
+class TracebackDetector:
+  """
+  Finds complete tracebacks in a stream of lines.
+  feed() returns the text of a traceback (with a few lines of leading context) as soon as it is known to be complete:
+    - Python: after the exception line, once the next non-blank line is not the start of a chained exception,
+    - Node/V8 and Java: after the last "at ..." frame,
+    - Go and Rust panics: on flush(), i.e. when the stream ends.
+  """
+
+  def __init__(self, context_lines: int = 5):
+    self.context_lines = context_lines
+    self._recent: List[str] = []
+    self._block: Optional[List[str]] = None
+    self._kind: Optional[str] = None
+    # Python: the exception line has been seen; the block is complete unless a chained exception follows.
+    self._pending = False
+
+  def _start(self, kind: str, line: str, previous: Optional[str] = None):
+    context = self._recent[-self.context_lines:] if self.context_lines else []
+    self._block = context + ([previous] if previous is not None else []) + [line]
+    self._kind = kind
+    self._pending = False
+
+  def _finish(self) -> str:
+    block, self._block, self._kind = self._block, None, None
+    self._pending = False
+    while block and not block[-1].strip():
+      block.pop()
+    return '\n'.join(block)
+
+  def feed(self, line: str) -> Optional[str]:
+    line = line.rstrip('\r\n')
+    completed = None
+
+    if self._kind == 'python':
+      if self._pending and line.strip():
+        # Only a chain marker continues the block; a bare "Traceback" line starts the next one (e.g. print_exc() in a
+        # loop), and the marker is always followed by one.
+        if line.strip() in PYTHON_CHAIN_MARKERS:
+          self._pending = False
+        else:
+          completed = self._finish()
+      if self._kind == 'python':
+        self._block.append(line)
+        if line and not line[0].isspace() and line.strip() not in PYTHON_CHAIN_MARKERS \
+            and not line.startswith(PYTHON_TRACEBACK_START):
+          # The unindented line after the frames is the exception itself.
+          self._pending = True
+        return None
+    elif self._kind == 'stack':
+      if AT_FRAME_PATTERN.match(line):
+        self._block.append(line)
+        return None
+      completed = self._finish()
+    elif self._kind == 'panic':
+      self._block.append(line)
+      return None
+
+    if self._block is None:
+      if line.startswith(PYTHON_TRACEBACK_START):
+        self._start('python', line)
+        line = None
+      elif PANIC_START_PATTERN.match(line):
+        self._start('panic', line)
+        line = None
+      elif AT_FRAME_PATTERN.match(line) and self._recent and STACK_HEADER_PATTERN.search(self._recent[-1].strip()):
+        previous = self._recent.pop()
+        self._start('stack', line, previous)
+        line = None
+
+    if line is not None:
+      self._recent.append(line)
+      if len(self._recent) > max(self.context_lines, 1):
+        del self._recent[0]
+    return completed
+
+  @property
+  def collecting(self) -> bool:
+    """
+    Whether a traceback has started and has not been returned yet.
+    """
+    return self._block is not None
+
+  @property
+  def pending(self) -> bool:
+    """
+    Whether the traceback being collected only needs its next line to be known complete, i.e. it is complete if the
+    stream goes quiet (e.g. a server that logged an exception and carried on).
+    """
+    return (self._kind == 'python' and self._pending) or self._kind == 'stack'
+
+  def feed_partial(self, text: str) -> Optional[str]:
+    """
+    Look at a line that has not been terminated yet, e.g. the shell prompt printed after a traceback, which never
+    gets its newline. A traceback waiting for its next line is completed if that line cannot continue it.
+    """
+    if self._kind == 'python' and self._pending and text.strip():
+      stripped = text.strip()
+      if any(marker.startswith(stripped) for marker in PYTHON_CHAIN_MARKERS):
+        return None
+      return self._finish()
+    if self._kind == 'stack' and text and not text[0].isspace() and not 'Caused by: '.startswith(text[:11]):
+      return self._finish()
+    return None
+
+  def flush(self) -> Optional[str]:
+    """
+    Close the stream: a traceback still being collected is returned as complete.
+    """
+    if self._block is None:
+      return None
+    return self._finish()
+
+# [END traceback_parser.py]
@@ -10,12 +10,19 @@ If the user does provide "-r", the graph will contain all files from the error s
 @note: entrypoint will **always** be provided; assume there are 3 possibilities only
 """
 import os
-from typing import List, Set, Dict, Optional
-import ast
+from typing import List, Dict, Optional, Tuple, Iterator, Set, Callable
+from collections import Counter
 import re
 import json
 import subprocess
 import signal
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from utils.graph_index import ImportGraphIndex
+from utils.resolver import ModuleResolver, ImportSpec
+from utils.traceback_parser import parse_frames, unique_paths
+from utils.extractors import EXTRACTORS, language_of
 
 # Example run
 def main(error_info: str, flag: Optional[str] = None, project_root: str = './'):
@@ -29,19 +36,21 @@ def main(error_info: str, flag: Optional[str] = None, project_root: str = './'):
     print("FLAG CALL: " + flag)
 
   if flag == '-r':
-    graph = build_adjacency_list(error_files, project_root)
+    with ImportGraphIndex(project_root) as index:
+      graph = build_adjacency_list(error_files, project_root, index=index)
     all_related_files = get_nth_related_files(error_files, graph)
     return run_mock_repopack(list(all_related_files))
 
   return run_mock_repopack(error_files)
 
 def is_project_file(file_path: str, project_root: str) -> bool:
-  return os.path.commonpath([file_path, project_root]) == project_root
+  project_root = os.path.abspath(project_root)
+  return os.path.commonpath([os.path.abspath(file_path), project_root]) == project_root
 
 '''
-This function parses through a typical Python error trace stack and returns a list of all unique file paths found in the trace.
+This function parses through an error trace stack and returns a list of all unique file paths found in the trace.
 @param error_info: str - a string that will be parsed for errors
-@note: The function uses a regular expression to extract file paths from the error message.
+@note: Python, Node/V8, Java, Go, Rust and GCC/Clang frames are recognized, see utils.traceback_parser.
 @note: If a file path doesn't exist on the filesystem, it will not be included in the returned list.
 '''
 def parse_error_stack(error_info: str) -> List[str]:
@@ -54,24 +63,7 @@ def parse_error_stack(error_info: str) -> List[str]:
   Returns:
   List[str]: A list of unique file paths involved in the error(s).
   """
-  files = []
-  # This regex looks for file paths in various formats, including the command output
-  file_pattern = re.compile(r'(?:File "([^"]+)"|\b(\S+\.py)\b)')
-
-  # Process each line of the error_info
-  for line in error_info.split('\n'):
-    matches = file_pattern.findall(line)
-    for match in matches:
-      # The regex returns a tuple for each match, we take the non-empty string
-      file_path = next((m for m in match if m), None)
-      if file_path:
-        file_path = file_path.strip()
-        # Remove any quotes around the file path
-        file_path = file_path.strip("'\"")
-        if os.path.exists(file_path):
-          files.append(file_path)
-
-  return list(dict.fromkeys(files))
+  return unique_paths(parse_frames(error_info))
 
 '''
 This function calls repopack to be used with a required parameter.
@@ -101,302 +93,444 @@ def run_mock_repopack(paths: List[str], style: str = 'json') -> str:
 
 '''
 This function runs through a source file and grabs all files linked by any Nth degree connection.
-@param start_files: List[str] - The files to start with for finding related files.
+Files are visited one hop layer at a time; inside a layer the files with the highest weight come first, where the
+weight of a file is its own weight (by default, how many times it appears in start_files) plus the weights of the
+already-visited files that import it.
+@param start_files: List[str] - The files to start with for finding related files; repeats count towards their weight.
 @param graph: Dict[str, List[str]] - The adjacency list representing the relationships between files.
-@returns: Set[str] - A set of all files related to the start_files to any Nth degree.
+@param max_depth: Optional[int] - Do not follow more than this many hops from the start files.
+@param max_files: Optional[int] - Stop once this many files (start files included) have been collected.
+@param max_bytes: Optional[int] - Skip related files that would push the total size of the collected files past this.
+@param weights: Optional[Dict[str, float]] - Explicit per-file weights, e.g. the number of traceback frames in each file.
+@returns: Dict[str, int] - Every collected file mapped to its hop distance, ordered by distance and then weight.
 '''
-def get_nth_related_files(start_files: List[str], graph: Dict[str, List[str]]) -> Set[str]:
-  related_files = set(start_files)
-  planned_visit = list(start_files)
-  possible_files = set()
+def get_nth_related_files(start_files: List[str], graph: Dict[str, List[str]], max_depth: Optional[int] = None,
+                          max_files: Optional[int] = None, max_bytes: Optional[int] = None,
+                          weights: Optional[Dict[str, float]] = None) -> Dict[str, int]:
+  weights = dict(weights) if weights is not None else dict(Counter(start_files))
+  distances = {}
+  total_bytes = 0
+  layer = list(dict.fromkeys(start_files))
+  depth = 0
+
+  while layer:
+    for file in layer:
+      if max_files is not None and len(distances) >= max_files:
+        return distances
+      if depth > 0 and max_bytes is not None:
+        try:
+          size = os.path.getsize(file)
+        except OSError:
+          size = 0
+        if total_bytes + size > max_bytes:
+          continue
+        total_bytes += size
+      distances[file] = depth
+
+    if max_depth is not None and depth >= max_depth:
+      break
+
+    scores: Dict[str, float] = {}
+    for file in layer:
+      if file not in distances:
+        continue
+      for neighbor in graph.get(file, []):
+        if neighbor not in distances:
+          scores[neighbor] = scores.get(neighbor, weights.get(neighbor, 0)) + weights.get(file, 1)
+    layer = sorted(scores, key=lambda neighbor: (-scores[neighbor], neighbor))
+    weights.update(scores)
+    depth += 1
+
+  return distances
+
+'''
+Extracts the import statements of a source file, using the extractor registered for its language.
+@param file: str - The source file to scan (Python, JS/TS, Java, C/C++ or Go).
+@returns: Optional[List[ImportSpec]] - Sorted, unique (module, level, names) specs, or None if the file could not be read.
+@note: a file with a syntax error, or in an unsupported language, yields an empty list, exactly as if it imported nothing.
+'''
+def extract_imports(file: str) -> Optional[List[ImportSpec]]:
+    try:
+        with open(file, 'r', encoding='utf-8', errors='replace') as f:
+            content = f.read()
+    except Exception:
+        return None
 
-  while planned_visit:
-    current = planned_visit.pop(0)
-    possible_files.add(current)
+    extractor = EXTRACTORS.get(language_of(file))
+    return extractor(content) if extractor is not None else []
 
-    for neighbor in graph.get(current, []):
-      if neighbor not in related_files:
-        related_files.add(neighbor)
-        planned_visit.append(neighbor)
+def _parse_file_imports(file: str) -> Tuple[str, Optional[List[ImportSpec]]]:
+    # Runs inside the worker processes; only the (small) list of import specs travels back to the parent.
+    return file, extract_imports(file)
 
-  return possible_files
+# Layers smaller than this are parsed in-process; the pool is not worth its startup and pickling cost.
+PARALLEL_THRESHOLD = 16
 
 '''
 Builds an adjacency list from a list of files.
-@param files: List[str] - The list of Python files to analyze for import relationships.
+The import graph is crawled breadth-first: every layer of newly discovered files is parsed concurrently in a process pool.
+@param files: List[str] - The list of source files (Python, JS/TS, Java, C/C++, Go) to analyze for import relationships.
 @param project_root: str - The root directory of the project to ensure valid paths.
+@param index: Optional[ImportGraphIndex] - A persistent index; files whose mtime and size are unchanged are not re-parsed.
+@param workers: Optional[int] - Number of parser processes (defaults to the CPU count); 1 parses serially.
+@param resolver: Optional[ModuleResolver] - Maps imports to files; one is built (a single scan of the project) if not given.
 @returns: Dict[str, List[str]] - An adjacency list where each key is a file and its value is a list of imported files.
 '''
-def build_adjacency_list(files: List[str], project_root: str) -> Dict[str, List[str]]:
+def build_adjacency_list(files: List[str], project_root: str, index: Optional[ImportGraphIndex] = None,
+                         workers: Optional[int] = None, resolver: Optional[ModuleResolver] = None) -> Dict[str, List[str]]:
     adjacency_list = {}
+    resolver = resolver or ModuleResolver(project_root)
     processed_files = set()
-
-    def process_file(file: str):
-        if file in processed_files or not is_project_file(file, project_root):
-            return
-
-        processed_files.add(file)
-        imports = set()
-        tree = None
-
-        try:
-            with open(file, 'r') as f:
-                content = f.read()
-                try:
-                    tree = ast.parse(content)
-                    for node in ast.walk(tree):
-                        if isinstance(node, ast.Import):
-                            imports.update(alias.name for alias in node.names)
-                        elif isinstance(node, ast.ImportFrom) and node.module:
-                            imports.add(node.module)
-                except SyntaxError:
-                    pass
-        except FileNotFoundError:
-            return
-        except Exception as e:
-            return
-
-        adjacency_list[file] = []
-        file_dir = os.path.dirname(file)
-
-        for imp in imports:
-            module_paths = []
-            if '.' in imp:
-                module_paths.append(os.path.join(project_root, *imp.split('.')) + '.py')
-            else:
-                module_paths.extend([
-                    os.path.join(file_dir, f"{imp}.py"),
-                    os.path.join(project_root, f"{imp}.py")
-                ])
-
-            for module_path in module_paths:
-                if os.path.exists(module_path):
-                    adjacency_list[file].append(module_path)
-                    # Recursively process the imported file
-                    process_file(module_path)
-                    break
-            else:
-              pass
-                #print(f"Warning: Imported module {imp} does not exist in the same directory or project root.")
-
-        if tree is None and imports:
-            adjacency_list[file].append(f"{file} (unresolved imports due to syntax errors)")
-
-    # Start processing with the initial list of files
-    for file in files:
-        process_file(file)
+    workers = workers or os.cpu_count() or 1
+    pool = None
+
+    def parse_layer(layer: List[str]) -> Iterator[Tuple[str, Optional[List[ImportSpec]]]]:
+        nonlocal pool
+        if workers > 1 and len(layer) >= PARALLEL_THRESHOLD:
+            try:
+                if pool is None:
+                    pool = ProcessPoolExecutor(max_workers=workers)
+                chunksize = max(1, len(layer) // (workers * 4))
+                return iter(list(pool.map(_parse_file_imports, layer, chunksize=chunksize)))
+            except (OSError, BrokenProcessPool):
+                # Platforms without working multiprocessing primitives fall back to the serial path.
+                pool = None
+        return map(_parse_file_imports, layer)
+
+    # Relative paths (frames of C, Java, Go or Rust errors) are resolved against the current directory.
+    frontier = list(dict.fromkeys(os.path.abspath(file) for file in files))
+    try:
+        while frontier:
+            layer = []
+            for file in frontier:
+                if file in processed_files or not is_project_file(file, project_root):
+                    continue
+                processed_files.add(file)
+                imports = index.lookup(file) if index is not None else None
+                if imports is not None:
+                    adjacency_list[file] = resolver.resolve_all(file, imports)
+                else:
+                    layer.append(file)
+
+            for file, imports in parse_layer(layer):
+                if imports is None:
+                    continue
+                adjacency_list[file] = resolver.resolve_all(file, imports)
+                if index is not None:
+                    index.store(file, imports)
+
+            frontier = [
+                module_path
+                for file in frontier if file in adjacency_list
+                for module_path in adjacency_list[file]
+                if module_path not in processed_files
+            ]
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    if index is not None:
+        index.commit()
 
     return adjacency_list
 
+'''
+Brings the persistent index up to date for every source file of the project.
+This is meant to run in the background (e.g. while the entrypoint is still running), so it can be stopped early.
+@param index: ImportGraphIndex - The index to refresh.
+@param resolver: ModuleResolver - Its project scan provides the list of source files.
+@param stop: Optional[threading.Event] - Checked between files; warming stops as soon as it is set.
+@param between: Optional[Callable[[], None]] - Called between files, for urgent work that needs the index (e.g.
+  resolving the files of a traceback as soon as they show up).
+@returns: int - The number of files that had to be re-parsed.
+'''
+def warm_import_index(index: ImportGraphIndex, resolver: ModuleResolver, stop: Optional[threading.Event] = None,
+                      between: Optional[Callable[[], None]] = None) -> int:
+    parsed = 0
+    for file in sorted(resolver.paths):
+        if stop is not None and stop.is_set():
+            break
+        if between is not None:
+            between()
+        if language_of(file) is None or index.lookup(file) is not None:
+            continue
+        imports = extract_imports(file)
+        if imports is None:
+            continue
+        index.store(file, imports)
+        parsed += 1
+        if parsed % 256 == 0:
+            index.commit()
+    index.commit()
+    return parsed
+
 ################################################## NOT IMPLEMENTED BELOW #####################################################################
+# Dictionary to map commands, file presence, or file extensions to frameworks/languages
+FRAMEWORK_INDICATORS = {
+  'go': {
+    'commands': ['go run'],
+    'files': ['go.mod'],
+    'extensions': ['.go']
+  },
+  'rust': {
+    'commands': ['cargo run'],
+    'files': ['Cargo.toml'],
+    'extensions': ['.rs']
+  },
+  'kotlin': {
+    'commands': ['kotlinc', 'kotlin'],
+    'files': [],
+    'extensions': ['.kt']
+  },
+  'scala': {
+    'commands': ['scala', 'sbt run'],
+    'files': ['build.sbt'],
+    'extensions': ['.scala']
+  },
+  'swift': {
+    'commands': ['swift', 'swiftc'],
+    'files': ['Package.swift'],
+    'extensions': ['.swift']
+  },
+  'r': {
+    'commands': ['Rscript'],
+    'files': [],
+    'extensions': ['.r', '.R']
+  },
+  'perl': {
+    'commands': ['perl'],
+    'files': [],
+    'extensions': ['.pl', '.pm']
+  },
+  'haskell': {
+    'commands': ['ghc', 'runghc'],
+    'files': [],
+    'extensions': ['.hs']
+  },
+  'lua': {
+    'commands': ['lua'],
+    'files': [],
+    'extensions': ['.lua']
+  },
+  'julia': {
+    'commands': ['julia'],
+    'files': [],
+    'extensions': ['.jl']
+  },
+  'c': {
+    'commands': ['gcc'],
+    'files': [],
+    'extensions': ['.c', '.cpp']
+  },
+  'java': {
+    'commands': ['javac', 'java'],
+    'files': [],
+    'extensions': ['.java']
+  },
+  'javascript': {
+    'commands': ['node'],
+    'files': [],
+    'extensions': ['.js', '.jsx']
+  },
+  'typescript': {
+    'commands': ['node'],
+    'files': [],
+    'extensions': ['.ts', '.tsx']
+  },
+  'python': {
+    'commands': ['python', 'python3'],
+    'files': [],
+    'extensions': ['.py']
+  },
+  'nextjs': {
+    'commands': ['next', 'npm run dev', 'yarn dev'],
+    'files': ['next.config.js', 'pages'],
+    'extensions': ['.jsx', '.tsx']
+  },
+  'fastapi': {
+    'commands': ['uvicorn', 'python main.py'],
+    'files': ['main.py'],
+    'extensions': ['.py']
+  },
+  'react': {
+    'commands': ['react-scripts start', 'npm start', 'yarn start'],
+    'files': ['src/App.js', 'public/index.html'],
+    'extensions': ['.jsx', '.tsx', '.js', '.ts']
+  },
+  'django': {
+    'commands': ['python manage.py runserver', 'django-admin'],
+    'files': ['manage.py', 'settings.py'],
+    'extensions': ['.py']
+  },
+  'flask': {
+    'commands': ['flask run', 'python app.py'],
+    'files': ['app.py', 'wsgi.py'],
+    'extensions': ['.py']
+  },
+  'vue': {
+    'commands': ['vue-cli-service serve', 'npm run serve'],
+    'files': ['src/main.js', 'public/index.html'],
+    'extensions': ['.vue']
+  },
+  'angular': {
+    'commands': ['ng serve', 'npm start'],
+    'files': ['angular.json', 'src/main.ts'],
+    'extensions': ['.ts']
+  },
+  'express': {
+    'commands': ['node server.js', 'npm start'],
+    'files': ['server.js', 'app.js'],
+    'extensions': ['.js']
+  },
+  'spring-boot': {
+    'commands': ['./mvnw spring-boot:run', 'java -jar'],
+    'files': ['pom.xml', 'src/main/java'],
+    'extensions': ['.java']
+  },
+  'ruby-on-rails': {
+    'commands': ['rails server', 'rails s'],
+    'files': ['config/routes.rb', 'app/controllers'],
+    'extensions': ['.rb']
+  },
+  'laravel': {
+    'commands': ['php artisan serve'],
+    'files': ['artisan', 'app/Http/Kernel.php'],
+    'extensions': ['.php']
+  },
+  'dotnet': {
+    'commands': ['dotnet run', 'dotnet watch run'],
+    'files': ['Program.cs', '.csproj'],
+    'extensions': ['.cs']
+  },
+}
+# Manifests whose contents (not just presence) matter; their mtimes are part of the detection cache key.
+MANIFEST_FILES = ('package.json', 'go.mod', 'Cargo.toml', 'pom.xml', 'build.sbt', 'Package.swift', 'angular.json')
+# package.json dependencies that identify a framework, in order of precedence.
+PACKAGE_DEPENDENCIES = [('next', 'nextjs'), ('react', 'react'), ('vue', 'vue'), ('@angular/core', 'angular'), ('express', 'express')]
+# Score of each kind of evidence; a matching command is the strongest hint, a file extension the weakest.
+COMMAND_SCORE = 8
+FILES_SCORE = 4
+DEPENDENCY_SCORE = 3
+EXTENSION_SCORE = 1
+COMMAND_FILE_PATTERN = re.compile(r'\b[\w-]+\.[a-zA-Z0-9]+\b')
+
+# Precomputed once: extension -> frameworks, and every nested directory that an indicator file lives in.
+EXTENSION_INDEX: Dict[str, List[str]] = {}
+for _framework, _data in FRAMEWORK_INDICATORS.items():
+  for _extension in _data['extensions']:
+    EXTENSION_INDEX.setdefault(_extension, []).append(_framework)
+INDICATOR_DIRS = sorted({
+  os.path.dirname(file) for data in FRAMEWORK_INDICATORS.values() for file in data['files'] if os.path.dirname(file)
+})
+
+# directory -> (signature, project index), see _project_index.
+_project_cache: Dict[str, Tuple[tuple, dict]] = {}
+
+def _directory_signature(directory: str, names: Set[str]) -> tuple:
+  signature = [os.stat(directory).st_mtime_ns]
+  for manifest in MANIFEST_FILES:
+    if manifest in names:
+      try:
+        signature.append(os.stat(os.path.join(directory, manifest)).st_mtime_ns)
+      except OSError:
+        signature.append(None)
+  # The nested directories scanned by _project_index: a file added to src/ does not touch the root's mtime.
+  for nested in INDICATOR_DIRS:
+    if nested.split('/')[0] in names:
+      try:
+        signature.append(os.stat(os.path.join(directory, nested)).st_mtime_ns)
+      except OSError:
+        signature.append(None)
+  return tuple(signature)
+
+def _project_index(directory: str) -> dict:
+  """
+  Scan the project root once (plus only the few nested directories that indicator files live in) and return
+  the set of present paths and the package.json dependencies. The result is cached until the directory listing
+  (of the root or of one of those nested directories) or a manifest changes.
+  """
+  directory = os.path.abspath(directory)
+  try:
+    with os.scandir(directory) as entries:
+      names = {entry.name for entry in entries}
+  except OSError:
+    return {'paths': set(), 'dependencies': set()}
+
+  signature = _directory_signature(directory, names)
+  cached = _project_cache.get(directory)
+  if cached is not None and cached[0] == signature:
+    return cached[1]
+
+  paths = set(names)
+  for nested in INDICATOR_DIRS:
+    if nested.split('/')[0] not in names:
+      continue
+    try:
+      with os.scandir(os.path.join(directory, nested)) as entries:
+        paths.add(nested)
+        paths.update(f"{nested}/{entry.name}" for entry in entries)
+    except OSError:
+      continue
+
+  dependencies = set()
+  if 'package.json' in names:
+    try:
+      with open(os.path.join(directory, 'package.json'), 'r') as f:
+        package_data = json.load(f)
+      dependencies.update(package_data.get('dependencies', {}) or {})
+      dependencies.update(package_data.get('devDependencies', {}) or {})
+    except (OSError, ValueError, AttributeError):
+      pass
+
+  index = {'paths': paths, 'dependencies': dependencies}
+  _project_cache[directory] = (signature, index)
+  return index
+
+def _has_indicator_file(paths: Set[str], file: str) -> bool:
+  if file.startswith('.'):
+    # Entries like ".csproj" match any file with that extension.
+    return any(path.endswith(file) for path in paths)
+  return file in paths
+
 '''
 This function uses a command and tries to check what type the file/directory is.
 The idea is that we will have robust solutions specifically for different project types,
 meaning that we need to determine what kind of project/file the user is working with.
+Every framework is scored at once from the command, the characteristic files, the package.json dependencies and the
+extension of the file in the command; the project scan behind it is cached per directory.
+@param command: str - The command used to run the project, e.g. "python3 main.py".
+@param directory: str - The project root.
+@returns: str - The best scoring framework/language, or 'unknown'.
 '''
 def detect_framework_or_language(command, directory='.'):
-  # Dictionary to map commands, file presence, or file extensions to frameworks/languages
-  indicators = {
-    'go': {
-      'commands': ['go run'],
-      'files': ['go.mod'],
-      'extensions': ['.go']
-    },
-    'rust': {
-      'commands': ['cargo run'],
-      'files': ['Cargo.toml'],
-      'extensions': ['.rs']
-    },
-    'kotlin': {
-      'commands': ['kotlinc', 'kotlin'],
-      'files': [],
-      'extensions': ['.kt']
-    },
-    'scala': {
-      'commands': ['scala', 'sbt run'],
-      'files': ['build.sbt'],
-      'extensions': ['.scala']
-    },
-    'swift': {
-      'commands': ['swift', 'swiftc'],
-      'files': ['Package.swift'],
-      'extensions': ['.swift']
-    },
-    'r': {
-      'commands': ['Rscript'],
-      'files': [],
-      'extensions': ['.r', '.R']
-    },
-    'perl': {
-      'commands': ['perl'],
-      'files': [],
-      'extensions': ['.pl', '.pm']
-    },
-    'haskell': {
-      'commands': ['ghc', 'runghc'],
-      'files': [],
-      'extensions': ['.hs']
-    },
-    'lua': {
-      'commands': ['lua'],
-      'files': [],
-      'extensions': ['.lua']
-    },
-    'julia': {
-      'commands': ['julia'],
-      'files': [],
-      'extensions': ['.jl']
-    },
-    'c': {
-      'commands': ['gcc'],
-      'files': [],
-      'extensions': ['.c', '.cpp']
-    },
-    'java': {
-      'commands': ['javac', 'java'],
-      'files': [],
-      'extensions': ['.java']
-    },
-    'javascript': {
-      'commands': ['node'],
-      'files': [],
-      'extensions': ['.js', '.jsx']
-    },
-    'typescript': {
-      'commands': ['node'],
-      'files': [],
-      'extensions': ['.ts', '.tsx']
-    },
-    'python': {
-      'commands': ['python', 'python3'],
-      'files': [],
-      'extensions': ['.py']
-    },
-    'nextjs': {
-      'commands': ['next', 'npm run dev', 'yarn dev'],
-      'files': ['next.config.js', 'pages'],
-      'extensions': ['.jsx', '.tsx']
-    },
-    'fastapi': {
-      'commands': ['uvicorn', 'python main.py'],
-      'files': ['main.py'],
-      'extensions': ['.py']
-    },
-    'react': {
-      'commands': ['react-scripts start', 'npm start', 'yarn start'],
-      'files': ['src/App.js', 'public/index.html'],
-      'extensions': ['.jsx', '.tsx', '.js', '.ts']
-    },
-    'django': {
-      'commands': ['python manage.py runserver', 'django-admin'],
-      'files': ['manage.py', 'settings.py'],
-      'extensions': ['.py']
-    },
-    'flask': {
-      'commands': ['flask run', 'python app.py'],
-      'files': ['app.py', 'wsgi.py'],
-      'extensions': ['.py']
-    },
-    'vue': {
-      'commands': ['vue-cli-service serve', 'npm run serve'],
-      'files': ['src/main.js', 'public/index.html'],
-      'extensions': ['.vue']
-    },
-    'angular': {
-      'commands': ['ng serve', 'npm start'],
-      'files': ['angular.json', 'src/main.ts'],
-      'extensions': ['.ts']
-    },
-    'express': {
-      'commands': ['node server.js', 'npm start'],
-      'files': ['server.js', 'app.js'],
-      'extensions': ['.js']
-    },
-    'spring-boot': {
-      'commands': ['./mvnw spring-boot:run', 'java -jar'],
-      'files': ['pom.xml', 'src/main/java'],
-      'extensions': ['.java']
-    },
-    'ruby-on-rails': {
-      'commands': ['rails server', 'rails s'],
-      'files': ['config/routes.rb', 'app/controllers'],
-      'extensions': ['.rb']
-    },
-    'laravel': {
-      'commands': ['php artisan serve'],
-      'files': ['artisan', 'app/Http/Kernel.php'],
-      'extensions': ['.php']
-    },
-    'dotnet': {
-      'commands': ['dotnet run', 'dotnet watch run'],
-      'files': ['Program.cs', '.csproj'],
-      'extensions': ['.cs']
-    },
-  }
-
-  def check_command(cmd):
-    for framework, data in indicators.items():
-      if any(c in cmd for c in data['commands']):
-        return framework
-    return None
-
-  def check_files(dir):
-    for framework, data in indicators.items():
-      if len(data['files']) == 0:
-        return None
-      if all(os.path.exists(os.path.join(dir, file)) for file in data['files']):
-        return framework
-    return None
-
-  def check_file_extension(cmd):
-    file_match = re.search(r'\b[\w-]+\.[a-zA-Z0-9]+\b', cmd)
-    if file_match:
-      file_extension = os.path.splitext(file_match.group())[1]
-      for framework, data in indicators.items():
-        if file_extension in data['extensions']:
-          return framework
-    return None
-
-  # Check command first
-  framework = check_command(command)
-  if framework:
-    print('command found')
-    return framework
-
-  # Check for characteristic files
-  framework = check_files(command)
-  if framework:
-    print('file found', framework)
-    return framework
-
-  # Check file extension in the command
-  framework = check_file_extension(command)
-  if framework:
-    print('file extension found')
-    return framework
-
-  # Check package.json for more clues
-  full_dir = './' + command
-  package_json_path = os.path.join(full_dir, 'package.json')
-  if os.path.exists(package_json_path):
-    with open(package_json_path, 'r') as f:
-      package_data = json.load(f)
-      dependencies = package_data.get('dependencies', {})
-      dev_dependencies = package_data.get('devDependencies', {})
-      all_dependencies = {**dependencies, **dev_dependencies}
-
-      if 'next' in all_dependencies:
-        return 'nextjs'
-      elif 'react' in all_dependencies:
-        return 'react'
-      elif 'vue' in all_dependencies:
-        return 'vue'
-      elif '@angular/core' in all_dependencies:
-        return 'angular'
-      elif 'express' in all_dependencies:
-        return 'express'
-
-  return 'unknown'
+  index = _project_index(directory)
+  scores: Dict[str, float] = {}
+
+  def add(framework: str, score: float):
+    scores[framework] = scores.get(framework, 0) + score
+
+  for framework, data in FRAMEWORK_INDICATORS.items():
+    matched = [c for c in data['commands'] if c in command]
+    if matched:
+      # "python manage.py runserver" beats the plain "python" of the python entry.
+      add(framework, COMMAND_SCORE + max(len(c) for c in matched) / 100)
+    if data['files'] and all(_has_indicator_file(index['paths'], file) for file in data['files']):
+      add(framework, FILES_SCORE)
+
+  for rank, (dependency, framework) in enumerate(PACKAGE_DEPENDENCIES):
+    if dependency in index['dependencies']:
+      add(framework, DEPENDENCY_SCORE - rank / 100)
+
+  file_match = COMMAND_FILE_PATTERN.search(command)
+  if file_match:
+    for framework in EXTENSION_INDEX.get(os.path.splitext(file_match.group())[1], []):
+      add(framework, EXTENSION_SCORE)
+
+  if not scores:
+    return 'unknown'
+  # Ties go to the framework listed first in FRAMEWORK_INDICATORS.
+  order = {framework: i for i, framework in enumerate(FRAMEWORK_INDICATORS)}
+  return max(scores, key=lambda framework: (scores[framework], -order.get(framework, len(order))))
 
 ################################################## NOT IMPLEMENTED ABOVE #####################################################################
 def extract_filename_with_extension(command):
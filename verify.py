@@ -0,0 +1,205 @@
+# [START verify.py]
+"""
+Verification of a suggested fix: re-runs the entrypoint after the fix is written and tells whether the error is gone.
+
+Only the patched file is invalidated between runs (its row in the import index, its mapped buffer and the cached
+answers whose context included it); the resolver, the index and the LLM client are kept, so a retry with a new
+error only re-reads what the fix changed. Errors are compared by fingerprint (see utils/fingerprint.py), so the
+same error at a shifted line or with another memory address does not count as a new one.
+
+@usage: python3 verify.py "python3 main.py" <traceback file> <answer file> [-r|-s]
+"""
+import os
+import sys
+import json
+import time
+import shlex
+import subprocess
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+from errortrace import check_command
+from relational import build_context
+from process.process import SplatClient, default_client
+from utils.bundle import default_file_cache
+from utils.fingerprint import deduplicate_tracebacks, fingerprint, split_tracebacks
+from utils.graph_index import ImportGraphIndex
+from utils.patcher import apply_correction, correction_target
+from utils.resolver import ModuleResolver
+
+DEFAULT_MAX_ITERATIONS = 3
+DEFAULT_TIME_BUDGET = 120.0
+
+# Outcomes of a verification.
+FIXED = 'fixed'
+SAME_ERROR = 'same_error'
+NEW_ERROR = 'new_error'
+BUDGET_EXHAUSTED = 'budget_exhausted'
+# The fix could not be written, e.g. it names a line or a file that does not exist.
+NOT_APPLIED = 'not_applied'
+
+@dataclass
+class VerificationResult:
+  status: str
+  iterations: int
+  elapsed: float
+  # The error of the last run; empty when it passed.
+  traceback: str = ""
+  fingerprint: Optional[str] = None
+  # The (file, line) patched on each iteration.
+  history: List[Tuple[str, int]] = field(default_factory=list)
+  # Why the fix could not be applied (NOT_APPLIED).
+  reason: str = ""
+
+  @property
+  def fixed(self) -> bool:
+    return self.status == FIXED
+
+  def summary(self) -> str:
+    runs = f"{self.iterations} run{'s' if self.iterations != 1 else ''}, {self.elapsed:.2f}s"
+    if self.status == FIXED:
+      return f"fix verified ({runs})"
+    if self.status == SAME_ERROR:
+      return f"the same error is still raised ({runs})"
+    if self.status == NOT_APPLIED:
+      return f"the fix could not be applied: {self.reason} ({runs})"
+    if self.status == NEW_ERROR:
+      return f"a new error is raised and no further fix could be suggested ({runs})"
+    return f"still failing when the verification budget ran out ({runs})"
+
+def last_traceback(stderr: str) -> str:
+  """
+  The traceback a run failed with: the last one it printed, or its whole error output if none was recognized.
+  """
+  tracebacks = split_tracebacks(deduplicate_tracebacks(stderr))
+  return tracebacks[-1] if tracebacks else stderr
+
+class FixVerifier:
+  """
+  Applies a fix, re-runs the entrypoint, and retries with the LLM on a new error, within an iteration and time budget.
+
+  Usage:
+    verifier = FixVerifier(['python3', 'main.py'], flag='-r')
+    result = verifier.verify(traceback, answer)
+    print(result.summary())
+  """
+
+  def __init__(self, entrypoint: List[str], flag: str = "", project_root: Optional[str] = None,
+               max_iterations: int = DEFAULT_MAX_ITERATIONS, time_budget: float = DEFAULT_TIME_BUDGET,
+               run_timeout: Optional[float] = None, client: Optional[SplatClient] = None):
+    self.entrypoint = entrypoint
+    self.flag = flag
+    self.project_root = os.path.abspath(project_root or os.getcwd())
+    self.max_iterations = max_iterations
+    self.time_budget = time_budget
+    self.run_timeout = run_timeout
+    self.client = client or default_client()
+    self.resolver = ModuleResolver(self.project_root)
+    self.index = ImportGraphIndex(self.project_root)
+
+  def invalidate(self, path: str):
+    """
+    Forget what is cached about a patched file, and nothing else.
+    """
+    path = os.path.abspath(path)
+    self.index.invalidate(path)
+    self.index.commit()
+    default_file_cache.invalidate(path)
+    if self.client.use_cache:
+      self.client.cache.invalidate_file(path)
+
+  def suggest(self, traceback: str, returncode: int) -> Optional[dict]:
+    """
+    Ask the LLM for a fix of a new error, with the context built from the kept index and resolver.
+    """
+    error_information = str(subprocess.CalledProcessError(returncode, self.entrypoint))
+    context = build_context(traceback, self.flag, self.project_root, self.index, self.resolver)
+    try:
+      return json.loads(self.client.process(traceback, error_information, context) or "")
+    except Exception as e:
+      print(f"Could not get a fix for the new error: {e}")
+      return None
+
+  '''
+  Applies a fix and checks it by re-running the entrypoint.
+  @param traceback: str - The error the fix is meant to solve.
+  @param response: dict - The LLM answer holding the fix.
+  @param already_applied: bool - The fix is already written (e.g. by the file writer agent); only verify it.
+  @returns: VerificationResult - FIXED when the entrypoint passes. SAME_ERROR when it fails with an error already
+    seen in this verification (retrying would go in circles). NEW_ERROR when it fails differently and no fix could be
+    suggested. BUDGET_EXHAUSTED when it still fails after max_iterations runs or time_budget seconds. NOT_APPLIED when
+    a fix cannot be written (a missing file, line or field), with the error as the reason.
+  '''
+  def verify(self, traceback: str, response: dict, already_applied: bool = False) -> VerificationResult:
+    started = time.monotonic()
+    # Fingerprinted the way the errors of the later runs are, so that it is recognized if it comes back.
+    traceback = last_traceback(traceback)
+    error_fingerprint = fingerprint(traceback)[0]
+    seen = {error_fingerprint}
+    history: List[Tuple[str, int]] = []
+    iteration = 0
+    while True:
+      iteration += 1
+      try:
+        file_path, line_number, _ = correction_target(response)
+        if not (already_applied and iteration == 1):
+          apply_correction(response)
+      except (KeyError, TypeError, ValueError, IndexError, OSError) as e:
+        return VerificationResult(NOT_APPLIED, iteration - 1, time.monotonic() - started, traceback,
+                                  error_fingerprint, history, reason=f"{type(e).__name__}: {e}")
+      history.append((file_path, line_number))
+      self.invalidate(file_path)
+
+      passed, stderr, returncode = check_command(self.entrypoint, self.run_timeout)
+      elapsed = time.monotonic() - started
+      if passed:
+        return VerificationResult(FIXED, iteration, elapsed, history=history)
+
+      traceback = last_traceback(stderr)
+      error_fingerprint = fingerprint(traceback)[0]
+      result = VerificationResult(BUDGET_EXHAUSTED, iteration, elapsed, traceback, error_fingerprint, history)
+      if error_fingerprint in seen:
+        result.status = SAME_ERROR
+        return result
+      seen.add(error_fingerprint)
+      if iteration >= self.max_iterations or elapsed >= self.time_budget:
+        return result
+
+      response = self.suggest(traceback, returncode)
+      result.elapsed = time.monotonic() - started
+      if response is None:
+        result.status = NEW_ERROR
+        return result
+      if result.elapsed >= self.time_budget:
+        return result
+
+  def close(self):
+    self.index.close()
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, exc_type, exc, tb):
+    self.close()
+
+'''
+Verifies a suggested fix by re-running the entrypoint, retrying with the LLM on a new error.
+@param entrypoint: str - The command that failed, e.g. "python3 main.py".
+@param traceback: str - The error the fix is meant to solve.
+@param response: dict - The LLM answer holding the fix.
+@param already_applied: bool - The fix is already written; only verify it.
+@param **options - flag, project_root, max_iterations, time_budget, run_timeout and client, see FixVerifier.
+@returns: VerificationResult
+'''
+def verify_fix(entrypoint: str, traceback: str, response: dict, already_applied: bool = False,
+               **options) -> VerificationResult:
+  with FixVerifier(shlex.split(entrypoint), **options) as verifier:
+    return verifier.verify(traceback, response, already_applied)
+
+if __name__ == "__main__":
+  with open(sys.argv[2], encoding='utf-8') as traceback_file, open(sys.argv[3], encoding='utf-8') as answer_file:
+    result = verify_fix(sys.argv[1], traceback_file.read(), json.load(answer_file),
+                        flag=sys.argv[4] if len(sys.argv) > 4 else "")
+  print(result.summary())
+  sys.exit(0 if result.fixed else 1)
+
+# [END verify.py]
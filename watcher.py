@@ -0,0 +1,341 @@
+# [START watcher.py]
+"""
+Watch mode: re-runs an entrypoint whenever a file it depends on is saved, and analyzes the error if it fails.
+
+Changes are picked up with inotify (through ctypes, no extra dependency) and fall back to polling file signatures
+where inotify is not available. A burst of saves (an editor writing several files, a formatter, a git checkout) is
+debounced into a single re-run. Only saves of files in the dependency closure of the entrypoint (from
+build_adjacency_list) trigger a run; the import index, the resolver and the mapped files are kept between runs, so
+an analysis after a save only re-parses and re-reads the files that changed.
+
+@usage: python3 watcher.py "python3 main.py" [-r|-s]
+"""
+import os
+import sys
+import time
+import errno
+import ctypes
+import ctypes.util
+import select
+import shlex
+import struct
+import subprocess
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+from errortrace import check_command
+from relational import build_context
+from process.process import process_stream
+from terminalout.terminal import render_header, render_what, render_where
+from utils.utils import build_adjacency_list
+from utils.graph_index import ImportGraphIndex
+from utils.resolver import ModuleResolver, SKIPPED_DIRS
+from utils.extractors import language_of
+from utils.fingerprint import deduplicate_tracebacks
+
+# A change is acted on once no other change has arrived for DEBOUNCE_SECONDS, or after MAX_DEBOUNCE_SECONDS at most.
+DEBOUNCE_SECONDS = 0.1
+MAX_DEBOUNCE_SECONDS = 1.0
+POLL_INTERVAL = 0.5
+
+# inotify(7)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+INOTIFY_EVENT = struct.Struct('iIII')
+READ_SIZE = 64 * 1024
+
+# Change kinds reported by the watchers.
+MODIFIED = 'modified'
+CREATED = 'created'
+DELETED = 'deleted'
+# The kernel queue overflowed: anything may have changed.
+OVERFLOW = 'overflow'
+
+def iter_watched_dirs(project_root: str) -> Iterator[str]:
+  for dirpath, dirnames, _ in os.walk(project_root):
+    dirnames[:] = [d for d in dirnames if d not in SKIPPED_DIRS and not d.startswith('.')]
+    yield dirpath
+
+class InotifyWatcher:
+  """
+  Reports changed source files under a project through inotify. Raises OSError where inotify is unavailable.
+  """
+
+  def __init__(self, project_root: str):
+    self.project_root = os.path.abspath(project_root)
+    libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+    if not hasattr(libc, 'inotify_init1'):
+      raise OSError(errno.ENOSYS, 'inotify is not available')
+    self._libc = libc
+    self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+    if self.fd < 0:
+      raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+    self._dirs: Dict[int, str] = {}
+    for directory in iter_watched_dirs(self.project_root):
+      self._add(directory)
+
+  def _add(self, directory: str):
+    wd = self._libc.inotify_add_watch(self.fd, os.fsencode(directory), WATCH_MASK)
+    if wd >= 0:
+      self._dirs[wd] = directory
+
+  def read(self, timeout: Optional[float]) -> Dict[str, str]:
+    """
+    Wait up to `timeout` seconds (forever if None) and return the changes seen, as {path: kind}.
+    """
+    ready, _, _ = select.select([self.fd], [], [], timeout)
+    if not ready:
+      return {}
+    try:
+      data = os.read(self.fd, READ_SIZE)
+    except BlockingIOError:
+      return {}
+
+    changes = {}
+    offset = 0
+    while offset + INOTIFY_EVENT.size <= len(data):
+      wd, mask, _, length = INOTIFY_EVENT.unpack_from(data, offset)
+      name = data[offset + INOTIFY_EVENT.size:offset + INOTIFY_EVENT.size + length].rstrip(b'\0')
+      offset += INOTIFY_EVENT.size + length
+      if mask & IN_Q_OVERFLOW:
+        changes[self.project_root] = OVERFLOW
+        continue
+      if mask & IN_IGNORED:
+        self._dirs.pop(wd, None)
+        continue
+      directory = self._dirs.get(wd)
+      if directory is None or not name:
+        continue
+      path = os.path.join(directory, os.fsdecode(name))
+      if mask & IN_ISDIR:
+        if mask & (IN_CREATE | IN_MOVED_TO) and not os.path.basename(path).startswith('.') \
+            and os.path.basename(path) not in SKIPPED_DIRS:
+          # Files written into the new directory before its watch existed are reported as created.
+          for new_directory in iter_watched_dirs(path):
+            self._add(new_directory)
+            try:
+              entries = list(os.scandir(new_directory))
+            except OSError:
+              continue
+            for entry in entries:
+              if entry.is_file() and language_of(entry.path):
+                changes[entry.path] = CREATED
+        continue
+      if language_of(path) is None:
+        continue
+      if mask & (IN_DELETE | IN_MOVED_FROM):
+        changes[path] = DELETED
+      elif mask & (IN_CREATE | IN_MOVED_TO):
+        changes[path] = CREATED
+      elif path not in changes:
+        changes[path] = MODIFIED
+    return changes
+
+  def close(self):
+    if self.fd >= 0:
+      os.close(self.fd)
+      self.fd = -1
+
+class PollingWatcher:
+  """
+  The fallback: compares the (mtime_ns, size) signature of every source file every POLL_INTERVAL seconds.
+  """
+
+  def __init__(self, project_root: str, interval: float = POLL_INTERVAL):
+    self.project_root = os.path.abspath(project_root)
+    self.interval = interval
+    self._signatures = self._scan()
+
+  def _scan(self) -> Dict[str, Tuple[int, int]]:
+    signatures = {}
+    for directory in iter_watched_dirs(self.project_root):
+      try:
+        entries = list(os.scandir(directory))
+      except OSError:
+        continue
+      for entry in entries:
+        if language_of(entry.name) is None:
+          continue
+        try:
+          st = entry.stat()
+        except OSError:
+          continue
+        signatures[entry.path] = (st.st_mtime_ns, st.st_size)
+    return signatures
+
+  def read(self, timeout: Optional[float]) -> Dict[str, str]:
+    deadline = None if timeout is None else time.monotonic() + timeout
+    while True:
+      time.sleep(self.interval if deadline is None else max(0.0, min(self.interval, deadline - time.monotonic())))
+      signatures = self._scan()
+      changes = {path: DELETED for path in self._signatures.keys() - signatures.keys()}
+      for path, signature in signatures.items():
+        previous = self._signatures.get(path)
+        if previous is None:
+          changes[path] = CREATED
+        elif previous != signature:
+          changes[path] = MODIFIED
+      self._signatures = signatures
+      if changes or (deadline is not None and time.monotonic() >= deadline):
+        return changes
+
+  def close(self):
+    pass
+
+def make_watcher(project_root: str, poll: bool = False):
+  if not poll:
+    try:
+      return InotifyWatcher(project_root)
+    except (OSError, AttributeError, TypeError):
+      pass
+  return PollingWatcher(project_root)
+
+'''
+Waits for the next burst of changes.
+@param watcher: InotifyWatcher | PollingWatcher - Where the changes come from.
+@returns: Dict[str, str] - {path: kind} for every change of the burst; a later kind wins, except that a file created
+  and then modified during the burst stays "created".
+'''
+def collect_changes(watcher) -> Dict[str, str]:
+  changes = {}
+  while not changes:
+    changes = watcher.read(None)
+  started = time.monotonic()
+  while time.monotonic() - started < MAX_DEBOUNCE_SECONDS:
+    more = watcher.read(DEBOUNCE_SECONDS)
+    if not more:
+      break
+    for path, kind in more.items():
+      if not (kind == MODIFIED and changes.get(path) == CREATED):
+        changes[path] = kind
+  return changes
+
+class WatchSession:
+  """
+  The state kept between the runs of one watched entrypoint.
+  """
+
+  def __init__(self, entrypoint: List[str], flag: str = "", project_root: Optional[str] = None,
+               timeout: Optional[float] = None):
+    self.entrypoint = entrypoint
+    self.flag = flag
+    self.project_root = os.path.abspath(project_root or os.getcwd())
+    self.timeout = timeout
+    self.resolver = ModuleResolver(self.project_root)
+    self.index = ImportGraphIndex(self.project_root)
+    # None when the entrypoint names no source file: then every source change triggers a run.
+    self.closure: Optional[Set[str]] = None
+
+  def entry_files(self) -> List[str]:
+    return [
+      os.path.abspath(argument) for argument in self.entrypoint
+      if language_of(argument) is not None and os.path.isfile(argument)
+    ]
+
+  def refresh_closure(self):
+    """
+    Recompute the files the entrypoint depends on; only changed files are re-parsed, thanks to the index.
+    """
+    entry_files = self.entry_files()
+    if not entry_files:
+      self.closure = None
+      return
+    graph = build_adjacency_list(entry_files, self.project_root, index=self.index, resolver=self.resolver)
+    self.closure = set(entry_files) | set(graph) | {path for imports in graph.values() for path in imports}
+
+  def files_added_or_removed(self, changes: Dict[str, str]) -> bool:
+    """
+    Whether the set of source files changed. Editors that save by writing a new file and renaming it over the old
+    one report a file as created, but it is already known to the resolver.
+    """
+    return any(os.path.exists(path) != (path in self.resolver.paths) for path in changes)
+
+  def affected(self, changes: Dict[str, str]) -> bool:
+    return self.closure is None or any(path in self.closure for path in changes)
+
+  def handle(self, changes: Dict[str, str]) -> bool:
+    """
+    React to a burst of changes; returns whether the entrypoint was re-run.
+    """
+    if OVERFLOW in changes.values():
+      self.resolver = ModuleResolver(self.project_root)
+      self.refresh_closure()
+      self.run_once()
+      return True
+    if self.files_added_or_removed(changes):
+      # Imports may resolve differently now, so the project is rescanned.
+      self.resolver = ModuleResolver(self.project_root)
+    if not self.affected(changes):
+      # A new file may only become part of the closure once something in the closure imports it.
+      return False
+    self.refresh_closure()
+    self.run_once()
+    return True
+
+  def run_once(self) -> bool:
+    """
+    Run the entrypoint and analyze its error, if any. Returns whether it passed.
+    """
+    started = time.monotonic()
+    passed, stderr, returncode = check_command(self.entrypoint, self.timeout)
+    elapsed = time.monotonic() - started
+    if passed:
+      print(f"✅ {shlex.join(self.entrypoint)} passed ({elapsed:.2f}s)")
+      return True
+
+    print(f"❌ {shlex.join(self.entrypoint)} failed ({elapsed:.2f}s)")
+    traceback = deduplicate_tracebacks(stderr) or str(subprocess.CalledProcessError(returncode, self.entrypoint))
+    error_information = str(subprocess.CalledProcessError(returncode, self.entrypoint))
+    context = build_context(traceback, self.flag, self.project_root, self.index, self.resolver)
+    try:
+      render_header()
+      for key, value in process_stream(traceback, error_information, context):
+        if key == 'where':
+          render_where(value)
+        elif key == 'what':
+          render_what(value)
+        elif key == 'how':
+          print(f"🛠  Suggested fix (line {value.get('error_origination')}):\n{value.get('suggested_code_solution')}")
+    except Exception as e:
+      print(f"Could not analyze the error: {e}")
+    return False
+
+  def close(self):
+    self.index.close()
+
+'''
+Watches the project and re-runs the entrypoint on every relevant save, until interrupted.
+@param command: str - The entrypoint, e.g. "python3 main.py".
+@param flag: str - The context flag, see relational.build_context.
+@param project_root: Optional[str] - Defaults to the current directory.
+@param timeout: Optional[float] - Seconds a run may take; a run still going when it expires (e.g. a server that
+  started fine) counts as passed.
+@param poll: bool - Use the polling watcher even where inotify is available.
+'''
+def watch(command: str, flag: str = "", project_root: Optional[str] = None, timeout: Optional[float] = None,
+          poll: bool = False):
+  session = WatchSession(shlex.split(command), flag, project_root, timeout)
+  watcher = make_watcher(session.project_root, poll)
+  print(f"👀 Watching {session.project_root} ({type(watcher).__name__}), Ctrl-C to stop")
+  try:
+    session.refresh_closure()
+    session.run_once()
+    while True:
+      session.handle(collect_changes(watcher))
+  except KeyboardInterrupt:
+    pass
+  finally:
+    watcher.close()
+    session.close()
+
+if __name__ == "__main__":
+  watch(sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else "")
+
+# [END watcher.py]